@@ -21,7 +21,7 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
 from sklearn.preprocessing import MinMaxScaler
-import yfinance as yf
+from scripts.data_sources import get_data_source
 
 
 class Command(BaseCommand):
@@ -72,7 +72,7 @@ class Command(BaseCommand):
         try:
             # Step 1: Fetch & prepare data
             self.stdout.write('📥 Fetching stock data...')
-            frames = yf.download(ticker, period='10y', progress=False)
+            frames = get_data_source().get_history(ticker, period='10y')
             
             if frames.empty:
                 raise CommandError(f'No data found for ticker {ticker}')
@@ -9,8 +9,9 @@ import pandas as pd
 import tensorflow as tf
 from sklearn.preprocessing import MinMaxScaler
 from datetime import datetime, timedelta
-import yfinance as yf
 import logging
+from scripts.data_sources import get_data_source
+from scripts.price_store import get_price_store
 
 logger = logging.getLogger(__name__)
 
@@ -92,14 +93,22 @@ def predict_stock_price(ticker: str, days_ahead: int = 1):
         if model is None:
             return None
         
-        # Fetch recent data
-        ticker_data = yf.download(ticker, period='3mo')
+        # Recent closes from the local price store when it covers the look-back window
+        prices = None
+        store = get_price_store()
+        if store is not None:
+            series = store.get(ticker, start_date=datetime.now().date() - timedelta(days=92))
+            if series is not None and len(series) >= LOOK_BACK:
+                prices = np.asarray(series.close).reshape(-1, 1)
         
-        if ticker_data.empty:
-            logger.error(f"No data fetched for {ticker}")
-            return None
-        
-        prices = ticker_data['Close'].values.reshape(-1, 1)
+        if prices is None:
+            ticker_data = get_data_source().get_history(ticker, period='3mo')
+            
+            if ticker_data.empty:
+                logger.error(f"No data fetched for {ticker}")
+                return None
+            
+            prices = ticker_data['Close'].values.reshape(-1, 1)
         current_price = prices[-1][0]
         
         # Scale data
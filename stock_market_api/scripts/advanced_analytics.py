@@ -4,17 +4,19 @@ Advanced Analytics Calculations
 import os
 import sys
 import django
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
 
 # Setup Django environment
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 django.setup()
 
-from stocks.models import Stock, StockPrice, TechnicalIndicator
+from django.db.models import F, Q
+from stocks.models import Stock, StockPrice, TechnicalIndicator, IndicatorSnapshot, StockBeta
+from scripts.risk_engine import (
+    correlation_matrix, market_betas, monte_carlo_risk, portfolio_risk, sector_analytics
+)
 
 
 class AdvancedAnalyticsCalculator:
@@ -25,112 +27,56 @@ class AdvancedAnalyticsCalculator:
 
     def calculate_beta(self, ticker, period_days=252):
         """Calculate beta coefficient for a stock"""
-        try:
-            stock = Stock.objects.get(ticker=ticker.upper())
-            market_stock = Stock.objects.get(ticker=self.market_ticker)
-
-            # Get stock prices
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=period_days)
-
-            stock_prices = StockPrice.objects.filter(
-                stock=stock,
-                date__gte=start_date,
-                date__lte=end_date
-            ).order_by('date').values_list('date', 'close')
-
-            market_prices = StockPrice.objects.filter(
-                stock=market_stock,
-                date__gte=start_date,
-                date__lte=end_date
-            ).order_by('date').values_list('date', 'close')
-
-            if len(stock_prices) < 30 or len(market_prices) < 30:
-                return None
-
-            # Create DataFrames
-            stock_df = pd.DataFrame(stock_prices, columns=['date', 'close'])
-            market_df = pd.DataFrame(market_prices, columns=['date', 'close'])
-
-            # Merge on date
-            merged = pd.merge(stock_df, market_df, on='date', suffixes=('_stock', '_market'))
-
-            if len(merged) < 30:
-                return None
-
-            # Calculate daily returns
-            merged['stock_return'] = merged['close_stock'].pct_change()
-            merged['market_return'] = merged['close_market'].pct_change()
-
-            # Remove NaN values
-            returns = merged.dropna()
-
-            if len(returns) < 30:
-                return None
-
-            # Calculate beta using linear regression
-            X = returns['market_return'].values.reshape(-1, 1)
-            y = returns['stock_return'].values
+        return self.calculate_betas([ticker], period_days=period_days).get(ticker.upper())
 
-            model = LinearRegression()
-            model.fit(X, y)
-
-            beta = model.coef_[0]
-            return beta
-
-        except Stock.DoesNotExist:
-            return None
-
-    def calculate_correlation_matrix(self, tickers, period_days=90):
-        """Calculate correlation matrix for multiple stocks"""
+    def calculate_betas(self, tickers, period_days=252):
+        """
+        {TICKER: beta or None} against the market proxy. Betas stored today
+        (by daily_update or calculate_betas) since the stock and market
+        prices last changed are reused; the rest are computed together in
+        closed form without being stored, so reads never write. The market
+        proxy itself has a beta of exactly 1.
+        """
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        end_date = datetime.now().date()
+
+        market_updated = Stock.objects.filter(ticker=self.market_ticker).values_list('last_updated', flat=True).first()
+        stored = {}
+        if market_updated is not None:
+            stored = dict(StockBeta.objects.filter(
+                stock__ticker__in=tickers,
+                benchmark=self.market_ticker,
+                period_days=period_days,
+                window=0,
+                date=end_date,
+                updated_at__gte=F('stock__last_updated'),
+            ).filter(updated_at__gte=market_updated).values_list('stock__ticker', 'beta'))
+
+        stored[self.market_ticker] = 1.0
+        missing = [ticker for ticker in tickers if ticker not in stored]
+        if missing:
+            stored.update(market_betas(missing, self.market_ticker, period_days=period_days, end_date=end_date)['betas'])
+        return {ticker: stored.get(ticker) for ticker in tickers}
+
+    def calculate_correlation_matrix(self, tickers, period_days=90, method='pairwise'):
+        """
+        Calculate correlation matrix for multiple stocks
+        Returns {'tickers': [...], 'matrix': [[...]], ...} with rows and
+        columns in 'tickers' order; method is 'pairwise' or 'shrinkage'.
+        """
         try:
-            stocks_data = {}
-            dates = None
-
-            for ticker in tickers:
-                stock = Stock.objects.get(ticker=ticker.upper())
-                end_date = datetime.now().date()
-                start_date = end_date - timedelta(days=period_days)
-
-                prices = StockPrice.objects.filter(
-                    stock=stock,
-                    date__gte=start_date,
-                    date__lte=end_date
-                ).order_by('date').values_list('date', 'close')
-
-                if len(prices) < 30:
-                    continue
-
-                df = pd.DataFrame(prices, columns=['date', 'close'])
-                df['return'] = df['close'].pct_change()
-                df = df.dropna()
-
-                stocks_data[ticker] = df.set_index('date')['return']
-
-                if dates is None:
-                    dates = set(df['date'])
-                else:
-                    dates = dates.intersection(set(df['date']))
-
-            if not stocks_data or len(dates) < 30:
-                return None
-
-            # Create returns DataFrame
-            returns_df = pd.DataFrame(stocks_data)
-
-            # Calculate correlation matrix
-            correlation_matrix = returns_df.corr()
-
-            return correlation_matrix.to_dict()
+            return correlation_matrix(tickers, days=period_days, method=method)
 
         except Exception as e:
             print(f"Error calculating correlation: {e}")
             return None
 
-    def calculate_portfolio_metrics(self, holdings):
+    def calculate_portfolio_metrics(self, holdings, days=90):
         """
         Calculate advanced portfolio metrics
         holdings: dict of {ticker: {'quantity': int, 'buy_price': float}}
+        Volatility, VaR/CVaR (daily loss at 95%) and drawdown are percentages
+        from the covariance-based portfolio risk engine over `days`.
         """
         try:
             metrics = {
@@ -141,82 +87,63 @@ class AdvancedAnalyticsCalculator:
                 'sharpe_ratio': 0,
                 'max_drawdown': 0,
                 'var_95': 0,  # Value at Risk 95%
+                'cvar_95': 0,
+                'var_95_parametric': 0,
+                'cvar_95_parametric': 0,
             }
 
-            individual_betas = []
-            individual_weights = []
-            returns_data = []
-
+            prices = dict(Stock.objects.filter(
+                ticker__in=[ticker.upper() for ticker in holdings]
+            ).values_list('ticker', 'current_price'))
             for ticker, data in holdings.items():
-                stock = Stock.objects.get(ticker=ticker.upper())
-                quantity = data['quantity']
-                buy_price = data.get('buy_price', stock.current_price)
-
-                if stock.current_price:
-                    current_value = float(stock.current_price) * quantity
-                    cost_basis = float(buy_price) * quantity
-
-                    metrics['total_value'] += current_value
-                    metrics['total_cost'] += cost_basis
-
-                    # Weight in portfolio
-                    weight = current_value / metrics['total_value'] if metrics['total_value'] > 0 else 0
-                    individual_weights.append(weight)
-
-                    # Calculate beta
-                    beta = self.calculate_beta(ticker)
-                    if beta is not None:
-                        individual_betas.append(beta * weight)
-
-                    # Get returns for volatility calculation
-                    end_date = datetime.now().date()
-                    start_date = end_date - timedelta(days=90)
-
-                    prices = StockPrice.objects.filter(
-                        stock=stock,
-                        date__gte=start_date,
-                        date__lte=end_date
-                    ).order_by('date').values_list('close', flat=True)
-
-                    if len(prices) > 30:
-                        price_list = list(prices)
-                        returns = [((price_list[i] - price_list[i-1]) / price_list[i-1]) * 100
-                                 for i in range(1, len(price_list))]
-                        returns_data.append(returns)
-
-            # Calculate portfolio beta
-            if individual_betas:
-                metrics['beta'] = sum(individual_betas)
-
-            # Calculate portfolio volatility
-            if returns_data:
-                # Simple portfolio volatility (assuming equal correlation for simplicity)
-                individual_volatilities = [np.std(returns) for returns in returns_data]
-                portfolio_volatility = np.sqrt(sum(w * v**2 for w, v in zip(individual_weights, individual_volatilities)))
-                metrics['volatility'] = portfolio_volatility
-
-                # Sharpe ratio (assuming 2% risk-free rate)
-                if portfolio_volatility > 0:
-                    avg_return = np.mean([np.mean(returns) for returns in returns_data])
-                    risk_free_rate = 2.0  # 2% annual
-                    metrics['sharpe_ratio'] = (avg_return - risk_free_rate) / portfolio_volatility
-
-                # Value at Risk (simplified)
-                all_returns = [r for returns in returns_data for r in returns]
-                metrics['var_95'] = np.percentile(all_returns, 5)  # 5th percentile
-
-                # Maximum drawdown (simplified)
-                cumulative_returns = np.cumprod(1 + np.array(all_returns) / 100)
-                running_max = np.maximum.accumulate(cumulative_returns)
-                drawdown = (cumulative_returns - running_max) / running_max
-                metrics['max_drawdown'] = np.min(drawdown) * 100
-
+                current_price = prices.get(ticker.upper())
+                if current_price:
+                    buy_price = data.get('buy_price') or current_price
+                    metrics['total_value'] += float(current_price) * data['quantity']
+                    metrics['total_cost'] += float(buy_price) * data['quantity']
+
+            risk = portfolio_risk({ticker: data['quantity'] for ticker, data in holdings.items()}, days=days)
+            if risk is None:
+                return metrics
+
+            betas = self.calculate_betas([holding['ticker'] for holding in risk['holdings']])
+            metrics.update({
+                'beta': sum(
+                    holding['weight'] * betas[holding['ticker']]
+                    for holding in risk['holdings'] if betas[holding['ticker']] is not None
+                ),
+                'volatility': risk['volatility'],
+                'sharpe_ratio': risk['sharpe_ratio'],
+                'max_drawdown': risk['max_drawdown'],
+                'var_95': risk['var_historical'],
+                'cvar_95': risk['cvar_historical'],
+                'var_95_parametric': risk['var_parametric'],
+                'cvar_95_parametric': risk['cvar_parametric'],
+            })
             return metrics
 
         except Exception as e:
             print(f"Error calculating portfolio metrics: {e}")
             return None
 
+    def calculate_monte_carlo_risk(self, holdings, days=252, horizon=10, simulations=100_000,
+                                   confidence=0.95, seed=None):
+        """
+        Monte Carlo VaR/CVaR over `horizon` trading days
+        holdings: dict of {ticker: {'quantity': int, 'buy_price': float}}
+        Simulates correlated buy-and-hold paths from the covariance of the
+        last `days` of returns; percentages plus loss amounts at current value.
+        """
+        try:
+            return monte_carlo_risk(
+                {ticker: data['quantity'] for ticker, data in holdings.items()}, days=days, horizon=horizon,
+                simulations=simulations, confidence=confidence, seed=seed
+            )
+
+        except Exception as e:
+            print(f"Error running Monte Carlo simulation: {e}")
+            return None
+
     def get_fundamental_analysis(self, ticker):
         """Get fundamental analysis for a stock"""
         try:
@@ -261,13 +188,10 @@ class AdvancedAnalyticsCalculator:
                     analysis['valuation']['dividend_rating'] = 'Low Yield'
 
             # Technical analysis integration
-            latest_rsi = TechnicalIndicator.objects.filter(
-                stock=stock,
-                indicator_type='RSI'
-            ).order_by('-date').first()
+            latest_rsi = IndicatorSnapshot.objects.filter(stock=stock).values_list('rsi_14', flat=True).first()
 
-            if latest_rsi:
-                rsi_value = float(latest_rsi.value)
+            if latest_rsi is not None:
+                rsi_value = float(latest_rsi)
                 if rsi_value < 30:
                     analysis['growth']['technical_signal'] = 'Oversold - Buy Signal'
                     analysis['score'] += 1
@@ -290,8 +214,12 @@ class AdvancedAnalyticsCalculator:
         except Stock.DoesNotExist:
             return None
 
-    def get_sector_comparison(self, ticker):
-        """Compare stock to its sector peers"""
+    def get_sector_comparison(self, ticker, days=30):
+        """
+        Compare stock to its sector peers
+        Percentiles (0-100) rank the stock's `days` performance, P/E and
+        market cap among its active sector peers.
+        """
         try:
             stock = Stock.objects.get(ticker=ticker.upper())
             sector = stock.sector
@@ -299,81 +227,54 @@ class AdvancedAnalyticsCalculator:
             if not sector:
                 return None
 
-            # Get sector peers
-            peers = Stock.objects.filter(
-                sector=sector,
-                is_active=True
-            ).exclude(ticker=ticker)
+            # The stock itself plus its active sector peers
+            sector_stocks = Stock.objects.filter(Q(sector=sector, is_active=True) | Q(pk=stock.pk))
+            analytics = sector_analytics(sector_stocks, days=days)
+            own = analytics.pop(stock.ticker)
+            peers = analytics.values()
 
             comparison = {
                 'sector': sector,
-                'peer_count': peers.count(),
-                'valuation_comparison': {},
-                'performance_comparison': {},
+                'peer_count': len(analytics),
+                'valuation_comparison': {
+                    'pe_percentile': own['pe_percentile'],
+                    'size_percentile': own['size_percentile'],
+                },
+                'performance_comparison': {
+                    'performance': own['performance'],
+                    'percentile': own['performance_percentile'],
+                },
             }
 
             # Valuation comparison
-            sector_pe = peers.filter(pe_ratio__isnull=False).aggregate(avg_pe=Avg('pe_ratio'))['avg_pe']
-            if sector_pe and stock.pe_ratio:
-                comparison['valuation_comparison']['pe_vs_sector'] = stock.pe_ratio - sector_pe
-
-            sector_market_cap = peers.filter(market_cap__isnull=False).aggregate(avg_mc=Avg('market_cap'))['avg_mc']
-            if sector_market_cap and stock.market_cap:
-                comparison['valuation_comparison']['size_percentile'] = (
-                    1 if stock.market_cap > sector_market_cap else -1
-                )
-
-            # Performance comparison (30-day)
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=30)
-
-            stock_performance = self._calculate_performance(ticker, start_date, end_date)
-            peer_performances = []
-
-            for peer in peers:
-                perf = self._calculate_performance(peer.ticker, start_date, end_date)
-                if perf is not None:
-                    peer_performances.append(perf)
+            peer_pe = [peer['pe_ratio'] for peer in peers if peer['pe_ratio'] is not None]
+            if peer_pe and own['pe_ratio'] is not None:
+                comparison['valuation_comparison']['pe_vs_sector'] = own['pe_ratio'] - float(np.mean(peer_pe))
 
+            # Performance comparison
+            peer_performances = [peer['performance'] for peer in peers if peer['performance'] is not None]
             if peer_performances:
-                avg_peer_performance = sum(peer_performances) / len(peer_performances)
-                comparison['performance_comparison']['vs_sector_avg'] = stock_performance - avg_peer_performance if stock_performance else None
+                avg_peer_performance = float(np.mean(peer_performances))
+                comparison['performance_comparison']['sector_avg'] = avg_peer_performance
+                comparison['performance_comparison']['vs_sector_avg'] = (
+                    own['performance'] - avg_peer_performance if own['performance'] is not None else None
+                )
 
             return comparison
 
         except Stock.DoesNotExist:
             return None
 
-    def _calculate_performance(self, ticker, start_date, end_date):
-        """Calculate price performance for a date range"""
-        try:
-            stock = Stock.objects.get(ticker=ticker.upper())
-
-            prices = StockPrice.objects.filter(
-                stock=stock,
-                date__gte=start_date,
-                date__lte=end_date
-            ).order_by('date').values_list('close', flat=True)
-
-            if len(prices) >= 2:
-                start_price = prices[0]
-                end_price = prices[-1]
-                return ((end_price - start_price) / start_price) * 100
-
-            return None
-
-        except Stock.DoesNotExist:
-            return None
-
 
 # Example usage functions
 def analyze_portfolio_stocks(tickers):
     """Analyze a list of portfolio stocks"""
     calculator = AdvancedAnalyticsCalculator()
+    betas = calculator.calculate_betas(tickers)
 
     results = {}
     for ticker in tickers:
-        beta = calculator.calculate_beta(ticker)
+        beta = betas[ticker.upper()]
         fundamental = calculator.get_fundamental_analysis(ticker)
         sector_comparison = calculator.get_sector_comparison(ticker)
 
@@ -0,0 +1,361 @@
+"""
+Benchmarks for the data pipeline
+Every benchmark runs inside a transaction that is rolled back, so it can be
+pointed at a development database without leaving synthetic rows behind
+"""
+import os
+import sys
+import time
+from datetime import datetime
+import django
+import numpy as np
+import pandas as pd
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from stocks.models import Stock, StockPrice
+from django.db import transaction
+
+
+def make_synthetic_history(years=20, seed=0, end=None):
+    """Build a yfinance-shaped OHLCV frame with a geometric random walk"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or pd.Timestamp.now().normalize())
+    index = pd.bdate_range(end=end, periods=252 * years)
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+    open_price = close * (1 + rng.normal(0, 0.003, len(index)))
+    high = np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.005, len(index))))
+    low = np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.005, len(index))))
+    volume = rng.integers(1_000_000, 50_000_000, len(index))
+
+    return pd.DataFrame({
+        'Open': open_price,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+    }, index=index)
+
+
+def make_synthetic_stocks(count, prefix='BENCH'):
+    """Create throwaway Stock rows for a benchmark run"""
+    return Stock.objects.bulk_create([
+        Stock(ticker=f'{prefix}{i}'[:10], company_name=f'Benchmark {i}')
+        for i in range(count)
+    ])
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _timed(func):
+    """Run func inside a rolled-back transaction and return (elapsed, result)"""
+    result = None
+    elapsed = 0.0
+    try:
+        with transaction.atomic():
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            raise _Rollback()
+    except _Rollback:
+        pass
+    return elapsed, result
+
+
+def benchmark_price_ingestion(years=20):
+    """Compare row-by-row and bulk upsert ingestion of one long history frame"""
+    from scripts.fetch_stock_data import StockDataFetcher
+
+    fetcher = StockDataFetcher()
+    hist = make_synthetic_history(years=years)
+    rows = len(hist)
+
+    def row_by_row():
+        stock = make_synthetic_stocks(1)[0]
+        return fetcher.save_historical_data(stock.ticker, hist=hist)
+
+    def bulk_insert():
+        stock = make_synthetic_stocks(1)[0]
+        return fetcher.bulk_save_historical_data(stock, hist)
+
+    def bulk_update():
+        stock = make_synthetic_stocks(1)[0]
+        fetcher.bulk_save_historical_data(stock, hist)
+        start = time.perf_counter()
+        counts = fetcher.bulk_save_historical_data(stock, hist)
+        return time.perf_counter() - start, counts
+
+    results = {}
+    results['row_by_row'], _ = _timed(row_by_row)
+    results['bulk_insert'], _ = _timed(bulk_insert)
+    _, (results['bulk_update'], _) = _timed(bulk_update)
+
+    print(f"\nPrice ingestion: {rows} rows ({years} years synthetic)")
+    for name, elapsed in results.items():
+        print(f"  {name:<12} {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/sec")
+    print(f"  speedup      {results['row_by_row'] / results['bulk_insert']:8.1f}x")
+    return results
+
+
+def make_synthetic_universe(tickers, years=2):
+    """Create `tickers` throwaway stocks with synthetic daily prices, one bulk insert"""
+    from scripts.fetch_stock_data import StockDataFetcher
+
+    fetcher = StockDataFetcher()
+    stocks = make_synthetic_stocks(tickers)
+    rows = []
+    for seed, stock in enumerate(stocks):
+        rows.extend(fetcher.build_price_rows(stock, make_synthetic_history(years=years, seed=seed)))
+    StockPrice.objects.bulk_create(rows, batch_size=5000)
+    return stocks
+
+
+def benchmark_indicator_save(tickers=500, days=365):
+    """Compare per-row update_or_create and bulk upsert of indicators across a synthetic universe"""
+    from scripts.calculate_indicators import TechnicalIndicatorCalculator
+
+    calculator = TechnicalIndicatorCalculator()
+
+    def run(bulk):
+        stocks = make_synthetic_universe(tickers)
+        start = time.perf_counter()
+        for stock in stocks:
+            calculator.calculate_all_indicators(stock.ticker, days=days, bulk=bulk)
+        return time.perf_counter() - start
+
+    _, per_row = _timed(lambda: run(bulk=False))
+    _, bulk = _timed(lambda: run(bulk=True))
+
+    print(f"\nIndicator save: {tickers} tickers, {days} days of prices")
+    print(f"  update_or_create {per_row:8.2f}s  {per_row / tickers * 1000:8.1f} ms/ticker")
+    print(f"  bulk upsert      {bulk:8.2f}s  {bulk / tickers * 1000:8.1f} ms/ticker")
+    print(f"  speedup          {per_row / bulk:8.1f}x")
+    return {'update_or_create': per_row, 'bulk': bulk}
+
+
+def benchmark_indicator_panel(tickers=500, days=365):
+    """
+    Compare the per-ticker pandas loop with the cross-ticker NumPy panel engine.
+    Load + compute is timed separately because the bulk write costs the same in both.
+    """
+    from scripts.calculate_indicators import TechnicalIndicatorCalculator
+    from scripts.indicator_panel import IndicatorPanel
+
+    calculator = TechnicalIndicatorCalculator()
+
+    def run():
+        stocks = make_synthetic_universe(tickers)
+        timings = {}
+
+        start = time.perf_counter()
+        for stock in stocks:
+            _, df = calculator.get_price_data(stock.ticker, days)
+            calculator.compute_indicators(df)
+        timings['per_ticker_compute'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        IndicatorPanel.load(stocks, days=days).compute()
+        timings['panel_compute'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for stock in stocks:
+            calculator.calculate_all_indicators(stock.ticker, days=days)
+        timings['per_ticker_total'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        calculator.calculate_panel(stocks, days=days)
+        timings['panel_total'] = time.perf_counter() - start
+        return timings
+
+    _, timings = _timed(run)
+
+    print(f"\nIndicator panel: {tickers} tickers, {days} days of prices")
+    print(f"  load + compute   per-ticker {timings['per_ticker_compute']:8.2f}s  "
+          f"panel {timings['panel_compute']:8.2f}s  "
+          f"speedup {timings['per_ticker_compute'] / timings['panel_compute']:6.1f}x")
+    print(f"  with bulk write  per-ticker {timings['per_ticker_total']:8.2f}s  "
+          f"panel {timings['panel_total']:8.2f}s")
+    return timings
+
+
+def benchmark_price_storage(rows=1_000_000):
+    """
+    Compare ORM load time of OHLC columns as Decimals (the former DecimalField
+    storage, reproduced with Cast) and as float64 read through to_arrays()
+    """
+    from django.db.models import DecimalField
+    from django.db.models.functions import Cast
+
+    fields = ['open', 'high', 'low', 'close']
+
+    def run():
+        stocks = make_synthetic_universe(-(-rows // 504), years=2)
+        prices = StockPrice.objects.filter(stock__in=stocks)
+        timings = {}
+
+        decimals = prices.annotate(**{
+            f'{field}_decimal': Cast(field, DecimalField(max_digits=12, decimal_places=2)) for field in fields
+        })
+        start = time.perf_counter()
+        loaded = np.array(list(decimals.values_list(*(f'{field}_decimal' for field in fields))), dtype=float)
+        timings['decimal'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        np.array(list(prices.values_list(*fields)), dtype=float)
+        timings['float_values_list'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prices.to_arrays(*fields)
+        timings['float_to_arrays'] = time.perf_counter() - start
+        return len(loaded), timings
+
+    _, (count, timings) = _timed(run)
+
+    print(f"\nPrice storage: {count:,} rows x {len(fields)} price columns")
+    for name, elapsed in timings.items():
+        print(f"  {name:<18} {elapsed:8.2f}s  {count / elapsed:12,.0f} rows/sec")
+    print(f"  speedup            {timings['decimal'] / timings['float_to_arrays']:8.1f}x")
+    return timings
+
+
+def benchmark_monte_carlo(paths=100_000, holdings=50, horizon=10, repeats=5):
+    """
+    Time simulate_portfolio on a synthetic correlated covariance (one common
+    factor plus idiosyncratic noise); needs no database rows
+    """
+    from scripts.risk_engine import simulate_portfolio
+
+    rng = np.random.default_rng(0)
+    loadings = rng.uniform(0.5, 1.5, holdings)
+    covariance = 0.01 ** 2 * np.outer(loadings, loadings) + np.diag(rng.uniform(0.005, 0.02, holdings) ** 2)
+    mean = rng.normal(0.0003, 0.0002, holdings)
+    weights = rng.dirichlet(np.ones(holdings))
+
+    simulate_portfolio(mean, covariance, weights, horizon=horizon, simulations=min(paths, 1000), seed=0)
+    timings = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        result = simulate_portfolio(mean, covariance, weights, horizon=horizon, simulations=paths, seed=repeat)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"\nMonte Carlo: {paths:,} paths x {horizon} days x {holdings} holdings ({result['chunks']} chunks)")
+    print(f"  best of {repeats}      {best:8.3f}s  {paths / best:12,.0f} paths/sec")
+    print(f"  median          {np.median(timings):8.3f}s")
+    print(f"  VaR/CVaR 95%     {result['var']:.2f}% / {result['cvar']:.2f}% over {horizon} days")
+    return timings
+
+
+SCREEN_EXPRESSION = 'rsi14 < 30 and close > sma200 and volume > 2 * avg_vol_30'
+
+
+def make_synthetic_screener_universe(tickers, seed=0):
+    """A ScreenerUniverse of `tickers` random stocks with every column filled; no database rows"""
+    from scripts.screener import INDICATOR_COLUMNS, NUMERIC_COLUMNS, ScreenerUniverse
+
+    rng = np.random.default_rng(seed)
+    price = rng.lognormal(3.5, 1.0, tickers)
+    columns = {name: price * rng.uniform(0.8, 1.2, tickers) for name in NUMERIC_COLUMNS}
+    columns.update(
+        rsi14=rng.uniform(0, 100, tickers),
+        volume=rng.lognormal(13, 1.5, tickers).round(),
+        avg_vol_30=rng.lognormal(13, 1.2, tickers),
+        indicator_date=np.full(tickers, np.datetime64(datetime.now().date(), 'D')),
+        ticker=np.array([f'SYN{i:05d}' for i in range(tickers)], dtype=object),
+        company_name=np.array([f'Synthetic {i}' for i in range(tickers)], dtype=object),
+        sector=rng.choice(np.array(['Technology', 'Energy', 'Healthcare', 'Financials'], dtype=object), tickers),
+        industry=np.full(tickers, '', dtype=object),
+    )
+    # A few gaps so missing-value handling is part of the measured work
+    for name in INDICATOR_COLUMNS:
+        columns[name][rng.random(tickers) < 0.02] = np.nan
+    return ScreenerUniverse(np.arange(1, tickers + 1), columns)
+
+
+def benchmark_screener(tickers=10_000, expression=SCREEN_EXPRESSION, repeats=200):
+    """Time compiling and evaluating a screen expression over a synthetic in-memory universe"""
+    from scripts.screener import clear_expression_cache, compile_expression
+
+    universe = make_synthetic_screener_universe(tickers)
+
+    clear_expression_cache()
+    start = time.perf_counter()
+    compiled = compile_expression(expression)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        compile_expression(expression)
+    lookup_time = (time.perf_counter() - start) / repeats
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        matches = compiled(universe)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        positions = universe.screen(expression=compiled, sort='-market_cap')
+    screen_time = (time.perf_counter() - start) / repeats
+
+    best = min(timings)
+    print(f"\nScreener: {expression!r} over {tickers:,} tickers ({int(matches.sum()):,} matches)")
+    print(f"  compile         {compile_time * 1000:8.3f}ms")
+    print(f"  cached compile  {lookup_time * 1e6:8.3f}us")
+    print(f"  evaluate best   {best * 1000:8.3f}ms  {tickers / best:14,.0f} tickers/sec")
+    print(f"  evaluate median {np.median(timings) * 1000:8.3f}ms")
+    print(f"  screen + sort   {screen_time * 1000:8.3f}ms  ({len(positions):,} rows)")
+    return timings
+
+
+BENCHMARKS = {
+    'ingestion': benchmark_price_ingestion,
+    'indicators': benchmark_indicator_save,
+    'panel': benchmark_indicator_panel,
+    'storage': benchmark_price_storage,
+    'montecarlo': benchmark_monte_carlo,
+    'screener': benchmark_screener,
+}
+
+
+def main():
+    """Main function for standalone execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run pipeline benchmarks')
+    parser.add_argument('suite', choices=sorted(BENCHMARKS), help='Benchmark to run')
+    parser.add_argument('--years', type=int, default=20, help='Years of synthetic history')
+    parser.add_argument('--tickers', type=int, default=500, help='Number of synthetic tickers')
+    parser.add_argument('--days', type=int, default=365, help='Days of prices to calculate indicators over')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Price rows to load for the storage benchmark')
+    parser.add_argument('--paths', type=int, default=100_000, help='Simulated paths for the Monte Carlo benchmark')
+    parser.add_argument('--holdings', type=int, default=50, help='Portfolio holdings for the Monte Carlo benchmark')
+    parser.add_argument('--horizon', type=int, default=10, help='Trading days per simulated path')
+    parser.add_argument('--universe', type=int, default=10_000, help='Tickers in the screener benchmark universe')
+    parser.add_argument('--expression', default=SCREEN_EXPRESSION, help='Screen expression to benchmark')
+
+    args = parser.parse_args()
+
+    if args.suite == 'ingestion':
+        benchmark_price_ingestion(years=args.years)
+    elif args.suite == 'indicators':
+        benchmark_indicator_save(tickers=args.tickers, days=args.days)
+    elif args.suite == 'panel':
+        benchmark_indicator_panel(tickers=args.tickers, days=args.days)
+    elif args.suite == 'storage':
+        benchmark_price_storage(rows=args.rows)
+    elif args.suite == 'montecarlo':
+        benchmark_monte_carlo(paths=args.paths, holdings=args.holdings, horizon=args.horizon)
+    elif args.suite == 'screener':
+        benchmark_screener(tickers=args.universe, expression=args.expression)
+
+
+if __name__ == '__main__':
+    main()
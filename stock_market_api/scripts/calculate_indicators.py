@@ -3,9 +3,11 @@ Script to calculate technical indicators for stocks
 """
 import os
 import sys
+import time
 import django
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 # Setup Django environment
@@ -13,15 +15,32 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 django.setup()
 
-from stocks.models import Stock, StockPrice, TechnicalIndicator
-from django.db import transaction
+from stocks.models import Stock, StockPrice, TechnicalIndicator, IndicatorState, IndicatorSnapshot
+from scripts.indicator_graph import IndicatorGraph, parse_indicator_types, select_specs
+from django.db import connections, transaction
 
 
 class TechnicalIndicatorCalculator:
     """Calculate various technical indicators"""
     
+    # Bars before the first new date that each windowed indicator needs so an
+    # incremental run reproduces a full recompute
+    WINDOW_LOOKBACK = {
+        ('SMA', 20): 19,
+        ('SMA', 50): 49,
+        ('SMA', 200): 199,
+        ('RSI', 14): 14,
+        ('BB', 20): 19,
+        ('STOCH', 14): 15,
+        ('ADX', 14): 27,
+        ('ATR', 14): 14,
+    }
+    
+    # Indicators updated from stored smoothed values instead of a price window
+    RECURSIVE_INDICATORS = [('EMA', 12), ('EMA', 26), ('MACD', 26)]
+    
     def __init__(self):
-        pass
+        self.worker_stats = {}
     
     def get_price_data(self, ticker, days=365):
         """Get historical price data as DataFrame"""
@@ -33,112 +52,72 @@ class TechnicalIndicatorCalculator:
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        prices = StockPrice.objects.filter(
+        df = self.prices_to_frame(StockPrice.objects.filter(
             stock=stock,
             date__gte=start_date,
             date__lte=end_date
-        ).order_by('date').values('date', 'open', 'high', 'low', 'close', 'volume')
+        ))
         
-        if not prices:
+        if df is None:
             print(f"No price data found for {ticker}")
             return None, None
         
-        df = pd.DataFrame(prices)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.set_index('date')
+        return stock, df
+    
+    def prices_to_frame(self, prices):
+        """Date-indexed float DataFrame from a StockPrice queryset, or None when it is empty"""
+        arrays = prices.order_by('date').to_arrays('date', 'open', 'high', 'low', 'close', 'volume')
+        if not len(arrays['date']):
+            return None
         
-        # Convert all price columns to float for calculations
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['close'] = df['close'].astype(float)
-        df['volume'] = df['volume'].astype(float)
+        index = pd.DatetimeIndex(arrays.pop('date').astype('datetime64[ns]'), name='date')
+        arrays['volume'] = arrays['volume'].astype(float)
+        return pd.DataFrame(arrays, index=index)
+    
+    def get_price_data_since(self, stock, last_date, lookback):
+        """Prices after last_date plus the `lookback` bars up to and including it"""
+        window = list(StockPrice.objects.filter(
+            stock=stock,
+            date__lte=last_date
+        ).order_by('-date').values_list('date', flat=True)[:lookback])
+        start_date = window[-1] if window else last_date
         
-        return stock, df
+        return self.prices_to_frame(StockPrice.objects.filter(
+            stock=stock,
+            date__gte=start_date
+        ))
     
     def calculate_sma(self, df, period=20):
         """Calculate Simple Moving Average"""
-        return df['close'].rolling(window=period).mean()
+        return IndicatorGraph(df).rolling_mean(period)
     
     def calculate_ema(self, df, period=20):
         """Calculate Exponential Moving Average"""
-        return df['close'].ewm(span=period, adjust=False).mean()
+        return IndicatorGraph(df).ema(period)
     
     def calculate_rsi(self, df, period=14):
         """Calculate Relative Strength Index"""
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return IndicatorGraph(df).rsi(period)[0]
     
     def calculate_macd(self, df, fast=12, slow=26, signal=9):
         """Calculate MACD (Moving Average Convergence Divergence)"""
-        exp1 = df['close'].ewm(span=fast, adjust=False).mean()
-        exp2 = df['close'].ewm(span=slow, adjust=False).mean()
-        macd = exp1 - exp2
-        signal_line = macd.ewm(span=signal, adjust=False).mean()
-        histogram = macd - signal_line
-        
-        return macd, signal_line, histogram
+        return tuple(IndicatorGraph(df).macd(fast, slow, signal))
     
     def calculate_bollinger_bands(self, df, period=20, std_dev=2):
         """Calculate Bollinger Bands"""
-        sma = df['close'].rolling(window=period).mean()
-        std = df['close'].rolling(window=period).std()
-        
-        upper_band = sma + (std * std_dev)
-        lower_band = sma - (std * std_dev)
-        
-        return upper_band, sma, lower_band
+        return tuple(IndicatorGraph(df).bollinger_bands(period, std_dev))
     
     def calculate_stochastic(self, df, period=14):
         """Calculate Stochastic Oscillator"""
-        low_min = df['low'].rolling(window=period).min()
-        high_max = df['high'].rolling(window=period).max()
-        
-        k_percent = 100 * (df['close'] - low_min) / (high_max - low_min)
-        d_percent = k_percent.rolling(window=3).mean()
-        
-        return k_percent, d_percent
+        return tuple(IndicatorGraph(df).stochastic(period))
     
     def calculate_adx(self, df, period=14):
         """Calculate Average Directional Index"""
-        # Calculate True Range
-        high_low = df['high'] - df['low']
-        high_close = np.abs(df['high'] - df['close'].shift())
-        low_close = np.abs(df['low'] - df['close'].shift())
-        
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-        
-        # Calculate Directional Movement
-        up_move = df['high'] - df['high'].shift()
-        down_move = df['low'].shift() - df['low']
-        
-        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
-        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
-        
-        plus_di = 100 * pd.Series(plus_dm).rolling(window=period).mean() / atr
-        minus_di = 100 * pd.Series(minus_dm).rolling(window=period).mean() / atr
-        
-        dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
-        adx = dx.rolling(window=period).mean()
-        
-        return adx
+        return IndicatorGraph(df).adx(period)[0]
     
     def calculate_atr(self, df, period=14):
         """Calculate Average True Range"""
-        high_low = df['high'] - df['low']
-        high_close = np.abs(df['high'] - df['close'].shift())
-        low_close = np.abs(df['low'] - df['close'].shift())
-        
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-        
-        return atr
+        return IndicatorGraph(df).atr(period)
     
     def save_indicators(self, stock, indicator_type, data, period=14):
         """Save calculated indicators to database"""
@@ -183,8 +162,114 @@ class TechnicalIndicatorCalculator:
             print(f"Error saving {indicator_type} indicators: {str(e)}")
             return 0
     
-    def calculate_all_indicators(self, ticker, days=365):
-        """Calculate all indicators for a stock"""
+    def compute_indicators(self, df, types=None):
+        """
+        Calculate indicators for a price frame, all of them unless `types`
+        limits the run (e.g. ['RSI']). Shared intermediates are computed once
+        through IndicatorGraph.
+        Returns a list of (indicator_type, period, [series, ...]) where the
+        series list holds value, value2, value3 for multi-value indicators.
+        """
+        return IndicatorGraph(df).compute(types)
+    
+    def build_indicator_rows(self, stock, indicator_type, series, period=14):
+        """Turn calculated series into unsaved TechnicalIndicator rows, skipping incomplete dates"""
+        frame = pd.concat(series, axis=1).replace([np.inf, -np.inf], np.nan).dropna()
+        if frame.empty:
+            return []
+        values = [frame.iloc[:, i].to_numpy(dtype=float) for i in range(frame.shape[1])]
+        value2 = values[1] if len(values) > 1 else [None] * len(frame)
+        value3 = values[2] if len(values) > 2 else [None] * len(frame)
+        
+        return [
+            TechnicalIndicator(
+                stock=stock,
+                indicator_type=indicator_type,
+                date=date,
+                period=period,
+                value=v1,
+                value2=v2,
+                value3=v3,
+            )
+            for date, v1, v2, v3 in zip(frame.index.date, values[0], value2, value3)
+        ]
+    
+    def build_snapshot(self, stock_id, specs, rows):
+        """
+        IndicatorSnapshot holding the newest row of each calculated
+        (indicator_type, period) in `specs`; columns of specs without rows are
+        cleared. Returns None when there are no rows at all.
+        """
+        latest = {}
+        for row in rows:
+            key = (row.indicator_type, row.period)
+            if key not in latest or row.date > latest[key].date:
+                latest[key] = row
+        if not latest:
+            return None
+        
+        values = {}
+        for key in specs:
+            row = latest.get(key)
+            row_values = (row.value, row.value2, row.value3) if row else (None, None, None)
+            for column, value in zip(IndicatorSnapshot.COLUMNS.get(key, []), row_values):
+                values[column] = value
+        
+        return IndicatorSnapshot(stock_id=stock_id, date=max(row.date for row in latest.values()), **values)
+    
+    def upsert_snapshots(self, snapshots, specs):
+        """Insert or update IndicatorSnapshot rows, touching only the columns of `specs`"""
+        fields = [column for key in specs for column in IndicatorSnapshot.COLUMNS.get(key, [])]
+        IndicatorSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['stock'],
+            update_fields=['date', 'updated_at', *fields],
+        )
+    
+    def save_indicators_bulk(self, stock, results, batch_size=2000, states=None):
+        """
+        Upsert every indicator row for a stock with bulk_create(update_conflicts=True).
+        `results` is the list returned by compute_indicators. The stock's
+        IndicatorSnapshot, and IndicatorState rows passed in `states`, are
+        upserted in the same transaction.
+        """
+        rows = []
+        for indicator_type, period, series in results:
+            rows.extend(self.build_indicator_rows(stock, indicator_type, series, period=period))
+        specs = [(indicator_type, period) for indicator_type, period, _ in results]
+        snapshot = self.build_snapshot(stock.id, specs, rows)
+        
+        try:
+            with transaction.atomic():
+                self.upsert_indicator_rows(rows, batch_size=batch_size)
+                if snapshot:
+                    self.upsert_snapshots([snapshot], specs)
+                if states:
+                    IndicatorState.objects.bulk_create(
+                        states,
+                        update_conflicts=True,
+                        unique_fields=['stock', 'indicator_type', 'period'],
+                        update_fields=['last_date', 'state', 'updated_at'],
+                    )
+            print(f"Saved {len(rows)} indicator rows")
+            return len(rows)
+        except Exception as e:
+            print(f"Error saving indicators for {stock.ticker}: {str(e)}")
+            return 0
+    
+    def upsert_indicator_rows(self, rows, batch_size=2000):
+        """Insert or overwrite TechnicalIndicator rows on (stock, type, date, period)"""
+        TechnicalIndicator.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['stock', 'indicator_type', 'date', 'period'],
+            update_fields=['value', 'value2', 'value3'],
+        )
+    
+    def calculate_all_indicators(self, ticker, days=365, bulk=True, types=None):
+        """Calculate all indicators for a stock, or only the given types"""
         stock, df = self.get_price_data(ticker, days)
         
         if stock is None or df is None:
@@ -193,52 +278,141 @@ class TechnicalIndicatorCalculator:
         print(f"\nCalculating indicators for {ticker}...")
         
         try:
-            # SMA (20, 50, 200)
-            sma_20 = self.calculate_sma(df, 20)
-            self.save_indicators(stock, 'SMA', sma_20, period=20)
-            
-            sma_50 = self.calculate_sma(df, 50)
-            self.save_indicators(stock, 'SMA', sma_50, period=50)
-            
-            sma_200 = self.calculate_sma(df, 200)
-            self.save_indicators(stock, 'SMA', sma_200, period=200)
-            
-            # EMA (12, 26)
-            ema_12 = self.calculate_ema(df, 12)
-            self.save_indicators(stock, 'EMA', ema_12, period=12)
+            results = self.compute_indicators(df, types)
             
-            ema_26 = self.calculate_ema(df, 26)
-            self.save_indicators(stock, 'EMA', ema_26, period=26)
-            
-            # RSI
-            rsi = self.calculate_rsi(df, 14)
-            self.save_indicators(stock, 'RSI', rsi, period=14)
+            if bulk:
+                self.save_indicators_bulk(stock, results)
+            else:
+                # Row-by-row update_or_create, one series at a time
+                for indicator_type, period, series in results:
+                    if len(series) == 1:
+                        data = series[0]
+                    else:
+                        data = pd.Series({date: tuple(values) for date, *values in zip(df.index, *series)})
+                    self.save_indicators(stock, indicator_type, data, period=period)
+                
+                rows = [
+                    row for indicator_type, period, series in results
+                    for row in self.build_indicator_rows(stock, indicator_type, series, period=period)
+                ]
+                specs = [(indicator_type, period) for indicator_type, period, _ in results]
+                snapshot = self.build_snapshot(stock.id, specs, rows)
+                if snapshot:
+                    self.upsert_snapshots([snapshot], specs)
             
-            # MACD
-            macd, signal, histogram = self.calculate_macd(df)
-            macd_combined = pd.Series({date: (m, s, h) 
-                                      for date, m, s, h in zip(df.index, macd, signal, histogram)})
-            self.save_indicators(stock, 'MACD', macd_combined, period=26)
+            print(f"✓ Successfully calculated all indicators for {ticker}")
+            return True
+        except Exception as e:
+            print(f"✗ Error calculating indicators for {ticker}: {str(e)}")
+            return False
+    
+    def ema_step(self, previous, values, period):
+        """Continue an ewm(span=period, adjust=False) series from its last value"""
+        alpha = 2 / (period + 1)
+        result = []
+        for value in values:
+            previous = alpha * value + (1 - alpha) * previous
+            result.append(previous)
+        return np.array(result)
+    
+    def build_states(self, stock, last_date, ema, macd):
+        """IndicatorState rows for every indicator after calculating through last_date"""
+        states = [
+            IndicatorState(stock=stock, indicator_type=indicator_type, period=period,
+                           last_date=last_date, state={})
+            for indicator_type, period in self.WINDOW_LOOKBACK
+        ]
+        for period, value in ema.items():
+            states.append(IndicatorState(stock=stock, indicator_type='EMA', period=period,
+                                         last_date=last_date, state={'ema': float(value)}))
+        states.append(IndicatorState(stock=stock, indicator_type='MACD', period=26,
+                                     last_date=last_date, state={key: float(value) for key, value in macd.items()}))
+        return states
+    
+    def calculate_incremental(self, ticker, days=365):
+        """
+        Calculate only the dates after each indicator's stored IndicatorState.
+        EMA and MACD continue from their stored smoothed values; windowed
+        indicators reload just the trailing bars they need. Stocks without
+        state are calculated in full over `days` once to seed it.
+        """
+        stock = Stock.objects.filter(ticker=ticker.upper()).first()
+        if not stock:
+            print(f"Stock {ticker} not found")
+            return False
+        
+        states = {(state.indicator_type, state.period): state for state in stock.indicator_states.all()}
+        if any(key not in states for key in list(self.WINDOW_LOOKBACK) + self.RECURSIVE_INDICATORS):
+            return self.seed_incremental(ticker, days)
+        
+        since = min(state.last_date for state in states.values())
+        df = self.get_price_data_since(stock, since, max(self.WINDOW_LOOKBACK.values()))
+        if df is None or df.index[-1].date() <= since:
+            print(f"Indicators for {ticker} are up to date")
+            return True
+        
+        print(f"\nUpdating indicators for {ticker} after {since}...")
+        
+        try:
+            results = []
+            for (indicator_type, period), lookback in self.WINDOW_LOOKBACK.items():
+                last_date = pd.Timestamp(states[(indicator_type, period)].last_date)
+                first_new = df.index.searchsorted(last_date, side='right')
+                window = df.iloc[max(first_new - lookback, 0):]
+                series = IndicatorGraph(window).indicator(indicator_type, period)
+                results.append((indicator_type, period, [values[values.index > last_date] for values in series]))
             
-            # Bollinger Bands
-            upper, middle, lower = self.calculate_bollinger_bands(df)
-            bb_combined = pd.Series({date: (u, m, l) 
-                                    for date, u, m, l in zip(df.index, upper, middle, lower)})
-            self.save_indicators(stock, 'BB', bb_combined, period=20)
+            ema = {}
+            for period in (12, 26):
+                state = states[('EMA', period)]
+                new = df[df.index > pd.Timestamp(state.last_date)]
+                values = self.ema_step(state.state['ema'], new['close'], period)
+                results.append(('EMA', period, [pd.Series(values, index=new.index)]))
+                ema[period] = values[-1] if len(values) else state.state['ema']
             
-            # Stochastic
-            k, d = self.calculate_stochastic(df)
-            stoch_combined = pd.Series({date: (k_val, d_val) 
-                                       for date, k_val, d_val in zip(df.index, k, d)})
-            self.save_indicators(stock, 'STOCH', stoch_combined, period=14)
+            state = states[('MACD', 26)]
+            new = df[df.index > pd.Timestamp(state.last_date)]
+            fast = self.ema_step(state.state['fast'], new['close'], 12)
+            slow = self.ema_step(state.state['slow'], new['close'], 26)
+            signal = self.ema_step(state.state['signal'], fast - slow, 9)
+            results.append(('MACD', 26, [
+                pd.Series(fast - slow, index=new.index),
+                pd.Series(signal, index=new.index),
+                pd.Series(fast - slow - signal, index=new.index),
+            ]))
+            macd = {'fast': fast[-1], 'slow': slow[-1], 'signal': signal[-1]} if len(new) else state.state
             
-            # ADX
-            adx = self.calculate_adx(df)
-            self.save_indicators(stock, 'ADX', adx, period=14)
+            new_states = self.build_states(stock, df.index[-1].date(), ema, macd)
+            self.save_indicators_bulk(stock, results, states=new_states)
             
-            # ATR
-            atr = self.calculate_atr(df)
-            self.save_indicators(stock, 'ATR', atr, period=14)
+            print(f"✓ Successfully updated indicators for {ticker}")
+            return True
+        except Exception as e:
+            print(f"✗ Error updating indicators for {ticker}: {str(e)}")
+            return False
+    
+    def seed_incremental(self, ticker, days=365):
+        """Full calculation that also stores the state incremental runs continue from"""
+        stock, df = self.get_price_data(ticker, days)
+        
+        if stock is None or df is None:
+            return False
+        
+        print(f"\nCalculating indicators for {ticker} (seeding incremental state)...")
+        
+        try:
+            graph = IndicatorGraph(df)
+            results = graph.compute()
+            fast = graph.ema(12)
+            slow = graph.ema(26)
+            signal = graph.macd()[1]
+            states = self.build_states(
+                stock,
+                df.index[-1].date(),
+                ema={12: fast.iloc[-1], 26: slow.iloc[-1]},
+                macd={'fast': fast.iloc[-1], 'slow': slow.iloc[-1], 'signal': signal.iloc[-1]},
+            )
+            self.save_indicators_bulk(stock, results, states=states)
             
             print(f"✓ Successfully calculated all indicators for {ticker}")
             return True
@@ -246,8 +420,120 @@ class TechnicalIndicatorCalculator:
             print(f"✗ Error calculating indicators for {ticker}: {str(e)}")
             return False
     
-    def calculate_for_all_stocks(self, days=365):
-        """Calculate indicators for all stocks in database"""
+    def calculate_panel(self, stocks, days=365, types=None):
+        """
+        Calculate indicators for many stocks at once with the NumPy panel engine.
+        Tickers with holes in their price history fall back to the per-ticker path.
+        Returns (success_count, failed_count).
+        """
+        from scripts.indicator_panel import IndicatorPanel
+        
+        panel = IndicatorPanel.load(stocks, days=days)
+        results = panel.compute(select_specs(types))
+        contiguous = panel.contiguous_columns()
+        
+        success_count = 0
+        failed_count = 0
+        
+        for column, stock in enumerate(panel.stocks):
+            if contiguous[column]:
+                saved = self.save_indicators_bulk(stock, panel.column_results(results, column))
+                ok = saved > 0
+            else:
+                ok = self.calculate_all_indicators(stock.ticker, days, bulk=True, types=types)
+            
+            if ok:
+                success_count += 1
+            else:
+                failed_count += 1
+        
+        return success_count, failed_count
+    
+    def calculate_parallel(self, stocks, days=365, processes=4, chunk_size=10, types=None):
+        """
+        Shard tickers across a process pool. Workers only read prices and
+        compute; their rows come back here and are upserted by this process.
+        Per-worker throughput is collected in self.worker_stats.
+        Returns (success_count, failed_count).
+        """
+        tickers = [stock.ticker for stock in stocks]
+        shards = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+        specs = select_specs(types)
+        self.worker_stats = {}
+        
+        success_count = 0
+        failed_count = 0
+        
+        # Forked workers must not inherit this process's open connection
+        connections.close_all()
+        
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as executor:
+            futures = [executor.submit(_calculate_shard, shard, days, types) for shard in shards]
+            
+            for future in as_completed(futures):
+                shard = future.result()
+                rows = [
+                    TechnicalIndicator(
+                        stock_id=stock_id,
+                        indicator_type=indicator_type,
+                        date=date,
+                        period=period,
+                        value=value,
+                        value2=value2,
+                        value3=value3,
+                    )
+                    for stock_id, indicator_type, date, period, value, value2, value3 in shard['rows']
+                ]
+                rows_by_stock = {}
+                for row in rows:
+                    rows_by_stock.setdefault(row.stock_id, []).append(row)
+                snapshots = [
+                    self.build_snapshot(stock_id, specs, stock_rows)
+                    for stock_id, stock_rows in rows_by_stock.items()
+                ]
+                
+                try:
+                    with transaction.atomic():
+                        self.upsert_indicator_rows(rows)
+                        if snapshots:
+                            self.upsert_snapshots(snapshots, specs)
+                    success_count += len(shard['success'])
+                    failed_count += len(shard['failed'])
+                    print(f"Saved {len(rows)} indicator rows for {len(shard['success'])} stocks")
+                except Exception as e:
+                    print(f"Error saving indicators for {', '.join(shard['success'])}: {str(e)}")
+                    failed_count += len(shard['success']) + len(shard['failed'])
+                
+                stats = self.worker_stats.setdefault(shard['pid'], {'tickers': 0, 'rows': 0, 'seconds': 0.0})
+                stats['tickers'] += len(shard['success']) + len(shard['failed'])
+                stats['rows'] += len(rows)
+                stats['seconds'] += shard['elapsed']
+        
+        return success_count, failed_count
+    
+    def worker_summary(self):
+        """Lines describing per-worker throughput of the last parallel run"""
+        lines = []
+        for i, (pid, stats) in enumerate(sorted(self.worker_stats.items()), 1):
+            rate = stats['tickers'] / stats['seconds'] if stats['seconds'] else 0.0
+            lines.append(
+                f"Worker {i} (pid {pid}): {stats['tickers']} stocks, {stats['rows']} rows "
+                f"in {stats['seconds']:.1f}s ({rate:.1f} stocks/sec)"
+            )
+        return lines
+    
+    def calculate_for_all_stocks(self, days=365, bulk=True, panel=False, incremental=False, processes=1, types=None):
+        """
+        Calculate indicators for all stocks in database. `types` limits a full
+        calculation to some indicator types; incremental runs always update
+        every type so their stored state stays consistent. `processes` only
+        applies to full per-ticker calculations; panel and incremental runs
+        are single-process.
+        """
+        if processes > 1 and (panel or incremental):
+            mode = 'panel' if panel else 'incremental'
+            print(f"Warning: processes={processes} is ignored for {mode} calculation; running in one process")
+        
         stocks = Stock.objects.filter(is_active=True)
         total = stocks.count()
         
@@ -256,10 +542,22 @@ class TechnicalIndicatorCalculator:
         success_count = 0
         failed_count = 0
         
+        if panel:
+            success_count, failed_count = self.calculate_panel(stocks, days, types=types)
+            stocks = []
+        elif processes > 1 and not incremental:
+            success_count, failed_count = self.calculate_parallel(stocks, days, processes=processes, types=types)
+            stocks = []
+        
         for i, stock in enumerate(stocks, 1):
             print(f"\n[{i}/{total}] Processing {stock.ticker}...")
             
-            if self.calculate_all_indicators(stock.ticker, days):
+            if incremental:
+                ok = self.calculate_incremental(stock.ticker, days)
+            else:
+                ok = self.calculate_all_indicators(stock.ticker, days, bulk=bulk, types=types)
+            
+            if ok:
                 success_count += 1
             else:
                 failed_count += 1
@@ -268,11 +566,55 @@ class TechnicalIndicatorCalculator:
         print(f"Calculation complete:")
         print(f"  ✓ Successful: {success_count}")
         print(f"  ✗ Failed: {failed_count}")
+        for line in self.worker_summary():
+            print(f"  {line}")
         print(f"{'='*50}")
         
         return success_count, failed_count
 
 
+def _init_worker():
+    """Process pool initializer: drop the database connection inherited on fork"""
+    connections.close_all()
+
+
+def _calculate_shard(tickers, days, types=None):
+    """
+    Process pool task: compute indicators for a shard of tickers and return
+    them as plain tuples for the parent process to write
+    """
+    calculator = TechnicalIndicatorCalculator()
+    start = time.perf_counter()
+    rows = []
+    success = []
+    failed = []
+    
+    for ticker in tickers:
+        stock, df = calculator.get_price_data(ticker, days)
+        if stock is None or df is None:
+            failed.append(ticker)
+            continue
+        
+        try:
+            for indicator_type, period, series in calculator.compute_indicators(df, types):
+                rows.extend(
+                    (stock.id, row.indicator_type, row.date, row.period, row.value, row.value2, row.value3)
+                    for row in calculator.build_indicator_rows(stock, indicator_type, series, period=period)
+                )
+            success.append(ticker)
+        except Exception as e:
+            print(f"✗ Error calculating indicators for {ticker}: {str(e)}")
+            failed.append(ticker)
+    
+    return {
+        'pid': os.getpid(),
+        'rows': rows,
+        'success': success,
+        'failed': failed,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
 def main():
     """Main function for standalone execution"""
     import argparse
@@ -284,15 +626,32 @@ def main():
                        help='Number of days of historical data to use')
     parser.add_argument('--types', type=str, 
                        help='Comma-separated list of indicator types (SMA,EMA,RSI,MACD,BB,STOCH,ADX,ATR)')
+    parser.add_argument('--panel', action='store_true',
+                       help='With --all, compute every ticker at once with the NumPy panel engine')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Only calculate dates after the stored indicator state')
+    parser.add_argument('--processes', type=int, default=1,
+                       help='With --all, spread the calculation over N worker processes')
     
     args = parser.parse_args()
     
+    try:
+        types = parse_indicator_types(args.types)
+    except ValueError as e:
+        parser.error(str(e))
+    if types and args.incremental:
+        parser.error('--types cannot be combined with --incremental')
+    
     calculator = TechnicalIndicatorCalculator()
     
     if args.all:
-        calculator.calculate_for_all_stocks(days=args.days)
+        calculator.calculate_for_all_stocks(
+            days=args.days, panel=args.panel, incremental=args.incremental, processes=args.processes, types=types
+        )
+    elif args.ticker and args.incremental:
+        calculator.calculate_incremental(args.ticker, days=args.days)
     elif args.ticker:
-        calculator.calculate_all_indicators(args.ticker, days=args.days)
+        calculator.calculate_all_indicators(args.ticker, days=args.days, types=types)
     else:
         parser.print_help()
 
@@ -0,0 +1,154 @@
+"""
+Precomputed daily performance metrics
+Bars for a batch of stocks are read with one query and laid out as a
+bars x stocks matrix in which every column is one stock's own history,
+right-aligned on its latest bar. Trailing returns, realized volatility and
+average volume for every date are then column-wise array operations, stored
+in DailyMetrics so pages read them with an indexed range scan instead of
+aggregating prices per request.
+"""
+import os
+import sys
+import django
+import numpy as np
+from datetime import datetime, timedelta
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from stocks.models import DailyMetrics, Stock, StockPrice
+from scripts.indicator_panel import rolling_mean, rolling_std, shift
+
+
+# DailyMetrics column -> bars looked back
+RETURN_PERIODS = {
+    'return_1d': 1,
+    'return_5d': 5,
+    'return_1m': 21,
+    'return_3m': 63,
+    'return_1y': 252,
+}
+WINDOW = 21  # Bars in the '30-day' volatility and volume columns
+TRADING_DAYS = 252
+# Calendar days of history needed before the first refreshed date: 252 bars or the previous year-end close
+LOOKBACK_DAYS = 400
+
+METRIC_FIELDS = list(RETURN_PERIODS) + ['return_ytd', 'volatility_30d', 'avg_volume_30d']
+
+
+def bar_matrix(stock_ids, dates, *columns):
+    """
+    Lay out rows sorted by (stock, date) as (bars x stocks) matrices with
+    each stock's bars right-aligned at the bottom and NaN (NaT for dates)
+    above its first bar. Returns (stocks, dates, [one matrix per column]).
+    """
+    stocks, starts, counts = np.unique(stock_ids, return_index=True, return_counts=True)
+    length = int(counts.max()) if len(counts) else 0
+    group = np.repeat(np.arange(len(stocks)), counts)
+    rows = length - counts[group] + (np.arange(len(stock_ids)) - starts[group])
+
+    date_matrix = np.full((length, len(stocks)), np.datetime64('NaT'), dtype='datetime64[D]')
+    date_matrix[rows, group] = dates
+    matrices = []
+    for column in columns:
+        matrix = np.full((length, len(stocks)), np.nan)
+        matrix[rows, group] = column
+        matrices.append(matrix)
+    return stocks, date_matrix, matrices
+
+
+def compute_metrics(dates, closes, volumes):
+    """
+    {DailyMetrics field: (bars x stocks) array} for right-aligned bar
+    matrices. A value is NaN until the stock has enough bars behind it.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            name: (closes / shift(closes, periods) - 1) * 100
+            for name, periods in RETURN_PERIODS.items()
+        }
+
+        # YTD: against the bar before each column's first bar of the current year
+        years = dates.astype('datetime64[Y]')
+        rows = np.arange(len(dates))[:, None]
+        year_starts = np.ones(dates.shape, dtype=bool)
+        year_starts[1:] = years[1:] != years[:-1]
+        base_rows = np.maximum.accumulate(np.where(year_starts, rows - 1, -1), axis=0)
+        base_closes = np.take_along_axis(closes, np.maximum(base_rows, 0), axis=0)
+        base_closes[base_rows < 0] = np.nan
+        metrics['return_ytd'] = (closes / base_closes - 1) * 100
+
+        returns = closes / shift(closes) - 1
+        metrics['volatility_30d'] = rolling_std(returns, WINDOW) * np.sqrt(TRADING_DAYS) * 100
+        metrics['avg_volume_30d'] = rolling_mean(volumes, WINDOW)
+    return metrics
+
+
+def _nullable(values):
+    """Floats with NaN as None, for model fields"""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def update_daily_metrics(tickers=None, days=None, end_date=None, batch_size=500):
+    """
+    Recompute DailyMetrics rows dated within the last `days` calendar days up
+    to `end_date` (every stored date when days is None) for `tickers` or all
+    active stocks. Bars are loaded `batch_size` stocks per query with enough
+    history behind the first refreshed date for the 1y and YTD returns.
+    Returns the number of rows written.
+    """
+    end_date = end_date or datetime.now().date()
+    start_date = end_date - timedelta(days=days) if days is not None else None
+
+    stocks = Stock.objects.filter(is_active=True)
+    if tickers:
+        stocks = Stock.objects.filter(ticker__in=[ticker.upper() for ticker in tickers])
+    stock_ids = list(stocks.order_by('id').values_list('id', flat=True))
+
+    written = 0
+    for batch_start in range(0, len(stock_ids), batch_size):
+        prices = StockPrice.objects.filter(stock_id__in=stock_ids[batch_start:batch_start + batch_size],
+                                           date__lte=end_date)
+        if start_date is not None:
+            prices = prices.filter(date__gte=start_date - timedelta(days=LOOKBACK_DAYS))
+        rows = prices.order_by('stock_id', 'date').to_arrays('stock_id', 'date', 'close', 'volume')
+        if not len(rows['stock_id']):
+            continue
+
+        batch_stocks, dates, (closes, volumes) = bar_matrix(
+            rows['stock_id'], rows['date'], rows['close'], rows['volume']
+        )
+        metrics = compute_metrics(dates, closes, volumes)
+
+        keep = ~np.isnat(dates)
+        if start_date is not None:
+            keep &= dates >= np.datetime64(start_date, 'D')
+        bar_rows, columns = np.nonzero(keep)
+        values = {name: _nullable(metrics[name][bar_rows, columns]) for name in METRIC_FIELDS}
+
+        DailyMetrics.objects.bulk_create(
+            [
+                DailyMetrics(
+                    stock_id=stock_id,
+                    date=date,
+                    close=close,
+                    volume=int(volume),
+                    **{name: values[name][i] for name in METRIC_FIELDS},
+                )
+                for i, (stock_id, date, close, volume) in enumerate(zip(
+                    batch_stocks[columns].tolist(),
+                    dates[bar_rows, columns].astype(object),
+                    closes[bar_rows, columns].tolist(),
+                    volumes[bar_rows, columns].tolist(),
+                ))
+            ],
+            update_conflicts=True,
+            unique_fields=['stock', 'date'],
+            update_fields=['close', 'volume'] + METRIC_FIELDS,
+            batch_size=1000,
+        )
+        written += len(bar_rows)
+
+    return written
@@ -25,17 +25,25 @@ def daily_update():
     # Step 1: Update stock prices (last 5 days to ensure we have latest)
     print("Step 1: Updating stock prices...")
     fetcher = StockDataFetcher()
-    success, failed = fetcher.update_all_stocks(period='5d')
+    success, failed = fetcher.update_all_stocks(period='5d', batch_size=100, incremental=True)
     print(f"Price update: {success} successful, {failed} failed\n")
     
-    # Step 2: Calculate indicators (last 90 days for faster processing)
+    # Step 2: Update indicators from their stored state (90 days when seeding a stock)
     print("Step 2: Calculating technical indicators...")
     try:
-        call_command('calculate_indicators', all=True, days=90)
+        call_command('calculate_indicators', all=True, days=90, incremental=True)
         print("Indicator calculation completed\n")
     except Exception as e:
         print(f"Error calculating indicators: {e}\n")
     
+    # Step 3: Refresh precomputed returns for the days the price update covers
+    print("Step 3: Updating daily metrics...")
+    try:
+        call_command('calculate_daily_metrics', days=7)
+        print("Daily metrics update completed\n")
+    except Exception as e:
+        print(f"Error updating daily metrics: {e}\n")
+    
     print(f"{'='*60}")
     print(f"Daily Update Complete - {datetime.now()}")
     print(f"{'='*60}\n")
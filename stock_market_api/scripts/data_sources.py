@@ -0,0 +1,294 @@
+"""
+Market data sources used by the fetcher
+StockDataFetcher talks to a MarketDataSource instead of calling yfinance
+directly, so tests and benchmarks can swap in an offline source
+"""
+import json
+import os
+import re
+import pandas as pd
+import yfinance as yf
+
+
+class MarketDataSource:
+    """Interface implemented by every market data backend"""
+
+    def get_info(self, ticker):
+        """Return the raw info dict for a ticker (yfinance `Ticker.info` keys)"""
+        raise NotImplementedError
+
+    def get_history(self, ticker, period='1y', interval='1d', start=None):
+        """
+        Return an OHLCV DataFrame indexed by date, or an empty frame.
+        When `start` is given it takes precedence over `period`.
+        """
+        raise NotImplementedError
+
+    def get_history_batch(self, tickers, period='1y', interval='1d', start=None):
+        """
+        Return {ticker: DataFrame} for many tickers. Backends that support
+        multi-symbol requests override this; the default loops over get_history.
+        """
+        histories = {}
+        for ticker in tickers:
+            hist = self.get_history(ticker, period=period, interval=interval, start=start)
+            if hist is not None and not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+
+class YFinanceDataSource(MarketDataSource):
+    """Yahoo Finance backend"""
+
+    def get_info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def get_history(self, ticker, period='1y', interval='1d', start=None):
+        if start is not None:
+            return yf.Ticker(ticker).history(start=start, interval=interval)
+        return yf.Ticker(ticker).history(period=period, interval=interval)
+
+    def get_history_batch(self, tickers, period='1y', interval='1d', start=None):
+        """Download every ticker in one yf.download call and split the wide frame"""
+        frame = yf.download(
+            list(tickers),
+            period=None if start is not None else period,
+            start=start,
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=True,
+            threads=False,
+            progress=False,
+        )
+        return split_batch_frame(frame, tickers)
+
+
+class FixtureDataSource(MarketDataSource):
+    """In-memory source backed by dicts, for offline tests"""
+
+    def __init__(self, info=None, history=None):
+        self.info = info or {}
+        self.history = history or {}
+
+    def get_info(self, ticker):
+        if ticker not in self.info:
+            raise KeyError(f"No fixture info for {ticker}")
+        return self.info[ticker]
+
+    def get_history(self, ticker, period='1y', interval='1d', start=None):
+        hist = self.history.get(ticker, pd.DataFrame())
+        if start is not None and not hist.empty:
+            hist = hist[hist.index >= pd.Timestamp(start)]
+        return hist.copy()
+
+
+class LocalFileDataSource(MarketDataSource):
+    """
+    Replays a frozen dataset from disk. Layout under `root`:
+
+        history/<TICKER>.parquet or history/<TICKER>.csv   OHLCV indexed by date
+        info/<TICKER>.json                                 yfinance-style info dict
+
+    Periods are resolved relative to the last bar in each file, so a frozen
+    dataset replays identically whenever it is run. Loaded frames are kept in
+    memory; `memory_map` asks pandas/pyarrow to map files instead of reading them.
+    """
+
+    def __init__(self, root, memory_map=False):
+        self.root = str(root)
+        self.memory_map = memory_map
+        self._frames = {}
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def get_info(self, ticker):
+        with open(self._path('info', f'{ticker}.json')) as f:
+            return json.load(f)
+
+    def load_history(self, ticker):
+        """Full history for a ticker, read once and then served from memory"""
+        if ticker not in self._frames:
+            parquet_path = self._path('history', f'{ticker}.parquet')
+            csv_path = self._path('history', f'{ticker}.csv')
+            if os.path.exists(parquet_path):
+                hist = pd.read_parquet(parquet_path, memory_map=self.memory_map)
+            elif os.path.exists(csv_path):
+                hist = pd.read_csv(csv_path, index_col=0, parse_dates=True, memory_map=self.memory_map)
+            else:
+                hist = pd.DataFrame()
+            self._frames[ticker] = hist.sort_index()
+        return self._frames[ticker]
+
+    def get_history(self, ticker, period='1y', interval='1d', start=None):
+        hist = self.load_history(ticker)
+        if hist.empty:
+            return hist.copy()
+        if start is not None:
+            return hist[hist.index >= pd.Timestamp(start)].copy()
+        return slice_period(hist, period).copy()
+
+    def save_history(self, ticker, hist, file_format='csv'):
+        """Write a history frame into the dataset"""
+        os.makedirs(self._path('history'), exist_ok=True)
+        if file_format == 'parquet':
+            hist.to_parquet(self._path('history', f'{ticker}.parquet'))
+        else:
+            hist.to_csv(self._path('history', f'{ticker}.csv'))
+        self._frames.pop(ticker, None)
+
+    def save_info(self, ticker, info):
+        """Write an info dict into the dataset"""
+        os.makedirs(self._path('info'), exist_ok=True)
+        with open(self._path('info', f'{ticker}.json'), 'w') as f:
+            json.dump(info, f, default=str)
+
+
+class CachedDataSource(MarketDataSource):
+    """
+    Wraps another source with a persistent ResponseCache. Info fields are
+    cached per class so slow-moving metadata outlives quotes:
+
+        static       company name, sector, industry, exchange, currency
+        fundamental  market cap, P/E, dividend yield
+        quote        everything else (prices, volume)
+    """
+
+    STATIC_FIELDS = ('longName', 'shortName', 'sector', 'industry', 'exchange', 'currency')
+    FUNDAMENTAL_FIELDS = ('marketCap', 'trailingPE', 'forwardPE', 'dividendYield')
+
+    DEFAULT_TTLS = {
+        'static': 7 * 24 * 3600,
+        'fundamental': 24 * 3600,
+        'quote': 15 * 60,
+        'history': 15 * 60,
+    }
+
+    def __init__(self, source, cache, ttls=None):
+        self.source = source
+        self.cache = cache
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+
+    def _split_info(self, info):
+        classes = {'static': {}, 'fundamental': {}, 'quote': {}}
+        for key, value in info.items():
+            if key in self.STATIC_FIELDS:
+                classes['static'][key] = value
+            elif key in self.FUNDAMENTAL_FIELDS:
+                classes['fundamental'][key] = value
+            else:
+                classes['quote'][key] = value
+        return classes
+
+    def get_cached_info(self, ticker, field_class):
+        """Fresh cached fields of one class, or None (never calls upstream)"""
+        return self.cache.get(f'info:{field_class}:{ticker}', self.ttls[field_class])
+
+    def get_info(self, ticker):
+        """
+        Cached info when every field class is fresh, read and counted as one
+        lookup. Upstream returns all classes in one call, so if any class is
+        stale the call is made and only the stale classes are rewritten;
+        fresh ones keep their original age.
+        """
+        keys = {f'info:{field_class}:{ticker}': field_class for field_class in ('static', 'fundamental', 'quote')}
+        cached = self.cache.get_many({key: self.ttls[field_class] for key, field_class in keys.items()})
+        if len(cached) == len(keys):
+            return {name: value for part in cached.values() for name, value in part.items()}
+
+        info = self.source.get_info(ticker)
+        classes = self._split_info(info)
+        for key, field_class in keys.items():
+            if key not in cached:
+                self.cache.set(key, classes[field_class])
+        return info
+
+    def get_history(self, ticker, period='1y', interval='1d', start=None):
+        key = f'history:{ticker}:{period}:{interval}:{start}'
+        hist = self.cache.get(key, self.ttls['history'])
+        if hist is None:
+            hist = self.source.get_history(ticker, period=period, interval=interval, start=start)
+            self.cache.set(key, hist)
+        return hist.copy()
+
+    def get_history_batch(self, tickers, period='1y', interval='1d', start=None):
+        histories = {}
+        missing = []
+        for ticker in tickers:
+            hist = self.cache.get(f'history:{ticker}:{period}:{interval}:{start}', self.ttls['history'])
+            if hist is None:
+                missing.append(ticker)
+            elif not hist.empty:
+                histories[ticker] = hist.copy()
+
+        if missing:
+            fetched = self.source.get_history_batch(missing, period=period, interval=interval, start=start)
+            for ticker in missing:
+                hist = fetched.get(ticker)
+                if hist is not None:
+                    self.cache.set(f'history:{ticker}:{period}:{interval}:{start}', hist)
+                    histories[ticker] = hist
+        return histories
+
+
+def get_data_source():
+    """
+    Data source configured in settings: MARKET_DATA_DIR selects local replay,
+    otherwise yfinance, wrapped in the on-disk cache when MARKET_DATA_CACHE is set
+    """
+    from django.conf import settings
+
+    data_dir = getattr(settings, 'MARKET_DATA_DIR', '')
+    if data_dir:
+        return LocalFileDataSource(data_dir, memory_map=getattr(settings, 'MARKET_DATA_MMAP', False))
+
+    cache_path = getattr(settings, 'MARKET_DATA_CACHE', '')
+    if cache_path:
+        from scripts.response_cache import ResponseCache
+
+        return CachedDataSource(YFinanceDataSource(), ResponseCache(
+            cache_path, max_bytes=getattr(settings, 'MARKET_DATA_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        ))
+    return YFinanceDataSource()
+
+
+def slice_period(hist, period):
+    """Trailing slice of a history frame for a yfinance period string (5d, 3mo, 1y, ytd, max)"""
+    if not period or period == 'max':
+        return hist
+    end = hist.index[-1]
+    if period == 'ytd':
+        return hist[hist.index >= pd.Timestamp(year=end.year, month=1, day=1, tz=end.tz)]
+
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        return hist.iloc[-count:]
+    offset = {
+        'wk': pd.DateOffset(weeks=count),
+        'mo': pd.DateOffset(months=count),
+        'y': pd.DateOffset(years=count),
+    }[unit]
+    return hist[hist.index > end - offset]
+
+
+def split_batch_frame(frame, tickers):
+    """Split a multi-symbol download (ticker, field) columns into per-ticker frames"""
+    if frame is None or frame.empty:
+        return {}
+
+    if not isinstance(frame.columns, pd.MultiIndex):
+        # A single-symbol download comes back with flat columns
+        return {tickers[0]: frame.dropna(how='all')} if len(tickers) == 1 else {}
+
+    histories = {}
+    available = set(frame.columns.get_level_values(0))
+    for ticker in tickers:
+        if ticker not in available:
+            continue
+        hist = frame[ticker].dropna(how='all')
+        if not hist.empty:
+            histories[ticker] = hist
+    return histories
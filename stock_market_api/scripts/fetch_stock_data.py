@@ -4,9 +4,11 @@ Can be run standalone or imported as a module
 """
 import os
 import sys
+import time
 import django
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-import yfinance as yf
+from zoneinfo import ZoneInfo
 import pandas as pd
 
 # Setup Django environment
@@ -15,65 +17,139 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 django.setup()
 
 from stocks.models import Stock, StockPrice
+from scripts.data_sources import get_data_source
+from scripts.price_store import get_price_store
 from django.db import transaction
+from django.db.models import Max
+
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+MARKET_CLOSE_HOUR = 16
+
+
+def latest_trading_date(now=None):
+    """Date of the most recent daily bar that should exist (ignores exchange holidays)"""
+    now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    date = now.date()
+    if now.hour < MARKET_CLOSE_HOUR:
+        date -= timedelta(days=1)
+    while date.weekday() >= 5:
+        date -= timedelta(days=1)
+    return date
+
 
 class StockDataFetcher:
     # Fetch  and store stock data from Yahoo Finance
     
-    def __init__(self):
+    def __init__(self, data_source=None):
         self.session = None
+        self.data_source = data_source or get_data_source()
+        self.timings = {}
         
     def fetch_stock_info(self, ticker):
         # Fetch stock information from Yahoo Finance
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            
-            # Extract relevant fileds
-            stock_data = {
-                'ticker': ticker.upper(),
-                'company_name': info.get('longName', info.get('shortName', ticker)),
-                'sector': info.get('sector', ''),
-                'industry': info.get('industry', ''),
-                'exchange': info.get('exchange', ''),
-                'currency': info.get('currency', 'USD'),
-                'current_price': info.get('currentPrice', info.get('regularMarketPrice')),
-                'previous_close': info.get('previousClose', info.get('regularMarketPreviousClose')),
-                'open_price': info.get('open', info.get('regularMarketOpen')),
-                'day_high': info.get('dayHigh', info.get('regularMarketDayHigh')),
-                'day_low': info.get('dayLow', info.get('regularMarketDayLow')),
-                'volume': info.get('volume', info.get('regularMarketVolume')),
-                'market_cap': info.get('marketCap'),
-                'pe_ratio': info.get('trailingPE', info.get('forwardPE')),
-                'dividend_yield': info.get('dividendYield'),
-            }
-            
-            # Convert dividend yield to percentage
-            if stock_data['dividend_yield'] is not None:
-                stock_data['dividend_yield'] = stock_data['dividend_yield'] * 100
-            return stock_data
+            info = self.data_source.get_info(ticker)
+            return self.build_stock_data(ticker, info)
         except Exception as e:
             print(f"Error fetching stock info for {ticker}: {str(e)}")
             return None
+    
+    def build_stock_data(self, ticker, info):
+        # Extract relevant fileds
+        stock_data = {
+            'ticker': ticker.upper(),
+            'company_name': info.get('longName', info.get('shortName', ticker)),
+            'sector': info.get('sector', ''),
+            'industry': info.get('industry', ''),
+            'exchange': info.get('exchange', ''),
+            'currency': info.get('currency', 'USD'),
+            'current_price': info.get('currentPrice', info.get('regularMarketPrice')),
+            'previous_close': info.get('previousClose', info.get('regularMarketPreviousClose')),
+            'open_price': info.get('open', info.get('regularMarketOpen')),
+            'day_high': info.get('dayHigh', info.get('regularMarketDayHigh')),
+            'day_low': info.get('dayLow', info.get('regularMarketDayLow')),
+            'volume': info.get('volume', info.get('regularMarketVolume')),
+            'market_cap': info.get('marketCap'),
+            'pe_ratio': info.get('trailingPE', info.get('forwardPE')),
+            'dividend_yield': info.get('dividendYield'),
+        }
+        
+        # Convert dividend yield to percentage
+        if stock_data['dividend_yield'] is not None:
+            stock_data['dividend_yield'] = stock_data['dividend_yield'] * 100
+        return stock_data
+        
+    STATIC_STOCK_FIELDS = ('ticker', 'company_name', 'sector', 'industry', 'exchange', 'currency')
+    FUNDAMENTAL_STOCK_FIELDS = ('market_cap', 'pe_ratio', 'dividend_yield')
+    
+    def fetch_cached_stock_info(self, ticker):
+        """
+        Stock fields from fresh cached metadata, without calling upstream.
+        Returns None when the source has no fresh metadata and the full
+        info call is needed. Quote fields are filled in from history later.
+        """
+        get_cached_info = getattr(self.data_source, 'get_cached_info', None)
+        if get_cached_info is None:
+            return None
+        
+        static = get_cached_info(ticker, 'static')
+        if static is None:
+            return None
+        fundamentals = get_cached_info(ticker, 'fundamental')
+        
+        stock_data = self.build_stock_data(ticker, {**static, **(fundamentals or {})})
+        fields = self.STATIC_STOCK_FIELDS + (self.FUNDAMENTAL_STOCK_FIELDS if fundamentals is not None else ())
+        return {key: stock_data[key] for key in fields}
+    
+    def quote_from_history(self, hist):
+        """Latest quote fields taken from the last bars of a history frame"""
+        frame = hist.rename(columns=str.lower).dropna(subset=['close'])
+        if frame.empty:
+            return {}
+        
+        last = frame.iloc[-1]
+        quote = {
+            'current_price': float(last['close']),
+            'open_price': float(last['open']),
+            'day_high': float(last['high']),
+            'day_low': float(last['low']),
+            'volume': int(last['volume']) if not pd.isna(last['volume']) else None,
+        }
+        if len(frame) > 1:
+            quote['previous_close'] = float(frame['close'].iloc[-2])
+        return quote
+    
+    def stored_previous_close(self, ticker, hist):
+        """
+        Close of the last stored bar before a history frame's latest bar. An
+        incremental sync often downloads a single new bar, which carries no
+        previous close of its own.
+        """
+        frame = hist.rename(columns=str.lower).dropna(subset=['close'])
+        if frame.empty:
+            return None
+        return StockPrice.objects.filter(
+            stock__ticker=ticker.upper(), date__lt=frame.index[-1].date()
+        ).order_by('-date').values_list('close', flat=True).first()
         
-    def fetch_historical_data(self, ticker, period='1y', interval='1d'):
+    def fetch_historical_data(self, ticker, period='1y', interval='1d', start=None):
         # Fetch historical stock price data from Yahoo Finance
+        # An empty frame means "no rows", None means the request failed
         
         try:
-            stock =yf.Ticker(ticker)
-            hist = stock.history(period=period, interval=interval)
+            hist = self.data_source.get_history(ticker, period=period, interval=interval, start=start)
             
             if hist.empty:
                 print(f"No historical data found for {ticker}")
-                return None
             return hist
         except Exception as e:
             print(f"Error fetching historical data for {ticker}: {str(e)}")
             return None
         
-    def save_stock_info(self, ticker):
+    def save_stock_info(self, ticker, stock_data=None):
         # Fetch and save stock information to the database
-        stock_data = self.fetch_stock_info(ticker)
+        if stock_data is None:
+            stock_data = self.fetch_stock_info(ticker)
         
         if not stock_data:
             return None
@@ -91,7 +167,7 @@ class StockDataFetcher:
             print(f"Error saving stock info for {ticker}: {str(e)}")
             return None
         
-    def save_historical_data(self, ticker, period='1y'):
+    def save_historical_data(self, ticker, period='1y', hist=None, bulk=False, batch_size=1000):
         # Get or create stock
         stock = Stock.objects.filter(ticker=ticker.upper()).first()
         if not stock:
@@ -99,12 +175,17 @@ class StockDataFetcher:
             if not stock:
                 return False
         
-        # Fetch historical data
-        hist = self.fetch_historical_data(ticker, period=period)
+        # Fetch historical data unless the caller already has it
+        if hist is None:
+            hist = self.fetch_historical_data(ticker, period=period)
         
         if hist is None or hist.empty:
             return False
         
+        if bulk:
+            counts = self.bulk_save_historical_data(stock, hist, batch_size=batch_size)
+            return counts is not None
+        
         # Save historical data
         saved_count = 0
         skipped_count = 0
@@ -126,6 +207,10 @@ class StockDataFetcher:
                     low_price = row.get('Low', row.get('low', 0))
                     volume = row.get('Volume', row.get('volume', 0))
                     
+                    # Partial bars are not stored, as in build_price_rows
+                    if pd.isna([open_price, high_price, low_price, close_price]).any():
+                        skipped_count += 1
+                        continue
                     
                     StockPrice.objects.create(
                         stock=stock,
@@ -143,55 +228,282 @@ class StockDataFetcher:
         except Exception as e:
             print(f"Error saving historical data for {ticker}: {str(e)}")
             return False
+    
+    def build_price_rows(self, stock, hist):
+        """
+        Convert a history frame into unsaved StockPrice objects. Partial bars
+        (any of open/high/low/close missing) are dropped rather than stored
+        as NaN prices.
+        """
+        frame = hist.rename(columns=str.lower)
+        frame = frame.dropna(subset=['open', 'high', 'low', 'close'])
         
-    def fetch_multiple_stocks(self, tickers, period='1y'):
-        """Fetch data for multiple stocks"""
+        dates = frame.index.date
+        volumes = frame['volume'].fillna(0).astype('int64') if 'volume' in frame else [0] * len(frame)
+        
+        return [
+            StockPrice(
+                stock=stock,
+                date=date,
+                open=float(open_price),
+                high=float(high),
+                low=float(low),
+                close=float(close),
+                adjusted_close=float(close),
+                volume=int(volume),
+            )
+            for date, open_price, high, low, close, volume in zip(
+                dates, frame['open'], frame['high'], frame['low'], frame['close'], volumes
+            )
+        ]
+    
+    def bulk_save_historical_data(self, stock, hist, batch_size=1000):
+        """
+        Upsert a whole history frame with bulk_create(update_conflicts=True).
+        Returns {'inserted': n, 'updated': n} or None on failure.
+        """
+        rows = self.build_price_rows(stock, hist)
+        if not rows:
+            return {'inserted': 0, 'updated': 0}
+        
+        try:
+            with transaction.atomic():
+                # One range query tells us which rows the upsert will overwrite
+                existing = set(StockPrice.objects.filter(
+                    stock=stock,
+                    date__gte=min(row.date for row in rows),
+                    date__lte=max(row.date for row in rows)
+                ).values_list('date', flat=True))
+                
+                StockPrice.objects.bulk_create(
+                    rows,
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=['stock', 'date'],
+                    update_fields=['open', 'high', 'low', 'close', 'adjusted_close', 'volume'],
+                )
+            
+            updated = sum(1 for row in rows if row.date in existing)
+            counts = {'inserted': len(rows) - updated, 'updated': updated}
+            print(f"Inserted {counts['inserted']} price records for {stock.ticker}, updated {counts['updated']} existing records.")
+            return counts
+        except Exception as e:
+            print(f"Error bulk saving historical data for {stock.ticker}: {str(e)}")
+            return None
+        
+    def fetch_ticker_data(self, ticker, period='1y', histories=None, start=None):
+        """
+        Network half of a ticker update. Touches no database state, so it is safe
+        in a worker thread. A history already present in `histories` is reused.
+        """
+        fetch_start = time.perf_counter()
+        
+        # Skip the expensive info call while cached metadata is still fresh
+        stock_data = self.fetch_cached_stock_info(ticker)
+        from_cache = stock_data is not None
+        if not from_cache:
+            stock_data = self.fetch_stock_info(ticker)
+        
+        hist = None
+        if stock_data:
+            hist = histories.get(ticker) if histories else None
+            if hist is None:
+                hist = self.fetch_historical_data(ticker, period=period, start=start)
+            if from_cache and hist is not None:
+                stock_data.update(self.quote_from_history(hist))
+        return stock_data, hist, time.perf_counter() - fetch_start
+    
+    def fetch_concurrently(self, tickers, period='1y', workers=1, bulk=False, histories=None, start=None):
+        """
+        Fetch tickers on a bounded thread pool. The calling thread is the only
+        DB writer, so SQLite and Postgres never see competing write transactions.
+        Timings are accumulated into self.timings. With `start`, a ticker that
+        has no bars since that date is reported as 'current' rather than failed.
+        """
         results = {
             'success': [],
-            'failed': []
+            'failed': [],
+            'current': []
         }
+        total = len(tickers)
         
-        for ticker in tickers:
-            print(f"\nProcessing {ticker}...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {
+                pool.submit(self.fetch_ticker_data, ticker, period, histories, start): ticker
+                for ticker in tickers
+            }
             
-            # Save stock info
-            stock = self.save_stock_info(ticker)
-            if not stock:
-                results['failed'].append(ticker)
-                continue
+            for i, future in enumerate(as_completed(futures), 1):
+                ticker = futures[future]
+                stock_data, hist, fetch_seconds = future.result()
+                print(f"\n[{i}/{total}] Saving {ticker}...")
+                
+                save_start = time.perf_counter()
+                up_to_date = start is not None and hist is not None and hist.empty
+                if stock_data and 'current_price' in stock_data and 'previous_close' not in stock_data:
+                    # Quote built from a one-bar delta; read the prior close on the writer thread
+                    stock_data['previous_close'] = self.stored_previous_close(ticker, hist)
+                saved = (
+                    stock_data is not None
+                    and hist is not None
+                    and self.save_stock_info(ticker, stock_data=stock_data) is not None
+                    and (up_to_date or self.save_historical_data(ticker, period=period, hist=hist, bulk=bulk))
+                )
+                self.timings[ticker] = {
+                    'fetch': fetch_seconds,
+                    'save': time.perf_counter() - save_start,
+                }
+                
+                if saved and up_to_date:
+                    results['current'].append(ticker)
+                elif saved:
+                    results['success'].append(ticker)
+                else:
+                    results['failed'].append(ticker)
+        
+        return results
+    
+    def timing_summary(self, top=5):
+        """Summarize per-ticker timings from the last fetch as printable lines"""
+        if not self.timings:
+            return []
+        
+        count = len(self.timings)
+        fetch_total = sum(t['fetch'] for t in self.timings.values())
+        save_total = sum(t['save'] for t in self.timings.values())
+        slowest = sorted(self.timings.items(), key=lambda item: item[1]['fetch'] + item[1]['save'], reverse=True)[:top]
+        
+        lines = [
+            f"Timing: {count} tickers, fetch {fetch_total:.2f}s (avg {fetch_total / count:.2f}s), "
+            f"save {save_total:.2f}s (avg {save_total / count:.2f}s)",
+        ]
+        for ticker, timing in slowest:
+            lines.append(f"  {ticker:<10} fetch {timing['fetch']:.2f}s  save {timing['save']:.2f}s")
+        
+        cache = getattr(self.data_source, 'cache', None)
+        if cache is not None:
+            stats = cache.stats
+            lines.append(
+                f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+                f"{stats['entries']} entries ({stats['bytes'] / 1024 / 1024:.1f} MB)"
+            )
+        return lines
+        
+    def fetch_batched(self, tickers, period='5d', batch_size=100, workers=1, bulk=False, start=None):
+        """
+        Download histories batch_size tickers at a time with one multi-symbol
+        request per chunk, then save each ticker through the fetch engine.
+        Tickers missing from a chunk's download fall back to a single request.
+        """
+        results = {
+            'success': [],
+            'failed': [],
+            'current': []
+        }
+        
+        for offset in range(0, len(tickers), batch_size):
+            chunk = tickers[offset:offset + batch_size]
+            
+            batch_start = time.perf_counter()
+            try:
+                histories = self.data_source.get_history_batch(chunk, period=period, start=start)
+            except Exception as e:
+                print(f"Error downloading batch starting at {chunk[0]}: {str(e)}")
+                histories = {}
+            batch_seconds = time.perf_counter() - batch_start
+            print(f"Downloaded {len(histories)}/{len(chunk)} histories in one request ({batch_seconds:.2f}s)")
+            
+            chunk_results = self.fetch_concurrently(
+                chunk, period=period, workers=workers, bulk=bulk, histories=histories, start=start
+            )
+            for key in results:
+                results[key].extend(chunk_results[key])
             
-            # Save historical data
-            if self.save_historical_data(ticker, period=period):
-                results['success'].append(ticker)
-            else:
-                results['failed'].append(ticker)
+            # Spread the shared download time across the chunk
+            for ticker in chunk:
+                if ticker in self.timings:
+                    self.timings[ticker]['fetch'] += batch_seconds / len(chunk)
         
         return results
+        
+    def fetch_multiple_stocks(self, tickers, period='1y', bulk=False, workers=1, batch_size=None):
+        """Fetch data for multiple stocks"""
+        self.timings = {}
+        return self._fetch(tickers, period=period, bulk=bulk, workers=workers, batch_size=batch_size)
+    
+    def _fetch(self, tickers, period='1y', bulk=False, workers=1, batch_size=None, start=None):
+        if batch_size:
+            return self.fetch_batched(
+                tickers, period=period, batch_size=batch_size, workers=workers, bulk=bulk, start=start
+            )
+        return self.fetch_concurrently(tickers, period=period, workers=workers, bulk=bulk, start=start)
+    
+    def get_last_price_dates(self):
+        """Latest stored price date per active ticker, in one grouped query"""
+        rows = StockPrice.objects.filter(
+            stock__is_active=True
+        ).values('stock__ticker').annotate(last_date=Max('date')).order_by()
+        return {row['stock__ticker']: row['last_date'] for row in rows}
     
-    def update_all_stocks(self, period='5d'):
+    def sync_incremental(self, tickers, period='5d', bulk=False, workers=1, batch_size=None):
+        """
+        Request only the bars after each ticker's last stored date. Tickers that
+        already have the latest trading day are skipped without any request, and
+        tickers with no stored history fall back to `period`.
+        """
+        last_dates = self.get_last_price_dates()
+        target = latest_trading_date()
+        
+        results = {
+            'success': [],
+            'failed': [],
+            'current': []
+        }
+        groups = {}
+        for ticker in tickers:
+            last_date = last_dates.get(ticker)
+            if last_date is not None and last_date >= target:
+                results['current'].append(ticker)
+                continue
+            start = last_date + timedelta(days=1) if last_date else None
+            groups.setdefault(start, []).append(ticker)
+        
+        print(f"{len(results['current'])} stocks already current through {target}")
+        
+        # Tickers sharing a start date can share a batched download
+        for start, group in groups.items():
+            group_results = self._fetch(
+                group, period=period, bulk=bulk, workers=workers, batch_size=batch_size, start=start
+            )
+            for key in results:
+                results[key].extend(group_results[key])
+        
+        return results
+    
+    def update_all_stocks(self, period='5d', bulk=False, workers=1, batch_size=None, incremental=False):
         """Update all existing stocks in database"""
-        stocks = Stock.objects.filter(is_active=True)
-        total = stocks.count()
+        tickers = list(Stock.objects.filter(is_active=True).values_list('ticker', flat=True))
         
-        print(f"Updating {total} stocks...")
+        print(f"Updating {len(tickers)} stocks...")
         
-        success_count = 0
-        failed_count = 0
+        self.timings = {}
+        if incremental:
+            results = self.sync_incremental(
+                tickers, period=period, bulk=bulk, workers=workers, batch_size=batch_size
+            )
+        else:
+            results = self._fetch(tickers, period=period, bulk=bulk, workers=workers, batch_size=batch_size)
+        success_count = len(results['success'])
+        failed_count = len(results['failed'])
         
-        for i, stock in enumerate(stocks, 1):
-            print(f"\n[{i}/{total}] Updating {stock.ticker}...")
-            
-            # Update stock info
-            if self.save_stock_info(stock.ticker):
-                # Update recent historical data
-                if self.save_historical_data(stock.ticker, period=period):
-                    success_count += 1
-                else:
-                    failed_count += 1
-            else:
-                failed_count += 1
+        print(f"\nUpdate complete: {success_count} successful, {failed_count} failed, "
+              f"{len(results['current'])} already current")
         
-        print(f"\nUpdate complete: {success_count} successful, {failed_count} failed")
+        store = get_price_store()
+        if store is not None and results['success']:
+            counts = store.refresh(tickers=results['success'])
+            print(f"Price store refreshed: {counts['extended']} extended, "
+                  f"{counts['relocated']} relocated, {counts['added']} added")
         return success_count, failed_count
 
 def main():
@@ -207,6 +519,14 @@ def main():
                        help='Update all existing stocks')
     parser.add_argument('--popular', action='store_true',
                        help='Fetch popular stocks (FAANG, etc.)')
+    parser.add_argument('--bulk', action='store_true',
+                       help='Upsert price history with bulk_create instead of row by row')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of concurrent fetch threads')
+    parser.add_argument('--batch-size', type=int,
+                       help='Download histories this many tickers per request')
+    parser.add_argument('--incremental', action='store_true',
+                       help='With --update-all, fetch only bars after the last stored date')
     
     args = parser.parse_args()
     
@@ -214,7 +534,10 @@ def main():
     
     if args.update_all:
         print("Updating all stocks in database...")
-        fetcher.update_all_stocks(period=args.period)
+        fetcher.update_all_stocks(
+            period=args.period, bulk=args.bulk, workers=args.workers,
+            batch_size=args.batch_size, incremental=args.incremental
+        )
     elif args.popular:
         # Popular stocks to fetch
         popular_tickers = [
@@ -224,24 +547,28 @@ def main():
             'PYPL', 'ADBE', 'CRM', 'INTC', 'CSCO'      # Tech
         ]
         print(f"Fetching {len(popular_tickers)} popular stocks...")
-        results = fetcher.fetch_multiple_stocks(popular_tickers, period=args.period)
+        results = fetcher.fetch_multiple_stocks(popular_tickers, period=args.period, bulk=args.bulk, workers=args.workers, batch_size=args.batch_size)
         print(f"\nResults: {len(results['success'])} successful, {len(results['failed'])} failed")
     elif args.tickers:
         tickers = [t.strip().upper() for t in args.tickers.split(',')]
         print(f"Fetching {len(tickers)} stocks...")
-        results = fetcher.fetch_multiple_stocks(tickers, period=args.period)
+        results = fetcher.fetch_multiple_stocks(tickers, period=args.period, bulk=args.bulk, workers=args.workers, batch_size=args.batch_size)
         print(f"\nResults: {len(results['success'])} successful, {len(results['failed'])} failed")
     elif args.file:
         try:
             with open(args.file, 'r') as f:
                 tickers = [line.strip().upper() for line in f if line.strip()]
             print(f"Fetching {len(tickers)} stocks from file...")
-            results = fetcher.fetch_multiple_stocks(tickers, period=args.period)
+            results = fetcher.fetch_multiple_stocks(tickers, period=args.period, bulk=args.bulk, workers=args.workers, batch_size=args.batch_size)
             print(f"\nResults: {len(results['success'])} successful, {len(results['failed'])} failed")
         except FileNotFoundError:
             print(f"Error: File '{args.file}' not found")
     else:
         parser.print_help()
+        return
+    
+    for line in fetcher.timing_summary():
+        print(line)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Dependency graph of technical indicators
+Indicators are built from shared intermediates (rolling mean/std of close,
+EMAs of close, true range, ATR). IndicatorGraph evaluates a price frame
+lazily and memoizes every node, so a run computes only what the requested
+indicators depend on, and each intermediate exactly once.
+"""
+import numpy as np
+import pandas as pd
+
+
+# (indicator_type, period) for every indicator the pipeline stores, in save order
+INDICATOR_SPECS = [
+    ('SMA', 20),
+    ('SMA', 50),
+    ('SMA', 200),
+    ('EMA', 12),
+    ('EMA', 26),
+    ('RSI', 14),
+    ('MACD', 26),
+    ('BB', 20),
+    ('STOCH', 14),
+    ('ADX', 14),
+    ('ATR', 14),
+]
+
+INDICATOR_TYPES = list(dict.fromkeys(indicator_type for indicator_type, _ in INDICATOR_SPECS))
+
+
+def parse_indicator_types(value):
+    """Parse a comma-separated --types value; None or empty selects every type"""
+    if not value:
+        return None
+    types = [part.strip().upper() for part in value.split(',') if part.strip()]
+    unknown = [indicator_type for indicator_type in types if indicator_type not in INDICATOR_TYPES]
+    if unknown:
+        raise ValueError(
+            f"Unknown indicator type(s): {', '.join(unknown)}. Choose from {','.join(INDICATOR_TYPES)}"
+        )
+    return types
+
+
+def select_specs(types=None):
+    """INDICATOR_SPECS restricted to `types` (all when None)"""
+    if types is None:
+        return list(INDICATOR_SPECS)
+    return [(indicator_type, period) for indicator_type, period in INDICATOR_SPECS if indicator_type in types]
+
+
+class IndicatorGraph:
+    """Memoized indicator and intermediate nodes over one date-indexed price frame"""
+
+    def __init__(self, df):
+        self.df = df
+        self._memo = {}
+
+    def _node(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    # Intermediates
+
+    def rolling_mean(self, period):
+        return self._node(('mean', period), lambda: self.df['close'].rolling(window=period).mean())
+
+    def rolling_std(self, period):
+        return self._node(('std', period), lambda: self.df['close'].rolling(window=period).std())
+
+    def ema(self, span):
+        return self._node(('ema', span), lambda: self.df['close'].ewm(span=span, adjust=False).mean())
+
+    def true_range(self):
+        def compute():
+            high_low = self.df['high'] - self.df['low']
+            high_close = np.abs(self.df['high'] - self.df['close'].shift())
+            low_close = np.abs(self.df['low'] - self.df['close'].shift())
+            return pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+        return self._node(('true_range',), compute)
+
+    def atr(self, period):
+        return self._node(('atr', period), lambda: self.true_range().rolling(window=period).mean())
+
+    # Indicators, each returning [value, value2, value3] series
+
+    def sma(self, period):
+        return [self.rolling_mean(period)]
+
+    def ema_indicator(self, period):
+        return [self.ema(period)]
+
+    def rsi(self, period):
+        def compute():
+            delta = self.df['close'].diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            return [100 - (100 / (1 + rs))]
+        return self._node(('rsi', period), compute)
+
+    def macd(self, fast=12, slow=26, signal=9):
+        def compute():
+            macd = self.ema(fast) - self.ema(slow)
+            signal_line = macd.ewm(span=signal, adjust=False).mean()
+            return [macd, signal_line, macd - signal_line]
+        return self._node(('macd', fast, slow, signal), compute)
+
+    def bollinger_bands(self, period, std_dev=2):
+        sma = self.rolling_mean(period)
+        std = self.rolling_std(period)
+        return [sma + (std * std_dev), sma, sma - (std * std_dev)]
+
+    def stochastic(self, period):
+        def compute():
+            low_min = self.df['low'].rolling(window=period).min()
+            high_max = self.df['high'].rolling(window=period).max()
+            k_percent = 100 * (self.df['close'] - low_min) / (high_max - low_min)
+            return [k_percent, k_percent.rolling(window=3).mean()]
+        return self._node(('stoch', period), compute)
+
+    def adx(self, period):
+        def compute():
+            up_move = self.df['high'] - self.df['high'].shift()
+            down_move = self.df['low'].shift() - self.df['low']
+
+            plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
+            minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
+
+            atr = self.atr(period)
+            plus_di = 100 * pd.Series(plus_dm, index=self.df.index).rolling(window=period).mean() / atr
+            minus_di = 100 * pd.Series(minus_dm, index=self.df.index).rolling(window=period).mean() / atr
+
+            dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+            return [dx.rolling(window=period).mean()]
+        return self._node(('adx', period), compute)
+
+    def indicator(self, indicator_type, period):
+        """Series list for one (indicator_type, period) spec"""
+        builders = {
+            'SMA': self.sma,
+            'EMA': self.ema_indicator,
+            'RSI': self.rsi,
+            'MACD': lambda _period: self.macd(),
+            'BB': self.bollinger_bands,
+            'STOCH': self.stochastic,
+            'ADX': self.adx,
+            'ATR': lambda period: [self.atr(period)],
+        }
+        if indicator_type not in builders:
+            raise ValueError(f"Unknown indicator type: {indicator_type}")
+        return builders[indicator_type](period)
+
+    def compute(self, types=None):
+        """[(indicator_type, period, [series, ...])] for the selected types"""
+        return [
+            (indicator_type, period, self.indicator(indicator_type, period))
+            for indicator_type, period in select_specs(types)
+        ]
@@ -0,0 +1,236 @@
+"""
+Cross-ticker indicator engine
+Loads close/high/low for a whole universe into dates x tickers arrays with a
+single query and computes indicators column-wise with NumPy, so the
+per-ticker pandas pipeline becomes a handful of array operations
+"""
+import os
+import sys
+import django
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from stocks.models import StockPrice
+from scripts.indicator_graph import INDICATOR_SPECS
+
+
+# Rolling kernels over axis 0 (dates). Like pandas rolling(window) with the
+# default min_periods, a window containing any NaN produces NaN.
+
+def rolling_mean(values, window):
+    """Rolling mean via cumulative sums, O(dates x tickers)"""
+    result = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return result
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums = np.vstack([np.zeros((1, values.shape[1])), sums])
+    counts = np.vstack([np.zeros((1, values.shape[1])), counts])
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    result[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return result
+
+
+def _rolling_reduce(values, window, reducer, **kwargs):
+    result = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return result
+    windows = sliding_window_view(values, window, axis=0)
+    result[window - 1:] = reducer(windows, axis=-1, **kwargs)
+    return result
+
+
+def rolling_std(values, window):
+    """Rolling sample standard deviation (ddof=1, as pandas)"""
+    return _rolling_reduce(values, window, np.std, ddof=1)
+
+
+def rolling_min(values, window):
+    return _rolling_reduce(values, window, np.min)
+
+
+def rolling_max(values, window):
+    return _rolling_reduce(values, window, np.max)
+
+
+def ewm_mean(values, span):
+    """
+    pandas ewm(span, adjust=False).mean() for columns whose leading values may be
+    NaN: each column starts at its first valid value
+    """
+    alpha = 2.0 / (span + 1.0)
+    result = np.empty(values.shape)
+    previous = np.full(values.shape[1], np.nan)
+    for i, row in enumerate(values):
+        previous = np.where(np.isnan(previous), row, alpha * row + (1 - alpha) * previous)
+        result[i] = previous
+    return result
+
+
+def shift(values, periods=1):
+    result = np.full(values.shape, np.nan)
+    result[periods:] = values[:-periods]
+    return result
+
+
+class IndicatorPanel:
+    """Dates x tickers price panel with vectorized indicator calculations"""
+
+    def __init__(self, stocks, dates, close, high, low):
+        self.stocks = list(stocks)
+        self.dates = dates
+        self.close = close
+        self.high = high
+        self.low = low
+
+    @classmethod
+    def load(cls, stocks, days=365):
+        """Build the panel for `stocks` from one StockPrice query"""
+        stocks = list(stocks)
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=days)
+
+        rows = StockPrice.objects.filter(
+            stock__in=stocks,
+            date__gte=start_date,
+            date__lte=end_date
+        ).to_arrays('stock_id', 'date', 'close', 'high', 'low')
+
+        if not len(rows['date']):
+            empty = np.empty((0, len(stocks)))
+            return cls(stocks, pd.DatetimeIndex([]), empty, empty.copy(), empty.copy())
+
+        dates, date_positions = np.unique(rows['date'], return_inverse=True)
+        column_of = {stock.id: i for i, stock in enumerate(stocks)}
+        columns = np.fromiter(
+            (column_of[stock_id] for stock_id in rows['stock_id'].tolist()), dtype=np.int64, count=len(date_positions)
+        )
+
+        arrays = []
+        for field in ('close', 'high', 'low'):
+            panel = np.full((len(dates), len(stocks)), np.nan)
+            panel[date_positions, columns] = rows[field]
+            arrays.append(panel)
+
+        return cls(stocks, pd.DatetimeIndex(dates), *arrays)
+
+    def contiguous_columns(self):
+        """
+        Columns whose prices have no holes between their first and last date.
+        Only these match the per-ticker pipeline exactly; the rest are gappy.
+        """
+        valid = ~np.isnan(self.close)
+        seen = np.maximum.accumulate(valid, axis=0)
+        remaining = np.maximum.accumulate(valid[::-1], axis=0)[::-1]
+        holes = seen & remaining & ~valid
+        return valid.any(axis=0) & ~holes.any(axis=0)
+
+    def compute(self, specs=None):
+        """
+        Calculate indicators for the whole panel; `specs` is a list of
+        (indicator_type, period) from INDICATOR_SPECS, all when None.
+        Intermediates are built lazily, so only what the selected indicators
+        depend on is computed, each once.
+        Returns [(indicator_type, period, [2-D array, ...])] in the same layout
+        as TechnicalIndicatorCalculator.compute_indicators.
+        """
+        close, high, low = self.close, self.high, self.low
+        missing = np.isnan(close)
+        memo = {}
+
+        def node(key, build):
+            if key not in memo:
+                memo[key] = build()
+            return memo[key]
+
+        def sma(period):
+            return node(('sma', period), lambda: rolling_mean(close, period))
+
+        def ema(period):
+            return node(('ema', period), lambda: ewm_mean(close, period))
+
+        def rsi():
+            # The first bar of each column counts as zero gain/loss, like pandas where()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                delta = close - shift(close)
+                gain = np.where(delta > 0, delta, 0.0)
+                loss = np.where(delta < 0, -delta, 0.0)
+                gain[missing] = np.nan
+                loss[missing] = np.nan
+                rs = rolling_mean(gain, 14) / rolling_mean(loss, 14)
+                return [100 - (100 / (1 + rs))]
+
+        def macd():
+            line = ema(12) - ema(26)
+            signal = ewm_mean(line, 9)
+            return [line, signal, line - signal]
+
+        def bollinger():
+            std = rolling_std(close, 20)
+            return [sma(20) + std * 2, sma(20), sma(20) - std * 2]
+
+        def stochastic():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                low_min = rolling_min(low, 14)
+                high_max = rolling_max(high, 14)
+                k_percent = 100 * (close - low_min) / (high_max - low_min)
+                return [k_percent, rolling_mean(k_percent, 3)]
+
+        def atr():
+            def build():
+                # True range ignores the missing previous close on a column's first bar
+                previous_close = shift(close)
+                tr = np.fmax(np.fmax(high - low, np.abs(high - previous_close)), np.abs(low - previous_close))
+                return rolling_mean(tr, 14)
+            return node('atr', build)
+
+        def adx():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                up_move = high - shift(high)
+                down_move = shift(low) - low
+                plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+                minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+                plus_dm[missing] = np.nan
+                minus_dm[missing] = np.nan
+                plus_di = 100 * rolling_mean(plus_dm, 14) / atr()
+                minus_di = 100 * rolling_mean(minus_dm, 14) / atr()
+                dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+                return [rolling_mean(dx, 14)]
+
+        builders = {
+            'SMA': lambda period: [sma(period)],
+            'EMA': lambda period: [ema(period)],
+            'RSI': lambda period: rsi(),
+            'MACD': lambda period: macd(),
+            'BB': lambda period: bollinger(),
+            'STOCH': lambda period: stochastic(),
+            'ADX': lambda period: adx(),
+            'ATR': lambda period: [atr()],
+        }
+        results = [
+            (indicator_type, period, builders[indicator_type](period))
+            for indicator_type, period in (INDICATOR_SPECS if specs is None else specs)
+        ]
+
+        # Dates a ticker did not trade produce no rows
+        for _, _, arrays in results:
+            for array in arrays:
+                array[missing] = np.nan
+
+        return results
+
+    def column_results(self, results, column):
+        """Slice one ticker's series out of compute() output"""
+        return [
+            (indicator_type, period, [pd.Series(array[:, column], index=self.dates) for array in arrays])
+            for indicator_type, period, arrays in results
+        ]
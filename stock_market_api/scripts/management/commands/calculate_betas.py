@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand
+from stocks.models import Stock
+from scripts.risk_engine import market_betas, save_betas
+
+
+class Command(BaseCommand):
+    help = 'Calculate and store market betas for all active stocks in one pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tickers',
+            type=str,
+            help='Comma-separated list of ticker symbols (default: all active stocks)'
+        )
+        parser.add_argument(
+            '--market',
+            type=str,
+            default='SPY',
+            help='Market proxy ticker (default: SPY)'
+        )
+        parser.add_argument(
+            '--period-days',
+            type=int,
+            default=252,
+            help='Calendar days of prices to regress over (default: 252)'
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            help='Also store rolling betas over this many daily returns'
+        )
+
+    def handle(self, *args, **options):
+        if options['tickers']:
+            tickers = [t.strip().upper() for t in options['tickers'].split(',')]
+        else:
+            tickers = list(Stock.objects.filter(is_active=True).values_list('ticker', flat=True))
+
+        start = time.perf_counter()
+        result = market_betas(
+            tickers, options['market'], period_days=options['period_days'], window=options['window']
+        )
+        rows = save_betas(result)
+        elapsed = time.perf_counter() - start
+
+        computed = sum(1 for beta in result['betas'].values() if beta is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Calculated {computed}/{len(result['betas'])} betas vs {result['market']} "
+            f"and stored {rows} rows in {elapsed:.2f}s"
+        ))
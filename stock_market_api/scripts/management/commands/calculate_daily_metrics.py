@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from scripts.daily_metrics import update_daily_metrics
+from scripts.movers import refresh_movers
+
+
+class Command(BaseCommand):
+    help = 'Recompute precomputed daily returns, volatility and volume metrics, then re-rank market movers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tickers',
+            type=str,
+            help='Comma-separated list of ticker symbols (default: all active stocks)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only recompute dates within this many calendar days (default: full history)'
+        )
+
+    def handle(self, *args, **options):
+        tickers = None
+        if options['tickers']:
+            tickers = [t.strip().upper() for t in options['tickers'].split(',')]
+
+        start = time.perf_counter()
+        rows = update_daily_metrics(tickers=tickers, days=options['days'])
+        movers = refresh_movers()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} daily metrics rows and ranked movers for {len(movers)} universes "
+            f"in {time.perf_counter() - start:.2f}s"
+        ))
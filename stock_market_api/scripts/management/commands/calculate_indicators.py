@@ -1,5 +1,6 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from scripts.calculate_indicators import TechnicalIndicatorCalculator
+from scripts.indicator_graph import parse_indicator_types
 
 
 class Command(BaseCommand):
@@ -22,20 +23,61 @@ class Command(BaseCommand):
             default=365,
             help='Number of days of historical data to use (default: 365)'
         )
+        parser.add_argument(
+            '--types',
+            type=str,
+            help='Comma-separated list of indicator types (SMA,EMA,RSI,MACD,BB,STOCH,ADX,ATR)'
+        )
+        parser.add_argument(
+            '--panel',
+            action='store_true',
+            help='With --all, compute every ticker at once with the NumPy panel engine'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only calculate dates after the stored indicator state'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='With --all, spread the calculation over N worker processes (default: 1); '
+                 'not supported with --panel or --incremental'
+        )
 
     def handle(self, *args, **options):
+        try:
+            types = parse_indicator_types(options['types'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if types and options['incremental']:
+            raise CommandError('--types cannot be combined with --incremental')
+        if options['processes'] > 1 and (options['panel'] or options['incremental']):
+            raise CommandError('--processes cannot be combined with --panel or --incremental')
+        
         calculator = TechnicalIndicatorCalculator()
         
         if options['all']:
             self.stdout.write(self.style.WARNING('Calculating indicators for all stocks...'))
-            success, failed = calculator.calculate_for_all_stocks(days=options['days'])
+            success, failed = calculator.calculate_for_all_stocks(
+                days=options['days'],
+                panel=options['panel'],
+                incremental=options['incremental'],
+                processes=options['processes'],
+                types=types,
+            )
             self.stdout.write(self.style.SUCCESS(
                 f'Complete: {success} successful, {failed} failed'
             ))
         
         elif options['ticker']:
             self.stdout.write(f"Calculating indicators for {options['ticker']}...")
-            if calculator.calculate_all_indicators(options['ticker'], days=options['days']):
+            if options['incremental']:
+                ok = calculator.calculate_incremental(options['ticker'], days=options['days'])
+            else:
+                ok = calculator.calculate_all_indicators(options['ticker'], days=options['days'], types=types)
+            if ok:
                 self.stdout.write(self.style.SUCCESS(
                     f"Successfully calculated indicators for {options['ticker']}"
                 ))
@@ -1,6 +1,10 @@
 from django.core.management.base import BaseCommand
 from scripts.fetch_stock_data import StockDataFetcher
 from scripts.calculate_indicators import TechnicalIndicatorCalculator
+from scripts.daily_metrics import update_daily_metrics
+from scripts.movers import refresh_movers
+from scripts.risk_engine import market_betas, save_betas
+from stocks.models import Stock
 from datetime import datetime
 
 
@@ -16,15 +20,27 @@ class Command(BaseCommand):
         # Step 1: Update stock prices (last 5 days to ensure we have latest)
         print("Step 1: Updating stock prices...")
         fetcher = StockDataFetcher()
-        success, failed = fetcher.update_all_stocks(period='5d')
+        success, failed = fetcher.update_all_stocks(period='5d', batch_size=100, incremental=True)
         print(f"Price update: {success} successful, {failed} failed\n")
 
-        # Step 2: Calculate indicators (last 90 days for faster processing)
+        # Step 2: Update indicators from their stored state (90 days when seeding a stock)
         print("Step 2: Calculating technical indicators...")
         calculator = TechnicalIndicatorCalculator()
-        success, failed = calculator.calculate_for_all_stocks(days=90)
+        success, failed = calculator.calculate_for_all_stocks(days=90, incremental=True)
         print(f"Indicator calculation: {success} successful, {failed} failed\n")
 
+        # Step 3: Refresh precomputed returns for the days the price update covers
+        print("Step 3: Updating daily metrics...")
+        rows = update_daily_metrics(days=7)
+        refresh_movers()
+        print(f"Daily metrics: {rows} rows updated, market movers refreshed\n")
+
+        # Step 4: Store today's market betas so analytics requests only read them
+        print("Step 4: Calculating market betas...")
+        tickers = list(Stock.objects.filter(is_active=True).values_list('ticker', flat=True))
+        rows = save_betas(market_betas(tickers))
+        print(f"Market betas: {rows} rows stored\n")
+
         print(f"{'='*60}")
         print(f"Daily Update Complete - {datetime.now()}")
         print(f"{'='*60}\n")
\ No newline at end of file
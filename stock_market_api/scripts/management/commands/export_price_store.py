@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from scripts.price_store import PriceStore
+
+
+class Command(BaseCommand):
+    help = 'Export or refresh the memory-mapped columnar price store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root',
+            type=str,
+            help='Store directory (default: PRICE_STORE_DIR)'
+        )
+        parser.add_argument(
+            '--tickers',
+            type=str,
+            help='Comma-separated list of ticker symbols to refresh (default: all stocks)'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rewrite the store from scratch, reclaiming space left by relocated segments'
+        )
+
+    def handle(self, *args, **options):
+        root = options['root'] or settings.PRICE_STORE_DIR
+        if not root:
+            raise CommandError('Set PRICE_STORE_DIR or pass --root')
+
+        tickers = None
+        if options['tickers']:
+            tickers = [t.strip().upper() for t in options['tickers'].split(',')]
+
+        store = PriceStore(root)
+        counts = store.refresh(tickers=tickers, rebuild=options['rebuild'])
+        index = store.index
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {counts['rows']} bars to {root}: {counts['added']} added, "
+            f"{counts['extended']} extended, {counts['relocated']} relocated "
+            f"({len(index['tickers'])} tickers, {index['size'] - index['wasted']}/{index['size']} slots in use)"
+        ))
@@ -32,13 +32,40 @@ class Command(BaseCommand):
             action='store_true',
             help='Fetch popular stocks (FAANG, etc.)'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Upsert price history with bulk_create instead of row by row'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of concurrent fetch threads (default: 1)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Download histories for this many tickers per request'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='With --update-all, fetch only bars after each stock\'s last stored date'
+        )
 
     def handle(self, *args, **options):
         fetcher = StockDataFetcher()
         
         if options['update_all']:
             self.stdout.write(self.style.WARNING('Updating all stocks in database...'))
-            success, failed = fetcher.update_all_stocks(period=options['period'])
+            success, failed = fetcher.update_all_stocks(
+                period=options['period'],
+                bulk=options['bulk'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                incremental=options['incremental'],
+            )
             self.stdout.write(self.style.SUCCESS(
                 f'Update complete: {success} successful, {failed} failed'
             ))
@@ -51,7 +78,7 @@ class Command(BaseCommand):
                 'PYPL', 'ADBE', 'CRM', 'INTC', 'CSCO'
             ]
             self.stdout.write(f'Fetching {len(popular_tickers)} popular stocks...')
-            results = fetcher.fetch_multiple_stocks(popular_tickers, period=options['period'])
+            results = fetcher.fetch_multiple_stocks(popular_tickers, period=options['period'], bulk=options['bulk'], workers=options['workers'], batch_size=options['batch_size'])
             self.stdout.write(self.style.SUCCESS(
                 f"Results: {len(results['success'])} successful, {len(results['failed'])} failed"
             ))
@@ -59,7 +86,7 @@ class Command(BaseCommand):
         elif options['tickers']:
             tickers = [t.strip().upper() for t in options['tickers'].split(',')]
             self.stdout.write(f'Fetching {len(tickers)} stocks...')
-            results = fetcher.fetch_multiple_stocks(tickers, period=options['period'])
+            results = fetcher.fetch_multiple_stocks(tickers, period=options['period'], bulk=options['bulk'], workers=options['workers'], batch_size=options['batch_size'])
             self.stdout.write(self.style.SUCCESS(
                 f"Results: {len(results['success'])} successful, {len(results['failed'])} failed"
             ))
@@ -69,7 +96,7 @@ class Command(BaseCommand):
                 with open(options['file'], 'r') as f:
                     tickers = [line.strip().upper() for line in f if line.strip()]
                 self.stdout.write(f'Fetching {len(tickers)} stocks from file...')
-                results = fetcher.fetch_multiple_stocks(tickers, period=options['period'])
+                results = fetcher.fetch_multiple_stocks(tickers, period=options['period'], bulk=options['bulk'], workers=options['workers'], batch_size=options['batch_size'])
                 self.stdout.write(self.style.SUCCESS(
                     f"Results: {len(results['success'])} successful, {len(results['failed'])} failed"
                 ))
@@ -79,4 +106,8 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.ERROR(
                 'Please specify --tickers, --file, --popular, or --update-all'
-            ))
\ No newline at end of file
+            ))
+            return
+        
+        for line in fetcher.timing_summary():
+            self.stdout.write(line)
\ No newline at end of file
@@ -0,0 +1,70 @@
+import pandas as pd
+from django.core.management.base import BaseCommand
+from stocks.models import Stock, StockPrice
+from scripts.data_sources import LocalFileDataSource
+
+
+class Command(BaseCommand):
+    help = 'Export stored prices and stock info as a frozen dataset for LocalFileDataSource'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            required=True,
+            help='Directory to write the dataset to'
+        )
+        parser.add_argument(
+            '--tickers',
+            type=str,
+            help='Comma-separated list of ticker symbols (default: all active stocks)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'parquet'],
+            default='csv',
+            help='History file format (default: csv)'
+        )
+
+    def handle(self, *args, **options):
+        stocks = Stock.objects.filter(is_active=True)
+        if options['tickers']:
+            stocks = stocks.filter(ticker__in=[t.strip().upper() for t in options['tickers'].split(',')])
+        
+        source = LocalFileDataSource(options['output'])
+        
+        for stock in stocks:
+            # Same keys fetch_stock_info reads from yfinance
+            source.save_info(stock.ticker, {
+                'longName': stock.company_name,
+                'sector': stock.sector,
+                'industry': stock.industry,
+                'exchange': stock.exchange,
+                'currency': stock.currency,
+                'currentPrice': stock.current_price,
+                'previousClose': stock.previous_close,
+                'open': stock.open_price,
+                'dayHigh': stock.day_high,
+                'dayLow': stock.day_low,
+                'volume': stock.volume,
+                'marketCap': stock.market_cap,
+                'trailingPE': stock.pe_ratio,
+                'dividendYield': float(stock.dividend_yield) / 100 if stock.dividend_yield is not None else None,
+            })
+        
+        rows = StockPrice.objects.filter(stock__in=stocks).order_by('stock__ticker', 'date').values_list(
+            'stock__ticker', 'date', 'open', 'high', 'low', 'close', 'volume'
+        )
+        frame = pd.DataFrame(list(rows), columns=['ticker', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        
+        count = 0
+        for ticker, hist in frame.groupby('ticker'):
+            hist = hist.drop(columns='ticker').set_index('Date')
+            source.save_history(ticker, hist.astype({col: float for col in ['Open', 'High', 'Low', 'Close']}),
+                                file_format=options['format'])
+            count += 1
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Froze {stocks.count()} stocks and {count} price histories to {options['output']}"
+        ))
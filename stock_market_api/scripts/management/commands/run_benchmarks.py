@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from scripts.benchmarks import (
+    BENCHMARKS, benchmark_price_ingestion, benchmark_indicator_save, benchmark_indicator_panel,
+    benchmark_price_storage, benchmark_monte_carlo, benchmark_screener, SCREEN_EXPRESSION
+)
+
+
+class Command(BaseCommand):
+    help = 'Run data pipeline benchmarks against synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'suite',
+            choices=sorted(BENCHMARKS),
+            help='Benchmark to run'
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=20,
+            help='Years of synthetic price history (default: 20)'
+        )
+        parser.add_argument(
+            '--tickers',
+            type=int,
+            default=500,
+            help='Number of synthetic tickers (default: 500)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Days of prices to calculate indicators over (default: 365)'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1_000_000,
+            help='Price rows to load for the storage benchmark (default: 1000000)'
+        )
+        parser.add_argument(
+            '--paths',
+            type=int,
+            default=100_000,
+            help='Simulated paths for the Monte Carlo benchmark (default: 100000)'
+        )
+        parser.add_argument(
+            '--holdings',
+            type=int,
+            default=50,
+            help='Portfolio holdings for the Monte Carlo benchmark (default: 50)'
+        )
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=10,
+            help='Trading days per simulated path (default: 10)'
+        )
+        parser.add_argument(
+            '--universe',
+            type=int,
+            default=10_000,
+            help='Tickers in the screener benchmark universe (default: 10000)'
+        )
+        parser.add_argument(
+            '--expression',
+            default=SCREEN_EXPRESSION,
+            help='Screen expression to benchmark'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING(f"Running {options['suite']} benchmark..."))
+        
+        if options['suite'] == 'ingestion':
+            benchmark_price_ingestion(years=options['years'])
+        elif options['suite'] == 'indicators':
+            benchmark_indicator_save(tickers=options['tickers'], days=options['days'])
+        elif options['suite'] == 'panel':
+            benchmark_indicator_panel(tickers=options['tickers'], days=options['days'])
+        elif options['suite'] == 'storage':
+            benchmark_price_storage(rows=options['rows'])
+        elif options['suite'] == 'montecarlo':
+            benchmark_monte_carlo(
+                paths=options['paths'], holdings=options['holdings'], horizon=options['horizon']
+            )
+        elif options['suite'] == 'screener':
+            benchmark_screener(tickers=options['universe'], expression=options['expression'])
+        
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
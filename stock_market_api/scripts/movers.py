@@ -0,0 +1,112 @@
+"""
+Market movers
+Top gainers, top losers, most active and unusual volume are ranked from the
+latest DailyMetrics date with NumPy after each price refresh and stored in
+the Django cache as short lists per universe and per sector, so pages read
+a handful of precomputed rows instead of sorting the stocks table per
+request. A cache miss (expiry, or a per-process cache the daily job cannot
+reach) recomputes every list with one query.
+"""
+from urllib.parse import quote
+
+import numpy as np
+
+
+MOVERS_LIMIT = 10
+MOVER_LISTS = ('gainers', 'losers', 'most_active', 'unusual_volume')
+UNIVERSE = 'all'
+
+
+def movers_key(sector=None):
+    """Cache key of the movers for one sector, or the whole universe"""
+    return f"movers:{quote(sector) if sector else UNIVERSE}"
+
+
+def _top(scores, limit):
+    """Positions of the `limit` highest non-NaN scores, highest first, via a partial sort"""
+    candidates = np.flatnonzero(~np.isnan(scores))
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def rank_movers(columns, positions, limit=MOVERS_LIMIT):
+    """
+    Ranked movers among `positions` of the DailyMetrics `columns` arrays.
+    Gainers must be up on the day and losers down; unusual volume is volume
+    relative to the 30-day average.
+    """
+    change = columns['return_1d'][positions]
+    volume = columns['volume'][positions].astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_volume = np.where(columns['avg_volume_30d'][positions] > 0,
+                                   volume / columns['avg_volume_30d'][positions], np.nan)
+
+    def entries(order):
+        return [
+            {
+                'ticker': columns['stock__ticker'][positions[i]],
+                'company_name': columns['stock__company_name'][positions[i]],
+                'sector': columns['stock__sector'][positions[i]],
+                'price': float(columns['close'][positions[i]]),
+                'change_percent': None if np.isnan(change[i]) else float(change[i]),
+                'volume': int(volume[i]),
+                'relative_volume': None if np.isnan(relative_volume[i]) else float(relative_volume[i]),
+            }
+            for i in order
+        ]
+
+    return {
+        'gainers': entries(_top(np.where(change > 0, change, np.nan), limit)),
+        'losers': entries(_top(np.where(change < 0, -change, np.nan), limit)),
+        'most_active': entries(_top(volume, limit)),
+        'unusual_volume': entries(_top(relative_volume, limit)),
+    }
+
+
+def refresh_movers(limit=MOVERS_LIMIT):
+    """
+    Rank movers for the whole universe and for every sector from one
+    DailyMetrics query and store each in the cache. Returns {key: movers}.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from stocks.models import DailyMetrics
+
+    # Ticker order makes ties rank alphabetically
+    columns = DailyMetrics.objects.as_of().filter(stock__is_active=True).order_by('stock__ticker').to_arrays(
+        'date', 'stock__ticker', 'stock__company_name', 'stock__sector',
+        'close', 'volume', 'return_1d', 'avg_volume_30d'
+    )
+    date = columns['date'][0].item() if len(columns['date']) else None
+    sectors = columns['stock__sector']
+
+    groups = {movers_key(): np.arange(len(sectors))}
+    for sector in sorted({sector for sector in sectors.tolist() if sector}):
+        groups[movers_key(sector)] = np.flatnonzero(sectors == sector)
+
+    results = {
+        key: {'date': date, 'stock_count': len(positions), **rank_movers(columns, positions, limit)}
+        for key, positions in groups.items()
+    }
+    cache.set_many(results, getattr(settings, 'MOVERS_CACHE_SECONDS', 900))
+    return results
+
+
+def get_movers(sector=None):
+    """
+    Precomputed movers for a sector, or the whole universe: {'date',
+    'stock_count', 'gainers', 'losers', 'most_active', 'unusual_volume'}.
+    Recomputed on a cache miss; an unknown sector gets empty lists.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    key = movers_key(sector)
+    movers = cache.get(key)
+    if movers is None:
+        movers = refresh_movers().get(key)
+    if movers is None:
+        movers = {'date': None, 'stock_count': 0, **{name: [] for name in MOVER_LISTS}}
+        cache.set(key, movers, getattr(settings, 'MOVERS_CACHE_SECONDS', 900))
+    return movers
@@ -0,0 +1,365 @@
+"""
+Memory-mapped columnar price store
+Full daily histories are exported from StockPrice into one flat binary file
+per field (raw little-endian int64 day numbers for dates, float64 for prices
+and volume) plus index.json mapping each ticker to its segment:
+
+    {"generation": 1, "size": 123456, "wasted": 0,
+     "tickers": {"AAPL": {"offset": 0, "length": 5031, "capacity": 5159,
+                          "updated": "2024-12-31T21:05:00+00:00"}, ...}}
+
+Readers np.memmap the files of the index's generation and slice segments
+without copying. Writers never touch bytes a published index points at: new
+bars go into the unused capacity after a segment, and a segment whose stored
+bars were revised or that outgrows its capacity is written again at the end
+of the files, its old space counted as wasted until the next rebuild. A
+rebuild writes a new generation of files. index.json is replaced atomically
+after the column files are synced, so a reader holding any index sees the
+same bytes for as long as it keeps it. Each entry records the
+Stock.last_updated its bars were read at, so readers can tell when the
+database has moved on.
+"""
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class PriceSeries:
+    """Date-sorted daily prices of one ticker as NumPy arrays"""
+
+    def __init__(self, ticker, dates, open, high, low, close, volume):
+        self.ticker = ticker
+        self.dates = dates
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(getattr(self, field).nbytes for field in PRICE_FIELDS)
+
+    def between(self, start_date=None, end_date=None):
+        """Series restricted to start_date <= date <= end_date; the arrays are views"""
+        lo = 0 if start_date is None else np.searchsorted(self.dates, np.datetime64(start_date, 'D'), side='left')
+        hi = len(self.dates) if end_date is None else np.searchsorted(self.dates, np.datetime64(end_date, 'D'), side='right')
+        return PriceSeries(
+            self.ticker,
+            self.dates[lo:hi],
+            *(getattr(self, field)[lo:hi] for field in PRICE_FIELDS),
+        )
+
+    def returns(self):
+        """Simple daily returns of close, one shorter than the series"""
+        return np.diff(self.close) / self.close[:-1]
+
+    def to_frame(self):
+        """DataFrame of the prices indexed by date"""
+        return pd.DataFrame(
+            {field: getattr(self, field) for field in PRICE_FIELDS},
+            index=pd.DatetimeIndex(self.dates, name='date'),
+        )
+
+
+COLUMN_DTYPES = {
+    'dates': np.dtype('<i8'),
+    **{field: np.dtype('<f8') for field in PRICE_FIELDS},
+}
+
+# Spare bars reserved after each segment (about six months of daily updates)
+SLACK_BARS = 128
+
+# Stored bars re-read from the database on refresh, so revised recent bars are picked up
+OVERLAP_BARS = 5
+
+
+class PriceStore:
+    """Reader and incremental writer for a columnar price store directory"""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._index = None
+        self._index_mtime = None
+        self._columns = {}
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _column_path(self, name, generation):
+        return self._path(f'{name}.{generation}.bin')
+
+    # Reading
+
+    @property
+    def index(self):
+        """Parsed index.json, re-read whenever the file changes"""
+        path = self._path('index.json')
+        mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        if self._index is None or mtime != self._index_mtime:
+            if mtime is None:
+                self._index = {'generation': 0, 'size': 0, 'wasted': 0, 'tickers': {}}
+            else:
+                with open(path) as f:
+                    self._index = json.load(f)
+            self._index_mtime = mtime
+            self._columns = {}
+        return self._index
+
+    def column(self, name):
+        """Whole memory-mapped column (read-only) for 'dates' or a price field"""
+        index = self.index
+        if name not in self._columns:
+            if index['size'] == 0:
+                self._columns[name] = np.empty(0, dtype=COLUMN_DTYPES[name])
+            else:
+                self._columns[name] = np.memmap(
+                    self._column_path(name, index['generation']), dtype=COLUMN_DTYPES[name], mode='r',
+                    shape=(index['size'],),
+                )
+        return self._columns[name]
+
+    @property
+    def tickers(self):
+        return sorted(self.index['tickers'])
+
+    def get(self, ticker, start_date=None, end_date=None):
+        """PriceSeries backed by the memory map (zero-copy), or None for unknown tickers"""
+        entry = self.index['tickers'].get(ticker.upper())
+        if entry is None:
+            return None
+        segment = slice(entry['offset'], entry['offset'] + entry['length'])
+        series = PriceSeries(
+            ticker.upper(),
+            self.column('dates')[segment].view('datetime64[D]'),
+            *(self.column(field)[segment] for field in PRICE_FIELDS),
+        )
+        if start_date is None and end_date is None:
+            return series
+        return series.between(start_date, end_date)
+
+    def get_current(self, tickers, start_date=None, end_date=None):
+        """
+        {TICKER: PriceSeries} for the tickers whose stored bars were read at
+        their current Stock.last_updated, checked in one query; tickers
+        written since the last refresh are left out for the caller to read
+        from the database
+        """
+        from stocks.models import Stock
+
+        entries = self.index['tickers']
+        candidates = [ticker.upper() for ticker in tickers if ticker.upper() in entries]
+        if not candidates:
+            return {}
+        current = {}
+        for ticker, updated in Stock.objects.filter(ticker__in=candidates).values_list('ticker', 'last_updated'):
+            if updated is not None and entries[ticker].get('updated') == updated.isoformat():
+                current[ticker] = self.get(ticker, start_date, end_date)
+        return current
+
+    def close_panel(self, tickers, start_date=None, end_date=None):
+        """
+        (dates, tickers, closes) with closes a dates x tickers float64 array
+        aligned on the union of dates, NaN where a ticker has no bar
+        """
+        series = [s for s in (self.get(ticker, start_date, end_date) for ticker in tickers) if s is not None]
+        if not series:
+            return np.array([], dtype='datetime64[D]'), [], np.empty((0, 0))
+        dates = np.unique(np.concatenate([s.dates for s in series]))
+        closes = np.full((len(dates), len(series)), np.nan)
+        for i, s in enumerate(series):
+            closes[np.searchsorted(dates, s.dates), i] = s.close
+        return dates, [s.ticker for s in series], closes
+
+    # Writing
+
+    def refresh(self, tickers=None, rebuild=False):
+        """
+        Bring the store up to date with StockPrice. Stored tickers re-read only
+        their last OVERLAP_BARS bars onwards; unknown tickers are exported in
+        full. `tickers` limits the refresh, `rebuild` starts a new generation
+        of files from empty. Returns counts of tickers extended into their
+        spare capacity, relocated and added.
+        """
+        from stocks.models import Stock, StockPrice
+
+        os.makedirs(self.root, exist_ok=True)
+        current = self.index
+        if rebuild:
+            index = {'generation': current['generation'] + 1, 'size': 0, 'wasted': 0, 'tickers': {}}
+        else:
+            index = json.loads(json.dumps(current))
+        for name in COLUMN_DTYPES:
+            open(self._column_path(name, index['generation']), 'ab').close()
+
+        stocks = Stock.objects.all()
+        if tickers is not None:
+            stocks = stocks.filter(ticker__in=[ticker.upper() for ticker in tickers])
+
+        # Group stocks by the first date to re-read so each group is one query
+        dates_column = self.column('dates') if not rebuild else None
+        groups = {}
+        updated = {}
+        for stock_id, ticker, last_updated in stocks.values_list('id', 'ticker', 'last_updated'):
+            updated[ticker] = last_updated.isoformat() if last_updated else None
+            entry = index['tickers'].get(ticker)
+            cutoff = None
+            if entry and entry['length']:
+                position = entry['offset'] + max(entry['length'] - OVERLAP_BARS, 0)
+                cutoff = np.datetime64(int(dates_column[position]), 'D').astype(object)
+            groups.setdefault(cutoff, {})[stock_id] = ticker
+
+        counts = {'extended': 0, 'relocated': 0, 'added': 0, 'rows': 0}
+        handles = {
+            name: open(self._column_path(name, index['generation']), 'r+b') for name in COLUMN_DTYPES
+        }
+        try:
+            for cutoff, ticker_of in groups.items():
+                prices = StockPrice.objects.filter(stock_id__in=list(ticker_of))
+                if cutoff is not None:
+                    prices = prices.filter(date__gte=cutoff)
+                rows = prices.order_by('stock_id', 'date').values_list('stock_id', 'date', *PRICE_FIELDS)
+
+                batch = []
+                current = None
+                for row in rows.iterator(chunk_size=10000):
+                    if row[0] != current and batch:
+                        counts[self._write_segment(index, handles, ticker_of[current], batch)] += 1
+                        counts['rows'] += len(batch)
+                        batch = []
+                    current = row[0]
+                    batch.append(row[1:])
+                if batch:
+                    counts[self._write_segment(index, handles, ticker_of[current], batch)] += 1
+                    counts['rows'] += len(batch)
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        for ticker, entry in index['tickers'].items():
+            if ticker in updated:
+                entry['updated'] = updated[ticker]
+        index['updated_at'] = datetime.now().isoformat()
+        self._write_index(index)
+        if rebuild:
+            self._remove_generations(below=index['generation'] - 1)
+        return counts
+
+    def _write_segment(self, index, handles, ticker, rows):
+        """Write sorted (date, open, high, low, close, volume) rows for a ticker; returns the count key"""
+        new_dates = np.array([row[0] for row in rows], dtype='datetime64[D]').astype('<i8')
+        new_values = np.array([row[1:] for row in rows], dtype='<f8')
+
+        entry = index['tickers'].get(ticker)
+        if entry is None:
+            offset = self._append(index, handles, new_dates, new_values)
+            index['tickers'][ticker] = {'offset': offset, 'length': len(rows), 'capacity': len(rows) + SLACK_BARS}
+            return 'added'
+
+        # Everything from the first re-read date onwards is replaced
+        stored_dates = self._read(handles['dates'], 'dates', entry['offset'], entry['length'])
+        position = int(np.searchsorted(stored_dates, new_dates[0]))
+        length = position + len(rows)
+
+        # Unchanged stored bars let the new ones go into the unused capacity after them
+        overlap = entry['length'] - position
+        stored_values = np.column_stack([
+            self._read(handles[field], field, entry['offset'] + position, overlap) for field in PRICE_FIELDS
+        ])
+        unchanged = (
+            overlap <= len(rows)
+            and np.array_equal(stored_dates[position:], new_dates[:overlap])
+            and np.array_equal(stored_values, new_values[:overlap])
+        )
+        if unchanged and length <= entry['capacity']:
+            self._write(handles['dates'], 'dates', entry['offset'] + entry['length'], new_dates[overlap:])
+            for i, field in enumerate(PRICE_FIELDS):
+                self._write(handles[field], field, entry['offset'] + entry['length'], new_values[overlap:, i])
+            entry['length'] = length
+            return 'extended'
+
+        kept_values = np.column_stack([
+            self._read(handles[field], field, entry['offset'], position) for field in PRICE_FIELDS
+        ]) if position else np.empty((0, len(PRICE_FIELDS)))
+        offset = self._append(
+            index, handles,
+            np.concatenate([stored_dates[:position], new_dates]),
+            np.concatenate([kept_values, new_values]),
+        )
+        index['wasted'] += entry['capacity']
+        index['tickers'][ticker] = {'offset': offset, 'length': length, 'capacity': length + SLACK_BARS}
+        return 'relocated'
+
+    def _append(self, index, handles, dates, values):
+        """Add a segment with SLACK_BARS spare capacity at the end of every column"""
+        offset = index['size']
+        padding = np.zeros(SLACK_BARS)
+        self._write(handles['dates'], 'dates', offset, np.concatenate([dates, padding.astype('<i8')]))
+        for i, field in enumerate(PRICE_FIELDS):
+            self._write(handles[field], field, offset, np.concatenate([values[:, i], padding]))
+        index['size'] = offset + len(dates) + SLACK_BARS
+        return offset
+
+    def _read(self, handle, name, offset, length):
+        dtype = COLUMN_DTYPES[name]
+        handle.seek(offset * dtype.itemsize)
+        return np.frombuffer(handle.read(length * dtype.itemsize), dtype=dtype)
+
+    def _write(self, handle, name, offset, values):
+        handle.seek(offset * COLUMN_DTYPES[name].itemsize)
+        handle.write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[name]).tobytes())
+
+    def _write_index(self, index):
+        for name in COLUMN_DTYPES:
+            with open(self._column_path(name, index['generation']), 'rb+') as f:
+                os.fsync(f.fileno())
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='index.', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self._path('index.json'))
+        self._index = None
+
+    def _remove_generations(self, below):
+        """
+        Delete column files older than generation `below`. The generation
+        just replaced is kept so readers that loaded its index a moment ago
+        can still open it; open memory maps survive the unlink.
+        """
+        for filename in os.listdir(self.root):
+            name, _, rest = filename.partition('.')
+            generation = rest[:-len('.bin')] if rest.endswith('.bin') else ''
+            if name in COLUMN_DTYPES and generation.isdigit() and int(generation) < below:
+                os.remove(self._path(filename))
+
+
+_price_stores = {}
+_price_stores_lock = threading.Lock()
+
+
+def get_price_store():
+    """
+    The process-wide PriceStore at settings.PRICE_STORE_DIR, or None when the
+    store is not configured. Sharing it keeps the memory maps open between
+    requests; they are reopened whenever index.json changes.
+    """
+    from django.conf import settings
+
+    root = getattr(settings, 'PRICE_STORE_DIR', '')
+    if not root:
+        return None
+    with _price_stores_lock:
+        if root not in _price_stores:
+            _price_stores[root] = PriceStore(root)
+        return _price_stores[root]
@@ -0,0 +1,122 @@
+"""
+Persistent cache for market data responses
+A single SQLite file holds pickled responses with their store and last-access
+times, so entries survive between daily runs and are evicted least recently
+used first once the cache grows past its size budget
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """Size-bounded on-disk LRU cache with per-read TTLs and hit/miss counters"""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Shared by the fetch worker threads; every access holds self._lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value BLOB, size INTEGER, stored_at REAL, accessed_at REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._conn.commit()
+        self._bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, key, ttl):
+        """Return the cached value if it was stored less than ttl seconds ago, else None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, stored_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def get_many(self, ttls):
+        """
+        {key: value} for the entries of {key: ttl} that are fresh, read with
+        one query. Counted as a single hit when every key is fresh and a
+        single miss otherwise.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT key, value, stored_at FROM responses WHERE key IN ({",".join("?" * len(ttls))})',
+                list(ttls)
+            ).fetchall()
+            fresh = {key: value for key, value, stored_at in rows if now - stored_at <= ttls[key]}
+            if len(fresh) < len(ttls):
+                self.misses += 1
+            else:
+                self.hits += 1
+            if fresh:
+                self._conn.executemany('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                                       [(now, key) for key in fresh])
+                self._conn.commit()
+        return {key: pickle.loads(value) for key, value in fresh.items()}
+
+    def set(self, key, value):
+        """Store a value, evicting least recently used entries past max_bytes"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, stored_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, blob, len(blob), now, now)
+            )
+            self._bytes += len(blob) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes:
+            rows = self._conn.execute(
+                'SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._bytes -= size
+                self.evictions += 1
+                if self._bytes <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+            self._bytes = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': self._bytes,
+        }
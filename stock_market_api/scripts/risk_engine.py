@@ -0,0 +1,795 @@
+"""
+Vectorized risk analytics
+Closes for a set of tickers are read with one StockPrice query, or from the
+memory-mapped price store when PRICE_STORE_DIR is set, and pivoted into a
+dates x tickers matrix; volatility, return, Sharpe ratio, market
+betas, correlations, sector ranks and portfolio risk are then computed with
+NumPy instead of per stock.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+from scripts.price_store import get_price_store
+
+
+TRADING_DAYS = 252
+# Holdings with fewer daily returns than this in a risk window are excluded
+MIN_HOLDING_RETURNS = 30
+
+
+def _last_valid_rows(values):
+    """Index of the latest non-NaN row at or before each cell, 0 before the first"""
+    rows = np.where(~np.isnan(values), np.arange(len(values))[:, None], 0)
+    return np.maximum.accumulate(rows, axis=0)
+
+
+class PriceMatrix:
+    """Dates x tickers matrix of closes, NaN where a ticker has no bar"""
+
+    def __init__(self, tickers, dates, closes):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.closes = closes
+
+    @classmethod
+    def load(cls, tickers, start_date=None, end_date=None):
+        """
+        Closes of `tickers` between the dates (inclusive). Tickers the price
+        store holds at their current version are sliced from its memory maps;
+        the rest come from one query. Unknown tickers stay all-NaN.
+        """
+        from stocks.models import StockPrice
+
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        column_of = {ticker: i for i, ticker in enumerate(tickers)}
+        store = get_price_store()
+        stored = store.get_current(tickers, start_date, end_date) if store is not None else {}
+
+        dates, columns, values = [], [], []
+        for ticker, series in stored.items():
+            dates.append(series.dates)
+            columns.append(np.full(len(series), column_of[ticker], dtype=np.int64))
+            values.append(series.close)
+        queried = [ticker for ticker in tickers if ticker not in stored]
+        if queried or not stored:
+            prices = StockPrice.objects.filter(stock__ticker__in=queried)
+            if start_date is not None:
+                prices = prices.filter(date__gte=start_date)
+            if end_date is not None:
+                prices = prices.filter(date__lte=end_date)
+            rows = prices.to_arrays('stock__ticker', 'date', 'close')
+            dates.append(rows['date'])
+            columns.append(np.fromiter(
+                (column_of[ticker] for ticker in rows['stock__ticker']), dtype=np.int64, count=len(rows['date'])
+            ))
+            values.append(rows['close'])
+
+        unique_dates, date_positions = np.unique(np.concatenate(dates), return_inverse=True)
+        closes = np.full((len(unique_dates), len(tickers)), np.nan)
+        closes[date_positions, np.concatenate(columns)] = np.concatenate(values)
+        return cls(tickers, unique_dates, closes)
+
+    def returns(self):
+        """
+        (dates[1:] x tickers) simple returns between each ticker's consecutive
+        bars. A ticker missing a date gets NaN there and its next return is
+        measured from its previous close, as a per-ticker series would be.
+        """
+        closes = self.closes
+        previous = np.take_along_axis(closes, _last_valid_rows(closes), axis=0)[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(~np.isnan(closes[1:]), closes[1:] / previous - 1, np.nan)
+
+
+def market_returns(matrix, market_ticker):
+    """
+    (dates, stock_returns, market_returns) for every column of `matrix`
+    against the `market_ticker` column. The return matrices are (dates x
+    tickers) with NaN where a pair is missing; dates are the market's trading
+    days after its first. Each stock is aligned with the market on the dates
+    both traded and returns run between consecutive shared dates, as a
+    pairwise intersect-then-diff would.
+    """
+    market = matrix.closes[:, matrix.tickers.index(market_ticker.upper())]
+    traded = ~np.isnan(market)
+    closes, market, dates = matrix.closes[traded], market[traded], matrix.dates[traded]
+    if len(closes) < 2:
+        empty = np.empty((0, closes.shape[1]))
+        return dates[:0], empty, empty.copy()
+
+    previous_rows = _last_valid_rows(closes)[:-1]
+    previous = np.take_along_axis(closes, previous_rows, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stock_returns = closes[1:] / previous - 1
+        market_moves = market[1:, None] / market[previous_rows] - 1
+    market_moves = np.where(np.isnan(stock_returns), np.nan, market_moves)
+    return dates[1:], stock_returns, market_moves
+
+
+def betas(stock_returns, market_returns, min_observations=30):
+    """
+    Closed-form OLS betas cov(stock, market) / var(market) of every column at
+    once, ignoring NaN pairs. Columns with fewer than `min_observations`
+    returns (or a flat market) get NaN. Returns (betas, observations).
+    """
+    valid = ~np.isnan(stock_returns)
+    observations = valid.sum(axis=0)
+    x = np.where(valid, market_returns, 0.0)
+    y = np.where(valid, stock_returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = x.sum(axis=0) / observations
+        y_mean = y.sum(axis=0) / observations
+        x_centered = np.where(valid, x - x_mean, 0.0)
+        covariance = (x_centered * np.where(valid, y - y_mean, 0.0)).sum(axis=0)
+        variance = (x_centered ** 2).sum(axis=0)
+        result = covariance / variance
+    result[(observations < min_observations) | ~(variance > 0)] = np.nan
+    return result, observations
+
+
+def rolling_betas(stock_returns, market_returns, window):
+    """
+    Betas over trailing windows of `window` returns (rows), from cumulative
+    sums so the cost does not grow with the window. A window holding any
+    missing return is NaN.
+    """
+    valid = ~np.isnan(stock_returns)
+    x = np.where(valid, market_returns, 0.0)
+    y = np.where(valid, stock_returns, 0.0)
+    result = np.full(stock_returns.shape, np.nan)
+    if len(stock_returns) < window:
+        return result
+
+    def window_sums(values):
+        sums = np.cumsum(np.vstack([np.zeros((1, values.shape[1])), values]), axis=0)
+        return sums[window:] - sums[:-window]
+
+    count = window_sums(valid.astype(float))
+    sum_x, sum_y = window_sums(x), window_sums(y)
+    covariance = window_sums(x * y) - sum_x * sum_y / window
+    variance = window_sums(x * x) - sum_x ** 2 / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[window - 1:] = np.where((count == window) & (variance > 0), covariance / variance, np.nan)
+    return result
+
+
+def market_betas(tickers, market_ticker='SPY', period_days=252, end_date=None, window=None, min_observations=30):
+    """
+    Betas of `tickers` against `market_ticker` over the last `period_days`
+    calendar days, with the market loaded once in the same query as the
+    stocks. Returns
+        {'date', 'market', 'period_days',
+         'betas': {ticker: beta or None}, 'observations': {ticker: n},
+         'rolling': None or {'window', 'dates', 'betas': {ticker: array}}}
+    where rolling betas over `window` returns are included when requested.
+    """
+    end_date = end_date or datetime.now().date()
+    market_ticker = market_ticker.upper()
+    tickers = [ticker for ticker in dict.fromkeys(ticker.upper() for ticker in tickers) if ticker != market_ticker]
+
+    matrix = PriceMatrix.load(tickers + [market_ticker], end_date - timedelta(days=period_days), end_date)
+    dates, stock_returns, market_moves = market_returns(matrix, market_ticker)
+    stock_returns, market_moves = stock_returns[:, :-1], market_moves[:, :-1]
+    values, observations = betas(stock_returns, market_moves, min_observations=min_observations)
+
+    result = {
+        'date': end_date,
+        'market': market_ticker,
+        'period_days': period_days,
+        'betas': {ticker: None if np.isnan(beta) else float(beta) for ticker, beta in zip(tickers, values)},
+        'observations': {ticker: int(count) for ticker, count in zip(tickers, observations)},
+        'rolling': None,
+    }
+    if window:
+        rolling = rolling_betas(stock_returns, market_moves, window)
+        result['rolling'] = {
+            'window': window,
+            'dates': dates,
+            'betas': {ticker: rolling[:, i] for i, ticker in enumerate(tickers)},
+        }
+    return result
+
+
+def save_betas(result, batch_size=1000):
+    """
+    Upsert a market_betas() result into StockBeta: one full-period row per
+    ticker dated result['date'], plus one row per date of any rolling betas.
+    Returns the number of rows written.
+    """
+    from stocks.models import Stock, StockBeta
+
+    stock_ids = dict(Stock.objects.filter(ticker__in=list(result['betas'])).values_list('ticker', 'id'))
+    rows = [
+        StockBeta(
+            stock_id=stock_ids[ticker],
+            benchmark=result['market'],
+            date=result['date'],
+            period_days=result['period_days'],
+            window=0,
+            beta=beta,
+            observations=result['observations'][ticker],
+        )
+        for ticker, beta in result['betas'].items()
+        if beta is not None and ticker in stock_ids
+    ]
+
+    rolling = result['rolling']
+    if rolling:
+        dates = rolling['dates'].astype(object)
+        for ticker, series in rolling['betas'].items():
+            if ticker not in stock_ids:
+                continue
+            for position in np.flatnonzero(~np.isnan(series)):
+                rows.append(StockBeta(
+                    stock_id=stock_ids[ticker],
+                    benchmark=result['market'],
+                    date=dates[position],
+                    period_days=result['period_days'],
+                    window=rolling['window'],
+                    beta=float(series[position]),
+                    observations=rolling['window'],
+                ))
+
+    StockBeta.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['stock', 'benchmark', 'period_days', 'window', 'date'],
+        update_fields=['beta', 'observations', 'updated_at'],
+    )
+    return len(rows)
+
+
+def volatility_metrics(returns, periods_per_year=TRADING_DAYS):
+    """
+    Column-wise annualized volatility, annualized mean return and Sharpe ratio
+    of a (dates x tickers) returns matrix, ignoring NaN. Columns with no
+    returns, or zero volatility, get 0 like the original per-stock loop.
+    """
+    observations = (~np.isnan(returns)).sum(axis=0)
+    has_data = observations > 0
+    volatility = np.zeros(returns.shape[1])
+    annual_return = np.zeros(returns.shape[1])
+    if has_data.any():
+        volatility[has_data] = np.nanstd(returns[:, has_data], axis=0) * np.sqrt(periods_per_year)
+        annual_return[has_data] = np.nanmean(returns[:, has_data], axis=0) * periods_per_year
+    sharpe = np.divide(annual_return, volatility, out=np.zeros_like(volatility), where=volatility > 0)
+    return {
+        'volatility': volatility,
+        'annual_return': annual_return,
+        'sharpe_ratio': sharpe,
+        'observations': observations,
+    }
+
+
+def risk_metrics(tickers, days=30, end_date=None):
+    """
+    [{'ticker', 'volatility', 'annual_return', 'sharpe_ratio', 'observations'}]
+    over the last `days` calendar days, highest volatility first. Volatility
+    and return are percentages.
+    """
+    end_date = end_date or datetime.now().date()
+    matrix = PriceMatrix.load(tickers, end_date - timedelta(days=days), end_date)
+    metrics = volatility_metrics(matrix.returns())
+
+    results = [
+        {
+            'ticker': ticker,
+            'volatility': float(metrics['volatility'][i] * 100),
+            'annual_return': float(metrics['annual_return'][i] * 100),
+            'sharpe_ratio': float(metrics['sharpe_ratio'][i]),
+            'observations': int(metrics['observations'][i]),
+        }
+        for i, ticker in enumerate(matrix.tickers)
+    ]
+    results.sort(key=lambda result: result['volatility'], reverse=True)
+    return results
+
+
+def pairwise_correlation(returns, min_periods=30):
+    """
+    Pearson correlations of a (dates x tickers) returns matrix with NaN gaps,
+    each pair over the dates both tickers have (pandas' DataFrame.corr
+    semantics). Masked column sums turn every pair's sums into matrix
+    products. Returns (correlation, observations); pairs with fewer than
+    `min_periods` common dates are NaN.
+    """
+    present = (~np.isnan(returns)).astype(float)
+    values = np.where(present > 0, returns, 0.0)
+
+    observations = present.T @ present
+    sums = values.T @ present  # sums[i, j]: sum of i's returns on dates j also has
+    squares = (values ** 2).T @ present
+    products = values.T @ values
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products - sums * sums.T / observations
+        variance = squares - sums ** 2 / observations
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation = np.clip(correlation, -1, 1)
+    correlation[observations < max(min_periods, 2)] = np.nan
+    return correlation, observations.astype(np.int64)
+
+
+def shrunk_correlation(returns):
+    """
+    Ledoit-Wolf estimate from a complete (dates x tickers) returns matrix:
+    the sample correlation shrunk towards the identity by the intensity that
+    minimises expected Frobenius loss. Columns with zero variance have no
+    defined correlation: they are left out of the estimate and come back as
+    NaN rows and columns. Returns (correlation, intensity).
+    """
+    spread = returns.std(axis=0)
+    varying = spread > 0
+    if not varying.all():
+        correlation = np.full((returns.shape[1], returns.shape[1]), np.nan)
+        if varying.sum() < 2:
+            return correlation, 1.0
+        estimate, intensity = shrunk_correlation(returns[:, varying])
+        correlation[np.ix_(varying, varying)] = estimate
+        return correlation, intensity
+
+    observations = len(returns)
+    standardized = (returns - returns.mean(axis=0)) / spread
+    sample = standardized.T @ standardized / observations
+    target = np.eye(len(sample))
+
+    dispersion = np.sum((sample - target) ** 2)
+    # Mean squared distance of each date's outer product from the sample matrix
+    variation = (np.sum(np.sum(standardized ** 2, axis=1) ** 2) - observations * np.sum(sample ** 2)) / observations ** 2
+    intensity = min(variation, dispersion) / dispersion if dispersion > 0 else 1.0
+    return intensity * target + (1 - intensity) * sample, float(intensity)
+
+
+def correlation_matrix(tickers, days=90, end_date=None, method='pairwise', min_periods=30, use_cache=True):
+    """
+    Correlation of daily returns for `tickers` over the last `days` calendar
+    days, from one pivoted price query. 'pairwise' correlates each pair over
+    the dates both traded; 'shrinkage' uses dates all measured tickers
+    traded and applies Ledoit-Wolf shrinkage, which keeps the matrix
+    positive definite when tickers outnumber dates. Tickers with fewer than
+    `min_periods` returns are listed in 'excluded'. The matrix is a list of
+    rows in 'tickers' order with None for unmeasurable pairs. Results are
+    cached per (ticker set, window, method, date) and invalidated when any
+    ticker's Stock.last_updated changes. Returns None when no ticker can be
+    measured.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from stocks.models import Stock
+
+    if method not in ('pairwise', 'shrinkage'):
+        raise ValueError(f"Unknown correlation method: {method}")
+
+    end_date = end_date or datetime.now().date()
+    tickers = sorted({ticker.upper() for ticker in tickers})
+    versions = sorted(
+        str(updated) for updated in Stock.objects.filter(ticker__in=tickers).values_list('last_updated', flat=True)
+    )
+    payload = json.dumps([tickers, days, method, min_periods, end_date, versions[-1] if versions else None],
+                         default=str)
+    key = 'correlation:' + hashlib.sha1(payload.encode()).hexdigest()
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    matrix = PriceMatrix.load(tickers, end_date - timedelta(days=days), end_date)
+    returns = matrix.returns()
+    counts = (~np.isnan(returns)).sum(axis=0)
+    measured = [i for i, count in enumerate(counts) if count >= min_periods]
+    excluded = [ticker for i, ticker in enumerate(tickers) if counts[i] < min_periods]
+    returns = returns[:, measured]
+
+    intensity = None
+    if method == 'pairwise':
+        correlation, observations = pairwise_correlation(returns, min_periods=min_periods)
+        observations = observations.tolist()
+    else:
+        returns = returns[~np.isnan(returns).any(axis=1)]
+        if len(returns) < max(min_periods, 2):
+            measured = []
+        else:
+            correlation, intensity = shrunk_correlation(returns)
+            observations = len(returns)
+    if not measured:
+        return None
+
+    result = {
+        'date': end_date,
+        'days': days,
+        'method': method,
+        'tickers': [tickers[i] for i in measured],
+        'excluded': excluded,
+        'matrix': [
+            [None if np.isnan(value) else round(float(value), 6) for value in row]
+            for row in correlation
+        ],
+        'observations': observations,
+        'shrinkage': intensity,
+    }
+    if use_cache:
+        cache.set(key, result, getattr(settings, 'CORRELATION_CACHE_SECONDS', 300))
+    return result
+
+
+def percentile_ranks(values):
+    """
+    Percentile rank (0-100) of each value among the other non-NaN values:
+    the share of them it is above, counting ties as half. NaN stays NaN, as
+    does a value with nothing to compare against.
+    """
+    values = np.asarray(values, dtype=float)
+    ranks = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    count = int(valid.sum())
+    if count < 2:
+        return ranks
+
+    ordered = np.sort(values[valid])
+    below = np.searchsorted(ordered, values[valid], side='left')
+    ties = np.searchsorted(ordered, values[valid], side='right') - below - 1
+    ranks[valid] = (below + ties / 2) / (count - 1) * 100
+    return ranks
+
+
+def period_performance(stocks, start_date, end_date):
+    """
+    {ticker: % change from first to last close between the dates} for a
+    Stock queryset, from one query that returns a single row per stock:
+    window functions pick each stock's first close and its latest bar.
+    Stocks with fewer than two bars in the range are left out.
+    """
+    from django.db.models import Count, F, Window
+    from django.db.models.functions import FirstValue, RowNumber
+    from stocks.models import StockPrice
+
+    partition = {'partition_by': [F('stock_id')]}
+    rows = StockPrice.objects.filter(
+        stock__in=stocks, date__gte=start_date, date__lte=end_date
+    ).annotate(
+        first_close=Window(FirstValue('close'), order_by=F('date').asc(), **partition),
+        bars=Window(Count('id'), **partition),
+        latest=Window(RowNumber(), order_by=F('date').desc(), **partition),
+    ).filter(latest=1, bars__gte=2).order_by().values_list('stock__ticker', 'first_close', 'close')
+
+    return {ticker: (last - first) / first * 100 for ticker, first, last in rows if first}
+
+
+def sector_analytics(stocks, days=30, end_date=None):
+    """
+    Performance over the last `days` calendar days with P/E and market cap
+    for every stock in a Stock queryset (typically one sector), each with
+    its percentile rank among the others. Two queries whatever the number
+    of stocks. Returns {ticker: {...}}; missing values and their ranks are
+    None.
+    """
+    end_date = end_date or datetime.now().date()
+    rows = list(stocks.order_by().values_list('ticker', 'pe_ratio', 'market_cap'))
+    performance = period_performance(stocks, end_date - timedelta(days=days), end_date)
+
+    tickers = [ticker for ticker, _, _ in rows]
+    columns = {
+        'performance': np.array([performance.get(ticker, np.nan) for ticker in tickers], dtype=float),
+        'pe_ratio': np.array([np.nan if pe is None else float(pe) for _, pe, _ in rows]),
+        'market_cap': np.array([np.nan if cap is None else float(cap) for _, _, cap in rows]),
+    }
+    ranks = {
+        'performance_percentile': percentile_ranks(columns['performance']),
+        'pe_percentile': percentile_ranks(columns['pe_ratio']),
+        'size_percentile': percentile_ranks(columns['market_cap']),
+    }
+
+    return {
+        ticker: {
+            name: None if np.isnan(values[i]) else float(values[i])
+            for name, values in {**columns, **ranks}.items()
+        }
+        for i, ticker in enumerate(tickers)
+    }
+
+
+def portfolio_statistics(returns, weights, confidence=0.95, risk_free_rate=0.02, periods_per_year=TRADING_DAYS):
+    """
+    Risk of a weighted portfolio from a complete (dates x holdings) returns
+    matrix. Variance is w'Σw on the sample covariance; VaR/CVaR are daily
+    losses at `confidence`, historical from the weighted return series and
+    parametric from a normal fit. Percentages except the Sharpe ratio.
+    """
+    weights = np.asarray(weights, dtype=float)
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    variance = float(weights @ covariance @ weights)
+    daily_volatility = np.sqrt(max(variance, 0.0))
+
+    series = returns @ weights
+    mean = float(series.mean())
+    annual_volatility = daily_volatility * np.sqrt(periods_per_year)
+    annual_return = mean * periods_per_year
+
+    tail = 1 - confidence
+    historical_var = -float(np.percentile(series, tail * 100))
+    losses = series[series <= -historical_var]
+    z = NormalDist().inv_cdf(tail)
+    parametric_var = -(mean + z * daily_volatility)
+    parametric_cvar = -(mean - daily_volatility * NormalDist().pdf(z) / tail)
+
+    growth = np.cumprod(np.concatenate([[1.0], 1 + series]))
+    drawdown = growth / np.maximum.accumulate(growth) - 1
+
+    # Share of portfolio variance each holding contributes (sums to 1)
+    contributions = weights * (covariance @ weights) / variance if variance > 0 else np.zeros_like(weights)
+
+    return {
+        'observations': len(series),
+        'volatility': annual_volatility * 100,
+        'daily_volatility': daily_volatility * 100,
+        'annual_return': annual_return * 100,
+        'sharpe_ratio': (annual_return - risk_free_rate) / annual_volatility if annual_volatility > 0 else 0.0,
+        'var_historical': historical_var * 100,
+        'cvar_historical': -float(losses.mean()) * 100 if len(losses) else historical_var * 100,
+        'var_parametric': parametric_var * 100,
+        'cvar_parametric': parametric_cvar * 100,
+        'max_drawdown': float(drawdown.min()) * 100,
+        'risk_contributions': contributions,
+        'covariance': covariance,
+    }
+
+
+def covariance_factor(covariance):
+    """
+    Lower-triangular L with LL' = covariance (Cholesky). Sample covariances
+    that are only positive semi-definite (collinear holdings, fewer dates
+    than holdings) fall back to an eigen-decomposition factor.
+    """
+    covariance = np.atleast_2d(np.asarray(covariance, dtype=float))
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+def simulate_portfolio(mean, covariance, weights, horizon=10, simulations=100_000, confidence=0.95,
+                       seed=None, max_bytes=64 * 2 ** 20):
+    """
+    Monte Carlo value paths of a buy-and-hold portfolio. Daily holding
+    returns are drawn as mean + Lz with L the covariance factor, compounded
+    per holding over `horizon` days and valued at the starting `weights`.
+
+    Paths are simulated in antithetic pairs (z and -z) and in chunks sized so
+    the (paths x horizon x holdings) float32 working arrays stay within
+    `max_bytes`; results do not depend on the chunk size for a given seed.
+    VaR/CVaR are losses over the horizon at `confidence`; percentiles are
+    of the horizon return. Percentages throughout.
+    """
+    mean = np.asarray(mean, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    holdings = len(weights)
+    factor = covariance_factor(covariance).T.astype(np.float32)
+    drift = (1 + mean).astype(np.float32)
+    weights32 = weights.astype(np.float32)
+    rng = np.random.default_rng(seed)
+
+    pairs = -(-simulations // 2)
+    # Two float32 arrays of (chunk, horizon, holdings): the draws and the compounded growth
+    chunk = max(1, min(pairs, max_bytes // (horizon * holdings * 4 * 2)))
+    terminal = np.empty(2 * pairs)
+    drawdowns = np.empty(2 * pairs)
+
+    chunks = 0
+    for begin in range(0, pairs, chunk):
+        size = min(chunk, pairs - begin)
+        # Path-major draws consume the generator in the same order whatever the chunk size
+        shocks = (rng.standard_normal((size * horizon, holdings), dtype=np.float32) @ factor).reshape(
+            size, horizon, holdings
+        )
+        growth = np.empty_like(shocks)
+        for offset, sign in ((0, 1), (pairs, -1)):
+            if sign > 0:
+                np.add(drift, shocks, out=growth)
+            else:
+                np.subtract(drift, shocks, out=growth)
+            for day in range(1, horizon):
+                growth[:, day] *= growth[:, day - 1]
+            values = (growth.reshape(-1, holdings) @ weights32).reshape(size, horizon)
+            peaks = np.maximum.accumulate(np.maximum(values, 1), axis=1)
+            terminal[offset + begin:offset + begin + size] = values[:, -1] - 1
+            drawdowns[offset + begin:offset + begin + size] = (values / peaks - 1).min(axis=1)
+        chunks += 1
+
+    terminal = terminal[:simulations]
+    drawdowns = drawdowns[:simulations]
+    tail = 1 - confidence
+    var = -float(np.percentile(terminal, tail * 100))
+    losses = terminal[terminal <= -var]
+
+    return {
+        'simulations': simulations,
+        'horizon': horizon,
+        'confidence': confidence,
+        'chunks': chunks,
+        'var': var * 100,
+        'cvar': -float(losses.mean()) * 100 if len(losses) else var * 100,
+        'percentiles': {
+            q: float(value) * 100
+            for q, value in zip((1, 5, 25, 50, 75, 95, 99), np.percentile(terminal, (1, 5, 25, 50, 75, 95, 99)))
+        },
+        'mean_return': float(terminal.mean()) * 100,
+        'return_volatility': float(terminal.std()) * 100,
+        'probability_of_loss': float((terminal < 0).mean()) * 100,
+        'max_drawdown': {
+            'mean': float(drawdowns.mean()) * 100,
+            'median': float(np.median(drawdowns)) * 100,
+            'worst_5': float(np.percentile(drawdowns, 5)) * 100,
+        },
+    }
+
+
+def holdings_key(holdings, *parts):
+    """Stable cache key for {ticker: quantity} holdings plus any extra parts"""
+    payload = json.dumps([sorted((ticker.upper(), float(quantity)) for ticker, quantity in holdings.items()), parts],
+                         default=str)
+    return 'portfolio_risk:' + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def load_holdings(holdings):
+    """
+    Normalise {ticker: quantity} holdings (upper-cased, duplicates summed)
+    and fetch {ticker: (current_price, last_updated)} for the known stocks
+    """
+    from stocks.models import Stock
+
+    quantities = {}
+    for ticker, quantity in holdings.items():
+        quantities[ticker.upper()] = quantities.get(ticker.upper(), 0.0) + float(quantity)
+
+    stocks = {
+        ticker: (price, updated)
+        for ticker, price, updated in Stock.objects.filter(
+            ticker__in=list(quantities)
+        ).values_list('ticker', 'current_price', 'last_updated')
+    }
+    return quantities, stocks
+
+
+def holding_returns(quantities, stocks, start_date, end_date, min_periods=MIN_HOLDING_RETURNS):
+    """
+    Complete-case daily returns for priced holdings between two dates.
+    Returns (tickers, weights, returns, excluded, values) where `values` maps
+    every priced holding to its market value, weights are market-value
+    shares of the measured holdings and `returns` keeps only dates every one
+    of them traded, or None when fewer than two such dates exist.
+    Holdings with fewer than `min_periods` returns (capped at half the
+    longest history in the window, so short windows still measure) are
+    excluded rather than allowed to shorten everyone else's window.
+    """
+    values = {
+        ticker: float(stocks[ticker][0]) * quantity
+        for ticker, quantity in quantities.items()
+        if ticker in stocks and stocks[ticker][0]
+    }
+    matrix = PriceMatrix.load(list(values), start_date, end_date)
+    returns = matrix.returns()
+    counts = (~np.isnan(returns)).sum(axis=0)
+    required = max(min(min_periods, int(counts.max(initial=0)) // 2), 1)
+    measured = [i for i in range(len(matrix.tickers)) if counts[i] >= required]
+    excluded = sorted(set(quantities) - {matrix.tickers[i] for i in measured})
+
+    returns = returns[:, measured]
+    returns = returns[~np.isnan(returns).any(axis=1)]
+    if not measured or len(returns) < 2:
+        return None
+
+    tickers = [matrix.tickers[i] for i in measured]
+    market_values = np.array([values[ticker] for ticker in tickers])
+    weights = market_values / market_values.sum()
+    return tickers, weights, returns, excluded, values
+
+
+def portfolio_risk(holdings, days=90, end_date=None, confidence=0.95, risk_free_rate=0.02, use_cache=True):
+    """
+    Risk of {ticker: quantity} holdings over the last `days` calendar days.
+    Weights are market values at Stock.current_price; holdings without a
+    price or with too few returns in the window (see holding_returns) are
+    listed in 'excluded' and the rest are re-weighted. Returns are aligned on
+    dates every included holding traded. Results are cached per (holdings, window, confidence, date) and
+    invalidated when any holding's Stock.last_updated changes.
+    Returns None when no holding can be measured.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    end_date = end_date or datetime.now().date()
+    quantities, stocks = load_holdings(holdings)
+    versions = sorted(str(updated) for _, updated in stocks.values())
+    key = holdings_key(quantities, days, confidence, risk_free_rate, end_date, versions[-1] if versions else None)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    loaded = holding_returns(quantities, stocks, end_date - timedelta(days=days), end_date)
+    if loaded is None:
+        return None
+    tickers, weights, returns, excluded, values = loaded
+    statistics = portfolio_statistics(returns, weights, confidence=confidence, risk_free_rate=risk_free_rate)
+
+    result = {
+        'date': end_date,
+        'days': days,
+        'confidence': confidence,
+        'total_value': float(sum(values.values())),
+        'excluded': excluded,
+        'holdings': [
+            {
+                'ticker': ticker,
+                'weight': float(weights[i]),
+                'volatility': float(np.sqrt(statistics['covariance'][i, i] * TRADING_DAYS) * 100),
+                'risk_contribution': float(statistics['risk_contributions'][i]),
+            }
+            for i, ticker in enumerate(tickers)
+        ],
+        **{
+            name: value for name, value in statistics.items()
+            if name not in ('risk_contributions', 'covariance')
+        },
+    }
+    if use_cache:
+        cache.set(key, result, getattr(settings, 'PORTFOLIO_RISK_CACHE_SECONDS', 300))
+    return result
+
+
+def monte_carlo_risk(holdings, days=252, horizon=10, simulations=100_000, confidence=0.95, end_date=None,
+                     seed=None, use_cache=True):
+    """
+    Monte Carlo VaR of {ticker: quantity} holdings: mean and covariance of
+    complete-case daily returns over the last `days` calendar days feed
+    simulate_portfolio at market-value weights. Cached like portfolio_risk;
+    unseeded runs are cached too, so repeated views show the same draw.
+    Returns None when no holding can be measured.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    end_date = end_date or datetime.now().date()
+    quantities, stocks = load_holdings(holdings)
+    versions = sorted(str(updated) for _, updated in stocks.values())
+    key = holdings_key(
+        quantities, 'monte_carlo', days, horizon, simulations, confidence, seed, end_date,
+        versions[-1] if versions else None
+    )
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    loaded = holding_returns(quantities, stocks, end_date - timedelta(days=days), end_date)
+    if loaded is None:
+        return None
+    tickers, weights, returns, excluded, values = loaded
+    simulated_value = float(sum(values[ticker] for ticker in tickers))
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    simulation = simulate_portfolio(
+        returns.mean(axis=0), covariance, weights, horizon=horizon, simulations=simulations,
+        confidence=confidence, seed=seed
+    )
+
+    result = {
+        'date': end_date,
+        'days': days,
+        'observations': len(returns),
+        'total_value': float(sum(values.values())),
+        'simulated_value': simulated_value,
+        'excluded': excluded,
+        'holdings': [{'ticker': ticker, 'weight': float(weights[i])} for i, ticker in enumerate(tickers)],
+        'var_amount': simulated_value * simulation['var'] / 100,
+        'cvar_amount': simulated_value * simulation['cvar'] / 100,
+        **simulation,
+    }
+    if use_cache:
+        cache.set(key, result, getattr(settings, 'PORTFOLIO_RISK_CACHE_SECONDS', 300))
+    return result
@@ -0,0 +1,541 @@
+"""
+In-memory columnar stock screener
+The screenable universe -- quote and fundamentals from Stock, the latest
+IndicatorSnapshot and the latest DailyMetrics row of every active stock --
+is held as one NumPy array per column. A screen is a boolean mask built
+column by column and a sort is one argsort, so any combination of filters
+costs a few vector operations instead of a join per request. The universe is
+rebuilt when the source tables change, checked at most every
+revalidate_after seconds.
+
+Screens can also be written as expressions over the columns, e.g.
+`rsi14 < 30 and close > sma200 and volume > 2 * avg_vol_30`. An expression
+is parsed once into a tree of NumPy operations and cached by its text, so
+evaluating it is a handful of whole-column operations.
+"""
+import ast
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+
+TEXT_COLUMNS = ('ticker', 'company_name', 'sector', 'industry')
+
+# Screener column -> source field
+STOCK_COLUMNS = {
+    'price': 'current_price',
+    'previous_close': 'previous_close',
+    'market_cap': 'market_cap',
+    'pe_ratio': 'pe_ratio',
+    'dividend_yield': 'dividend_yield',
+    'volume': 'volume',
+}
+INDICATOR_COLUMNS = {
+    'rsi14': 'rsi_14',
+    'sma20': 'sma_20',
+    'sma50': 'sma_50',
+    'sma200': 'sma_200',
+    'ema12': 'ema_12',
+    'ema26': 'ema_26',
+    'macd': 'macd',
+    'macd_signal': 'macd_signal',
+    'macd_histogram': 'macd_histogram',
+    'bb_upper': 'bb_upper',
+    'bb_middle': 'bb_middle',
+    'bb_lower': 'bb_lower',
+    'stoch_k': 'stoch_k',
+    'stoch_d': 'stoch_d',
+    'adx14': 'adx_14',
+    'atr14': 'atr_14',
+}
+METRIC_COLUMNS = {
+    'close': 'close',
+    'return_1d': 'return_1d',
+    'return_5d': 'return_5d',
+    'return_1m': 'return_1m',
+    'return_3m': 'return_3m',
+    'return_ytd': 'return_ytd',
+    'return_1y': 'return_1y',
+    'volatility_30': 'volatility_30d',
+    'avg_vol_30': 'avg_volume_30d',
+}
+NUMERIC_COLUMNS = tuple(STOCK_COLUMNS) + ('change_percent',) + tuple(INDICATOR_COLUMNS) + tuple(METRIC_COLUMNS)
+# Indicator filters only match snapshots at most this old, as the SQL screener did
+INDICATOR_MAX_AGE_DAYS = 7
+
+NUMERIC_OPERATORS = {
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'lt': np.less,
+    'lte': np.less_equal,
+    'eq': np.equal,
+}
+
+# Query parameter -> (column, operator, parser), shared by the screener API and page
+SCREEN_PARAMETERS = {
+    'min_price': ('price', 'gte', float),
+    'max_price': ('price', 'lte', float),
+    'min_market_cap': ('market_cap', 'gte', int),
+    'max_market_cap': ('market_cap', 'lte', int),
+    'min_pe': ('pe_ratio', 'gte', float),
+    'max_pe': ('pe_ratio', 'lte', float),
+    'min_div_yield': ('dividend_yield', 'gte', float),
+    'sector': ('sector', 'iexact', str),
+    'min_volume': ('volume', 'gte', int),
+    'rsi_min': ('rsi14', 'gte', float),
+    'rsi_max': ('rsi14', 'lte', float),
+}
+
+
+def filters_from_params(params):
+    """
+    [(column, operator, value)] for the screener query parameters present in
+    `params`. Raises ValueError naming the first parameter that does not parse.
+    """
+    filters = []
+    for name, (column, operator, parse) in SCREEN_PARAMETERS.items():
+        raw = params.get(name)
+        if not raw:
+            continue
+        try:
+            filters.append((column, operator, parse(raw)))
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {raw}")
+    return filters
+
+
+EXPRESSION_MAX_LENGTH = 500
+EXPRESSION_CACHE_SIZE = 256
+# Largest magnitude a numeric constant may have; beyond it arithmetic can overflow float64
+EXPRESSION_MAX_CONSTANT = 1e18
+
+_COMPARISONS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+_ARITHMETIC = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+}
+
+
+class ScreenExpression:
+    """
+    A compiled screen expression: call it with a ScreenerUniverse for the
+    boolean mask of matching stocks. A comparison involving a missing value
+    (NULL, a non-finite result such as a division by zero, or an empty text
+    column) is unknown rather than false, so `!=` and `not` never match it,
+    and and/or follow SQL's three-valued logic. Referencing an indicator
+    column also requires a snapshot from the last INDICATOR_MAX_AGE_DAYS
+    days, as with parameter filters.
+    """
+
+    def __init__(self, text, evaluate, columns):
+        self.text = text
+        self.columns = columns
+        self._evaluate = evaluate
+
+    def __call__(self, universe):
+        try:
+            with np.errstate(all='ignore'):
+                mask, _ = self._evaluate(universe)
+        except ArithmeticError as e:
+            raise ValueError(f"Cannot evaluate screen expression {self.text}: {e}")
+        mask = np.broadcast_to(mask, (len(universe),))
+        if self.columns & INDICATOR_COLUMNS.keys():
+            mask = mask & universe.fresh_indicators()
+        return mask
+
+    def __repr__(self):
+        return f"ScreenExpression({self.text!r})"
+
+
+def _and(left, right):
+    """Three-valued and of (true, known) pairs: false wherever either side is known false"""
+    (left_true, left_known), (right_true, right_known) = left, right
+    return (left_true & right_true,
+            (left_known & right_known) | (left_known & ~left_true) | (right_known & ~right_true))
+
+
+def _or(left, right):
+    """Three-valued or of (true, known) pairs: true wherever either side is true"""
+    (left_true, left_known), (right_true, right_known) = left, right
+    return left_true | right_true, (left_known & right_known) | left_true | right_true
+
+
+def _compile(node, columns):
+    """
+    (kind, evaluate) for an expression node, where kind is 'mask', 'number'
+    or 'text'. For masks evaluate maps a ScreenerUniverse to a (true, known)
+    pair of boolean arrays, otherwise to an array or scalar.
+    Anything outside the small grammar raises ValueError.
+    """
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_mask(value, columns) for value in node.values]
+        combine = _and if isinstance(node.op, ast.And) else _or
+
+        def evaluate(universe):
+            result = operands[0](universe)
+            for operand in operands[1:]:
+                result = combine(result, operand(universe))
+            return result
+        return 'mask', evaluate
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_mask(node.operand, columns)
+
+        def evaluate(universe):
+            true, known = operand(universe)
+            return known & ~true, known
+        return 'mask', evaluate
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile_number(node.operand, columns)
+        if isinstance(node.op, ast.UAdd):
+            return 'number', operand
+        return 'number', lambda universe: np.negative(operand(universe))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+        apply = _ARITHMETIC[type(node.op)]
+        left, right = _compile_number(node.left, columns), _compile_number(node.right, columns)
+        return 'number', lambda universe: apply(left(universe), right(universe))
+
+    if isinstance(node, ast.Compare):
+        # Chains such as `20 < rsi14 < 40` are pairwise comparisons joined by and
+        nodes = [node.left] + node.comparators
+        operands = [_compile(operand, columns) for operand in nodes]
+        comparisons = []
+        for i, op in enumerate(node.ops):
+            (left_kind, left), (right_kind, right) = operands[i], operands[i + 1]
+            if type(op) not in _COMPARISONS:
+                raise ValueError(f"Unsupported comparison: {ast.unparse(node)}")
+            kinds = {left_kind, right_kind}
+            if 'mask' in kinds or len(kinds) > 1:
+                raise ValueError(f"Cannot compare {left_kind} with {right_kind}: {ast.unparse(node)}")
+            if kinds == {'text'}:
+                if type(op) not in (ast.Eq, ast.NotEq):
+                    raise ValueError(f"Text can only be compared with == or !=: {ast.unparse(node)}")
+                left, right = _lowercase(nodes[i]), _lowercase(nodes[i + 1])
+                present = lambda value: value != ''
+            else:
+                present = np.isfinite
+            comparisons.append((_COMPARISONS[type(op)], left, right, present))
+
+        def evaluate(universe):
+            result = None
+            for compare, left, right, present in comparisons:
+                left_values, right_values = left(universe), right(universe)
+                known = present(left_values) & present(right_values)
+                pair = (compare(left_values, right_values) & known, known)
+                result = pair if result is None else _and(result, pair)
+            return result
+        return 'mask', evaluate
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in NUMERIC_COLUMNS:
+            kind = 'number'
+        elif name in TEXT_COLUMNS:
+            kind = 'text'
+        else:
+            raise ValueError(f"Unknown screener column: {name}")
+        columns.add(name)
+        return kind, lambda universe: universe.columns[name]
+
+    if isinstance(node, ast.Constant) and not isinstance(node.value, bool):
+        value = node.value
+        if isinstance(value, (int, float)):
+            if not abs(value) <= EXPRESSION_MAX_CONSTANT:  # also rejects NaN and inf
+                raise ValueError(f"Number out of range: {ast.unparse(node)[:40]}")
+            value = np.float64(value)
+            return 'number', lambda universe: value
+        if isinstance(value, str):
+            return 'text', lambda universe: value
+
+    raise ValueError(f"Unsupported expression: {ast.unparse(node)[:100]}")
+
+
+def _compile_mask(node, columns):
+    kind, evaluate = _compile(node, columns)
+    if kind != 'mask':
+        raise ValueError(f"Expected a comparison: {ast.unparse(node)[:100]}")
+    return evaluate
+
+
+def _compile_number(node, columns):
+    kind, evaluate = _compile(node, columns)
+    if kind != 'number':
+        raise ValueError(f"Expected a number: {ast.unparse(node)[:100]}")
+    return evaluate
+
+
+def _lowercase(node):
+    """Text comparisons ignore case, like the sector parameter"""
+    if isinstance(node, ast.Name):
+        return lambda universe: universe.lowered(node.id)
+    value = node.value.lower()
+    return lambda universe: value
+
+
+def compile_expression(text):
+    """
+    Compile a screen expression such as
+    `rsi14 < 30 and close > sma200 and volume > 2 * avg_vol_30` into a
+    ScreenExpression. Supports and/or/not, comparisons (chained too),
+    + - * /, numbers, quoted text and the screener columns; raises
+    ValueError for anything else. Results are cached by text, and every
+    spelling of the same expression (spacing, redundant parentheses) shares
+    one compiled ScreenExpression.
+    """
+    return _canonical_expression(' '.join(text.split()))
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _canonical_expression(text):
+    """Parse user text once and look the expression up by its canonical form"""
+    if not text:
+        raise ValueError("Empty screen expression")
+    if len(text) > EXPRESSION_MAX_LENGTH:
+        raise ValueError(f"Screen expression longer than {EXPRESSION_MAX_LENGTH} characters")
+    try:
+        canonical = ast.unparse(ast.parse(text, mode='eval'))
+    except (SyntaxError, RecursionError):
+        raise ValueError(f"Invalid screen expression: {text[:100]}")
+    return _compile_canonical(canonical)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _compile_canonical(text):
+    columns = set()
+    try:
+        evaluate = _compile_mask(ast.parse(text, mode='eval').body, columns)
+    except RecursionError:
+        raise ValueError(f"Screen expression too deeply nested: {text[:100]}")
+    return ScreenExpression(text, evaluate, frozenset(columns))
+
+
+def clear_expression_cache():
+    """Forget every compiled expression"""
+    _canonical_expression.cache_clear()
+    _compile_canonical.cache_clear()
+
+
+def expression_from_params(params):
+    """The compiled `expr` query parameter, or None; raises ValueError if it does not compile"""
+    text = params.get('expr')
+    return compile_expression(text) if text else None
+
+
+def sort_from_params(params, universe):
+    """The requested sort column (optionally '-' prefixed), or ticker if the column is unknown"""
+    sort = params.get('sort') or 'ticker'
+    return sort if sort.lstrip('-') in universe.columns else 'ticker'
+
+
+class ScreenerUniverse:
+    """Active stocks as parallel NumPy columns, in ticker order"""
+
+    def __init__(self, ids, columns, version=None):
+        self.ids = ids
+        self.columns = columns
+        self._lowered = {}
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, version=None):
+        """Build the universe with one query per source table"""
+        from stocks.models import DailyMetrics, IndicatorSnapshot, Stock
+
+        rows = list(Stock.objects.filter(is_active=True).order_by('ticker').values_list(
+            'id', *TEXT_COLUMNS, *STOCK_COLUMNS.values()
+        ))
+        values = list(zip(*rows)) if rows else [()] * (1 + len(TEXT_COLUMNS) + len(STOCK_COLUMNS))
+        ids = np.array(values[0], dtype=np.int64)
+        columns = {name: np.array(column, dtype=object) for name, column in zip(TEXT_COLUMNS, values[1:])}
+        for name, column in zip(STOCK_COLUMNS, values[1 + len(TEXT_COLUMNS):]):
+            columns[name] = np.array(column, dtype=float)  # NULL becomes NaN
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['change_percent'] = np.where(
+                columns['previous_close'] > 0,
+                (columns['price'] - columns['previous_close']) / columns['previous_close'] * 100,
+                np.nan,
+            )
+
+        order = np.argsort(ids)
+
+        def scatter(stock_ids, fields, dtype=float, fill=np.nan):
+            """Place per-stock values at each stock's universe position"""
+            stock_ids = np.asarray(stock_ids, dtype=np.int64)
+            found = np.searchsorted(ids[order], stock_ids)
+            found = np.minimum(found, max(len(ids) - 1, 0))
+            known = (ids[order][found] == stock_ids) if len(ids) else np.zeros(len(stock_ids), dtype=bool)
+            positions = order[found[known]]
+            scattered = {}
+            for name, values in fields.items():
+                column = np.full(len(ids), fill, dtype=dtype)
+                column[positions] = np.asarray(values, dtype=dtype)[known]
+                scattered[name] = column
+            return scattered
+
+        snapshots = list(IndicatorSnapshot.objects.filter(stock__is_active=True).values_list(
+            'stock_id', 'date', *INDICATOR_COLUMNS.values()
+        ))
+        snapshot_values = list(zip(*snapshots)) if snapshots else [()] * (2 + len(INDICATOR_COLUMNS))
+        columns.update(scatter(snapshot_values[0], dict(zip(INDICATOR_COLUMNS, snapshot_values[2:]))))
+        columns.update(scatter(
+            snapshot_values[0], {'indicator_date': snapshot_values[1]},
+            dtype='datetime64[D]', fill=np.datetime64('NaT'),
+        ))
+
+        metrics = DailyMetrics.objects.as_of().filter(stock__is_active=True).to_arrays(
+            'stock_id', *METRIC_COLUMNS.values()
+        )
+        columns.update(scatter(
+            metrics['stock_id'], {name: metrics[field] for name, field in METRIC_COLUMNS.items()}
+        ))
+
+        return cls(ids, columns, version=version)
+
+    def column(self, name):
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise ValueError(f"Unknown screener column: {name}")
+
+    def lowered(self, name):
+        """A text column in lower case, built on first use"""
+        if name not in self._lowered:
+            self._lowered[name] = np.array([str(item).lower() for item in self.column(name)], dtype=object)
+        return self._lowered[name]
+
+    def mask(self, filters):
+        """
+        Boolean mask of stocks passing every (column, operator, value) filter.
+        Missing values never pass, like NULL in SQL; indicator filters also
+        require a snapshot from the last INDICATOR_MAX_AGE_DAYS days.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        uses_indicators = False
+        for name, operator, value in filters:
+            column = self.column(name)
+            uses_indicators |= name in INDICATOR_COLUMNS
+            if operator == 'iexact':
+                mask &= self.lowered(name) == str(value).lower()
+            elif column.dtype == object:
+                mask &= column == value
+            else:
+                with np.errstate(invalid='ignore'):
+                    mask &= NUMERIC_OPERATORS[operator](column, value)
+        if uses_indicators:
+            mask &= self.fresh_indicators()
+        return mask
+
+    def fresh_indicators(self):
+        """Mask of stocks with an indicator snapshot from the last INDICATOR_MAX_AGE_DAYS days"""
+        cutoff = np.datetime64(datetime.now().date() - timedelta(days=INDICATOR_MAX_AGE_DAYS), 'D')
+        return self.columns['indicator_date'] >= cutoff
+
+    def order(self, positions, sort='ticker'):
+        """
+        `positions` sorted by a column; prefix with '-' for descending.
+        Missing values sort last either way and ties keep ticker order.
+        """
+        descending = sort.startswith('-')
+        column = self.column(sort.lstrip('-'))[positions]
+        if column.dtype == object:
+            # Rank the distinct keys so descending order can negate them and
+            # still keep ties in ticker order; blanks rank after everything
+            keys = self.lowered(sort.lstrip('-'))[positions]
+            missing = np.array([item is None or item == '' for item in column.tolist()], dtype=bool)
+            _, rank = np.unique(keys, return_inverse=True)
+            rank = (-rank if descending else rank).astype(float)
+            rank[missing] = np.inf
+            ranked = np.argsort(rank, kind='stable')
+        elif np.issubdtype(column.dtype, np.datetime64):
+            ranked = np.argsort(-column.astype(np.int64) if descending else column, kind='stable')
+        else:
+            ranked = np.argsort(-column if descending else column, kind='stable')
+        return positions[ranked]
+
+    def screen(self, filters=(), sort='ticker', expression=None):
+        """Universe positions passing `filters` and a compiled `expression`, sorted by `sort`"""
+        mask = self.mask(filters)
+        if expression is not None:
+            mask &= expression(self)
+        return self.order(np.flatnonzero(mask), sort)
+
+    def sectors(self):
+        """Distinct non-empty sectors, sorted"""
+        return sorted({sector for sector in self.columns['sector'].tolist() if sector})
+
+
+class Screener:
+    """Process-wide ScreenerUniverse, rebuilt when the source tables change"""
+
+    def __init__(self, revalidate_after=60):
+        self.revalidate_after = revalidate_after
+        self._universe = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version():
+        """Latest writes to the source tables; any change means a rebuild"""
+        from django.db.models import Count, Max, Q
+        from stocks.models import DailyMetrics, IndicatorSnapshot, Stock
+
+        stocks = Stock.objects.aggregate(updated=Max('last_updated'), active=Count('id', filter=Q(is_active=True)))
+        return (
+            stocks['updated'],
+            stocks['active'],
+            IndicatorSnapshot.objects.aggregate(updated=Max('updated_at'))['updated'],
+            DailyMetrics.objects.aggregate(date=Max('date'))['date'],
+        )
+
+    def get(self):
+        """The current universe, rebuilt first if the source tables changed since it was built"""
+        with self._lock:
+            universe = self._universe
+            if universe is not None and time.monotonic() - universe.checked_at <= self.revalidate_after:
+                return universe
+
+            version = self._version()
+            if universe is not None and universe.version == version:
+                universe.checked_at = time.monotonic()
+                return universe
+
+            self._universe = ScreenerUniverse.load(version=version)
+            return self._universe
+
+    def invalidate(self):
+        """Rebuild on the next get()"""
+        with self._lock:
+            self._universe = None
+
+
+_screener = None
+_screener_lock = threading.Lock()
+
+
+def get_screener():
+    """The process-wide Screener, revalidated every settings.SCREENER_REVALIDATE_SECONDS"""
+    global _screener
+    if _screener is None:
+        from django.conf import settings
+
+        with _screener_lock:
+            if _screener is None:
+                _screener = Screener(revalidate_after=getattr(settings, 'SCREENER_REVALIDATE_SECONDS', 60))
+    return _screener
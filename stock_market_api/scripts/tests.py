@@ -0,0 +1,1424 @@
+from django.test import TestCase, TransactionTestCase
+from stocks.models import Stock, StockPrice, TechnicalIndicator, IndicatorState, IndicatorSnapshot
+import os
+import tempfile
+import pandas as pd
+import numpy as np
+from scripts.benchmarks import make_synthetic_history
+from scripts.calculate_indicators import TechnicalIndicatorCalculator
+from scripts.data_sources import (
+    CachedDataSource, FixtureDataSource, LocalFileDataSource, slice_period, split_batch_frame
+)
+from scripts.response_cache import ResponseCache
+from scripts.fetch_stock_data import StockDataFetcher, latest_trading_date
+
+
+def make_fixture_source(tickers, years=1, end='2024-12-31'):
+    """Offline data source serving the same synthetic history for every ticker"""
+    hist = make_synthetic_history(years=years, end=end)
+    return FixtureDataSource(
+        info={ticker: {'longName': f'{ticker} Corp'} for ticker in tickers},
+        history={ticker: hist for ticker in tickers},
+    )
+
+
+class BulkPriceIngestionTests(TestCase):
+    """Tests for the bulk upsert path of StockDataFetcher"""
+
+    def setUp(self):
+        self.fetcher = StockDataFetcher()
+        self.stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        self.hist = make_synthetic_history(years=1, end='2024-12-31')
+
+    def test_bulk_save_reports_inserted_and_updated(self):
+        counts = self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[:100])
+        self.assertEqual(counts, {'inserted': 100, 'updated': 0})
+
+        counts = self.fetcher.bulk_save_historical_data(self.stock, self.hist)
+        self.assertEqual(counts, {'inserted': len(self.hist) - 100, 'updated': 100})
+        self.assertEqual(StockPrice.objects.filter(stock=self.stock).count(), len(self.hist))
+
+    def test_bulk_save_overwrites_existing_values(self):
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist)
+        revised = self.hist.copy()
+        revised['Close'] = 42.0
+        self.fetcher.bulk_save_historical_data(self.stock, revised)
+
+        closes = set(StockPrice.objects.filter(stock=self.stock).values_list('close', flat=True))
+        self.assertEqual({float(close) for close in closes}, {42.0})
+
+    def test_partial_bars_are_not_stored(self):
+        hist = self.hist.iloc[:10].copy()
+        hist.iloc[3, hist.columns.get_loc('Open')] = np.nan
+        hist.iloc[5, hist.columns.get_loc('Low')] = np.nan
+        hist.iloc[7, hist.columns.get_loc('Close')] = np.nan
+
+        counts = self.fetcher.bulk_save_historical_data(self.stock, hist)
+
+        self.assertEqual(counts, {'inserted': 7, 'updated': 0})
+        stored = set(StockPrice.objects.filter(stock=self.stock).values_list('date', flat=True))
+        self.assertEqual(stored, set(hist.index[[0, 1, 2, 4, 6, 8, 9]].date))
+
+
+class ConcurrentFetchTests(TestCase):
+    """Tests for the thread-pool fetch engine"""
+
+    def test_workers_fetch_and_single_writer_saves_every_ticker(self):
+        tickers = ['AAA', 'BBB', 'CCC', 'DDD']
+        fetcher = StockDataFetcher(data_source=make_fixture_source(tickers))
+        hist = fetcher.data_source.history['AAA']
+
+        results = fetcher.fetch_multiple_stocks(tickers, bulk=True, workers=3)
+
+        self.assertEqual(sorted(results['success']), tickers)
+        self.assertEqual(sorted(fetcher.timings), tickers)
+        self.assertEqual(StockPrice.objects.count(), len(hist) * len(tickers))
+
+
+class BatchedFetchTests(TestCase):
+    """Tests for multi-symbol batched downloads"""
+
+    def test_split_batch_frame(self):
+        hist = make_synthetic_history(years=1, end='2024-12-31')
+        wide = pd.concat({'AAA': hist, 'BBB': hist.iloc[:10]}, axis=1)
+
+        histories = split_batch_frame(wide, ['AAA', 'BBB', 'CCC'])
+
+        self.assertEqual(sorted(histories), ['AAA', 'BBB'])
+        self.assertEqual(len(histories['AAA']), len(hist))
+        self.assertEqual(len(histories['BBB']), 10)
+
+    def test_update_all_stocks_in_batches(self):
+        tickers = ['AAA', 'BBB', 'CCC']
+        for ticker in tickers:
+            Stock.objects.create(ticker=ticker, company_name=ticker)
+        fetcher = StockDataFetcher(data_source=make_fixture_source(tickers))
+
+        success, failed = fetcher.update_all_stocks(period='5d', bulk=True, batch_size=2)
+
+        self.assertEqual((success, failed), (3, 0))
+        self.assertEqual(Stock.objects.get(ticker='AAA').company_name, 'AAA Corp')
+
+
+class IncrementalSyncTests(TestCase):
+    """Tests for syncing from the last stored date"""
+
+    def setUp(self):
+        self.tickers = ['AAA', 'BBB']
+        self.source = make_fixture_source(self.tickers, end=latest_trading_date())
+        self.fetcher = StockDataFetcher(data_source=self.source)
+        for ticker in self.tickers:
+            stock = Stock.objects.create(ticker=ticker, company_name=ticker)
+            self.fetcher.bulk_save_historical_data(stock, self.source.history[ticker].iloc[:-5])
+
+    def test_incremental_sync_closes_the_gap(self):
+        success, failed = self.fetcher.update_all_stocks(bulk=True, incremental=True)
+
+        self.assertEqual((success, failed), (2, 0))
+        self.assertEqual(StockPrice.objects.count(), 2 * len(self.source.history['AAA']))
+        self.assertEqual(self.fetcher.get_last_price_dates()['AAA'], latest_trading_date())
+
+    def test_batched_sync_requests_from_last_stored_date(self):
+        starts = []
+        get_history_batch = self.source.get_history_batch
+
+        def spy(tickers, period='5d', interval='1d', start=None):
+            starts.append(start)
+            return get_history_batch(tickers, period=period, interval=interval, start=start)
+        self.source.get_history_batch = spy
+
+        success, failed = self.fetcher.update_all_stocks(bulk=True, incremental=True, batch_size=10)
+
+        self.assertEqual((success, failed), (2, 0))
+        last_stored = self.source.history['AAA'].index[-6].date()
+        self.assertEqual(starts, [last_stored + pd.Timedelta(days=1)])
+        self.assertEqual(StockPrice.objects.count(), 2 * len(self.source.history['AAA']))
+
+    def test_current_tickers_are_skipped(self):
+        self.fetcher.update_all_stocks(bulk=True, incremental=True)
+        self.source.get_info = lambda ticker: self.fail('current ticker was fetched')
+
+        results = self.fetcher.sync_incremental(self.tickers, bulk=True)
+
+        self.assertEqual(sorted(results['current']), self.tickers)
+
+
+class LocalFileDataSourceTests(TestCase):
+    """Tests for replaying a frozen dataset from disk"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.hist = make_synthetic_history(years=2, end='2024-12-31')
+
+    def test_round_trip_and_period_slicing(self):
+        source = LocalFileDataSource(self.tmpdir.name)
+        source.save_history('AAA', self.hist)
+        source.save_info('AAA', {'longName': 'AAA Corp'})
+
+        replay = LocalFileDataSource(self.tmpdir.name, memory_map=True)
+        self.assertEqual(replay.get_info('AAA')['longName'], 'AAA Corp')
+        self.assertEqual(len(replay.get_history('AAA', period='5d')), 5)
+        self.assertEqual(len(replay.get_history('AAA', period='max')), len(self.hist))
+        self.assertTrue((replay.get_history('AAA', period='ytd').index.year == 2024).all())
+        self.assertTrue(replay.get_history('MISSING').empty)
+
+    def test_fetcher_ingests_from_local_files(self):
+        source = LocalFileDataSource(self.tmpdir.name)
+        source.save_history('AAA', self.hist)
+        source.save_info('AAA', {'longName': 'AAA Corp'})
+
+        results = StockDataFetcher(data_source=source).fetch_multiple_stocks(['AAA'], period='1y', bulk=True)
+
+        self.assertEqual(results['success'], ['AAA'])
+        self.assertEqual(StockPrice.objects.count(), len(slice_period(self.hist, '1y')))
+
+
+class ResponseCacheTests(TestCase):
+    """Tests for the on-disk response cache"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_ttl_and_counters(self):
+        cache = ResponseCache(f'{self.tmpdir.name}/cache.sqlite3')
+        cache.set('key', {'a': 1})
+
+        self.assertEqual(cache.get('key', ttl=60), {'a': 1})
+        self.assertIsNone(cache.get('key', ttl=-1))
+        self.assertIsNone(cache.get('other', ttl=60))
+        self.assertEqual((cache.stats['hits'], cache.stats['misses']), (1, 2))
+
+    def test_lru_eviction_by_size(self):
+        cache = ResponseCache(f'{self.tmpdir.name}/cache.sqlite3', max_bytes=2500)
+        for key in ['a', 'b', 'c']:
+            cache.set(key, 'x' * 1000)
+        self.assertIsNone(cache.get('a', ttl=60))
+        self.assertIsNotNone(cache.get('c', ttl=60))
+        self.assertEqual(cache.stats['evictions'], 1)
+
+    def test_info_lookup_is_counted_once_and_refreshes_only_stale_classes(self):
+        upstream = make_fixture_source(['AAA'])
+        cache = ResponseCache(f'{self.tmpdir.name}/cache.sqlite3')
+        source = CachedDataSource(upstream, cache)
+
+        source.get_info('AAA')
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(source.get_info('AAA'), upstream.info['AAA'])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # A stale quote refetches info but leaves the fresh static entry untouched
+        cache.set('info:quote:AAA', {})
+        cache._conn.execute("UPDATE responses SET stored_at = 0 WHERE key = 'info:quote:AAA'")
+        static_stored_at = cache._conn.execute(
+            "SELECT stored_at FROM responses WHERE key = 'info:static:AAA'").fetchone()[0]
+        calls = []
+        get_info = upstream.get_info
+        upstream.get_info = lambda ticker: calls.append(ticker) or get_info(ticker)
+
+        source.get_info('AAA')
+        self.assertEqual(calls, ['AAA'])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(cache._conn.execute(
+            "SELECT stored_at FROM responses WHERE key = 'info:static:AAA'").fetchone()[0], static_stored_at)
+
+    def test_update_skips_info_call_while_metadata_is_fresh(self):
+        upstream = make_fixture_source(['AAA'])
+        source = CachedDataSource(upstream, ResponseCache(f'{self.tmpdir.name}/cache.sqlite3'))
+        fetcher = StockDataFetcher(data_source=source)
+        fetcher.fetch_multiple_stocks(['AAA'], period='5d', bulk=True)
+
+        upstream.get_info = lambda ticker: self.fail('info was requested despite fresh metadata')
+        results = fetcher.fetch_multiple_stocks(['AAA'], period='5d', bulk=True)
+
+        stock = Stock.objects.get(ticker='AAA')
+        self.assertEqual(results['success'], ['AAA'])
+        self.assertEqual(stock.company_name, 'AAA Corp')
+        self.assertAlmostEqual(float(stock.current_price), upstream.history['AAA']['Close'].iloc[-1], places=2)
+
+    def test_single_bar_update_takes_previous_close_from_stored_prices(self):
+        upstream = make_fixture_source(['AAA'])
+        hist = upstream.history['AAA']
+        source = CachedDataSource(upstream, ResponseCache(f'{self.tmpdir.name}/cache.sqlite3'))
+        fetcher = StockDataFetcher(data_source=source)
+        fetcher.fetch_concurrently(['AAA'], period='5d', bulk=True, histories={'AAA': hist.iloc[-6:-1]})
+
+        # Fresh cached metadata and a one-bar delta, as in the daily incremental sync
+        results = fetcher.fetch_concurrently(['AAA'], period='5d', bulk=True, histories={'AAA': hist.iloc[-1:]},
+                                             start=hist.index[-1].date())
+
+        stock = Stock.objects.get(ticker='AAA')
+        self.assertEqual(results['success'], ['AAA'])
+        self.assertAlmostEqual(float(stock.current_price), hist['Close'].iloc[-1], places=2)
+        self.assertAlmostEqual(float(stock.previous_close), hist['Close'].iloc[-2], places=2)
+
+
+class IndicatorBulkSaveTests(TestCase):
+    """Tests for the bulk indicator writer"""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        StockDataFetcher(data_source=FixtureDataSource()).bulk_save_historical_data(
+            self.stock, make_synthetic_history(years=1)
+        )
+        self.calculator = TechnicalIndicatorCalculator()
+
+    def indicator_rows(self):
+        return set(TechnicalIndicator.objects.filter(stock=self.stock).values_list(
+            'indicator_type', 'period', 'date', 'value', 'value2', 'value3'
+        ))
+
+    def test_bulk_and_row_by_row_save_the_same_rows(self):
+        self.calculator.calculate_all_indicators('TEST', days=120, bulk=False)
+        per_row = self.indicator_rows()
+        TechnicalIndicator.objects.all().delete()
+
+        self.calculator.calculate_all_indicators('TEST', days=120, bulk=True)
+
+        self.assertTrue(per_row)
+        self.assertEqual(self.indicator_rows(), per_row)
+
+    def test_bulk_save_is_idempotent(self):
+        self.calculator.calculate_all_indicators('TEST', days=120)
+        first = self.indicator_rows()
+        self.calculator.calculate_all_indicators('TEST', days=120)
+        self.assertEqual(self.indicator_rows(), first)
+
+
+class IndicatorPanelTests(TestCase):
+    """Tests for the cross-ticker NumPy indicator engine"""
+
+    def setUp(self):
+        fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        end = pd.Timestamp.now().normalize()
+        self.stocks = []
+        for seed, ticker in enumerate(['AAA', 'BBB', 'GAP']):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp')
+            hist = make_synthetic_history(years=1, seed=seed, end=end)
+            if ticker == 'BBB':
+                hist = hist.iloc[60:]  # listed later than the others
+            if ticker == 'GAP':
+                hist = hist.drop(hist.index[100:105])  # hole in the middle
+            fetcher.bulk_save_historical_data(stock, hist)
+            self.stocks.append(stock)
+        self.calculator = TechnicalIndicatorCalculator()
+
+    def indicator_values(self):
+        return {
+            (ticker, indicator_type, period, date): (value, value2, value3)
+            for ticker, indicator_type, period, date, value, value2, value3
+            in TechnicalIndicator.objects.values_list(
+                'stock__ticker', 'indicator_type', 'period', 'date', 'value', 'value2', 'value3'
+            )
+        }
+
+    def test_panel_matches_per_ticker_path(self):
+        for stock in self.stocks:
+            self.calculator.calculate_all_indicators(stock.ticker, days=365)
+        per_ticker = self.indicator_values()
+        TechnicalIndicator.objects.all().delete()
+
+        success, failed = self.calculator.calculate_panel(self.stocks, days=365)
+        panel = self.indicator_values()
+
+        self.assertEqual((success, failed), (3, 0))
+        self.assertEqual(set(panel), set(per_ticker))
+        self.assertIn(('AAA', 'ADX', 14), {key[:3] for key in panel})
+        for key, values in per_ticker.items():
+            for expected, actual in zip(values, panel[key]):
+                if expected is None:
+                    self.assertIsNone(actual)
+                else:
+                    self.assertAlmostEqual(float(actual), float(expected), delta=0.001, msg=key)
+
+    def test_gappy_tickers_fall_back_to_per_ticker_path(self):
+        from scripts.indicator_panel import IndicatorPanel
+
+        panel = IndicatorPanel.load(self.stocks, days=365)
+        self.assertEqual(list(panel.contiguous_columns()), [True, True, False])
+
+    def test_selected_specs_compute_only_their_dependencies(self):
+        from unittest import mock
+        from scripts.indicator_panel import IndicatorPanel
+
+        panel = IndicatorPanel.load(self.stocks, days=365)
+        full = {(indicator_type, period): arrays for indicator_type, period, arrays in panel.compute()}
+
+        # ADX and ATR share the true range; neither needs EMAs or rolling std
+        with mock.patch('scripts.indicator_panel.ewm_mean', side_effect=AssertionError('EMA computed')), \
+                mock.patch('scripts.indicator_panel.rolling_std', side_effect=AssertionError('std computed')):
+            selected = panel.compute([('ADX', 14), ('ATR', 14)])
+
+        self.assertEqual([(indicator_type, period) for indicator_type, period, _ in selected],
+                         [('ADX', 14), ('ATR', 14)])
+        for indicator_type, period, arrays in selected:
+            for expected, actual in zip(full[(indicator_type, period)], arrays):
+                np.testing.assert_array_equal(actual, expected)
+
+
+class IncrementalIndicatorTests(TestCase):
+    """Tests for indicator updates from persisted IndicatorState"""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        self.hist = make_synthetic_history(years=1, end=pd.Timestamp.now().normalize())
+        self.fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.calculator = TechnicalIndicatorCalculator()
+
+    def indicator_values(self):
+        return {
+            (indicator_type, period, date): (value, value2, value3)
+            for indicator_type, period, date, value, value2, value3
+            in TechnicalIndicator.objects.filter(stock=self.stock).values_list(
+                'indicator_type', 'period', 'date', 'value', 'value2', 'value3'
+            )
+        }
+
+    def test_incremental_update_matches_full_recompute(self):
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[:-5])
+        self.assertTrue(self.calculator.calculate_incremental('TEST', days=365))
+        self.assertEqual(IndicatorState.objects.filter(stock=self.stock).count(), 11)
+
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist)
+        self.assertTrue(self.calculator.calculate_incremental('TEST', days=365))
+        incremental = self.indicator_values()
+
+        TechnicalIndicator.objects.all().delete()
+        self.calculator.calculate_all_indicators('TEST', days=365)
+        full = self.indicator_values()
+
+        self.assertEqual(set(incremental), set(full))
+        for key, values in full.items():
+            for expected, actual in zip(values, incremental[key]):
+                if expected is None:
+                    self.assertIsNone(actual)
+                else:
+                    self.assertAlmostEqual(float(actual), float(expected), delta=0.001, msg=key)
+
+        last_date = self.hist.index[-1].date()
+        self.assertEqual(set(IndicatorState.objects.values_list('last_date', flat=True)), {last_date})
+
+
+class ParallelIndicatorTests(TestCase):
+    """Tests for the process-pool indicator worker"""
+
+    def test_shard_rows_match_per_ticker_calculation(self):
+        from scripts.calculate_indicators import _calculate_shard
+
+        stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        StockDataFetcher(data_source=FixtureDataSource()).bulk_save_historical_data(
+            stock, make_synthetic_history(years=1)
+        )
+        calculator = TechnicalIndicatorCalculator()
+        calculator.calculate_all_indicators('TEST', days=120)
+        expected = set(TechnicalIndicator.objects.values_list(
+            'indicator_type', 'date', 'period', 'value', 'value2', 'value3'
+        ))
+        TechnicalIndicator.objects.all().delete()
+
+        shard = _calculate_shard(['TEST', 'MISSING'], days=120)
+        self.assertEqual(shard['success'], ['TEST'])
+        self.assertEqual(shard['failed'], ['MISSING'])
+
+        calculator.upsert_indicator_rows([
+            TechnicalIndicator(stock_id=stock_id, indicator_type=indicator_type, date=date,
+                               period=period, value=value, value2=value2, value3=value3)
+            for stock_id, indicator_type, date, period, value, value2, value3 in shard['rows']
+        ])
+        self.assertEqual(set(TechnicalIndicator.objects.values_list(
+            'indicator_type', 'date', 'period', 'value', 'value2', 'value3'
+        )), expected)
+
+
+class ProcessPoolIndicatorTests(TransactionTestCase):
+    """Runs calculate_parallel through a real process pool; rows are committed so workers can read them"""
+
+    def test_process_pool_matches_per_ticker_calculation(self):
+        fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        for seed, ticker in enumerate(['AAA', 'BBB', 'CCC']):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Inc.')
+            fetcher.bulk_save_historical_data(stock, make_synthetic_history(years=1, seed=seed))
+
+        calculator = TechnicalIndicatorCalculator()
+        for ticker in ['AAA', 'BBB', 'CCC']:
+            calculator.calculate_all_indicators(ticker, days=120)
+        expected = set(TechnicalIndicator.objects.values_list(
+            'stock_id', 'indicator_type', 'date', 'period', 'value', 'value2', 'value3'
+        ))
+        TechnicalIndicator.objects.all().delete()
+
+        success, failed = calculator.calculate_parallel(Stock.objects.order_by('ticker'), days=120,
+                                                        processes=2, chunk_size=1)
+
+        self.assertEqual((success, failed), (3, 0))
+        self.assertEqual(set(TechnicalIndicator.objects.values_list(
+            'stock_id', 'indicator_type', 'date', 'period', 'value', 'value2', 'value3'
+        )), expected)
+        self.assertEqual(sum(stats['tickers'] for stats in calculator.worker_stats.values()), 3)
+
+    def test_processes_cannot_combine_with_single_process_modes(self):
+        from django.core.management import CommandError, call_command
+
+        for mode in ('panel', 'incremental'):
+            with self.assertRaises(CommandError):
+                call_command('calculate_indicators', '--all', '--processes=2', f'--{mode}')
+
+
+class IndicatorGraphTests(TestCase):
+    """Tests for --types selection and shared indicator intermediates"""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        StockDataFetcher(data_source=FixtureDataSource()).bulk_save_historical_data(
+            self.stock, make_synthetic_history(years=1)
+        )
+        self.calculator = TechnicalIndicatorCalculator()
+
+    def test_types_limit_the_saved_indicators(self):
+        self.calculator.calculate_all_indicators('TEST', days=120, types=['RSI', 'MACD'])
+        saved = set(TechnicalIndicator.objects.values_list('indicator_type', flat=True))
+        self.assertEqual(saved, {'RSI', 'MACD'})
+
+    def test_only_requested_dependencies_are_computed(self):
+        from scripts.indicator_graph import IndicatorGraph
+
+        _, df = self.calculator.get_price_data('TEST', days=120)
+        graph = IndicatorGraph(df)
+        results = graph.compute(['ADX', 'ATR'])
+
+        self.assertEqual([(t, p) for t, p, _ in results], [('ADX', 14), ('ATR', 14)])
+        self.assertIn(('true_range',), graph._memo)
+        self.assertNotIn(('mean', 20), graph._memo)
+        self.assertIs(results[1][2][0], graph.atr(14))
+
+    def test_unknown_types_are_rejected(self):
+        from scripts.indicator_graph import parse_indicator_types
+
+        self.assertEqual(parse_indicator_types('rsi, macd'), ['RSI', 'MACD'])
+        self.assertIsNone(parse_indicator_types(''))
+        with self.assertRaises(ValueError):
+            parse_indicator_types('RSI,VWAP')
+
+
+class IndicatorSnapshotTests(TestCase):
+    """Tests for the one-row-per-stock latest indicator snapshot"""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        StockDataFetcher(data_source=FixtureDataSource()).bulk_save_historical_data(
+            self.stock, make_synthetic_history(years=1)
+        )
+        self.calculator = TechnicalIndicatorCalculator()
+
+    def latest_row(self, indicator_type, period):
+        return TechnicalIndicator.objects.filter(
+            stock=self.stock, indicator_type=indicator_type, period=period
+        ).order_by('-date').first()
+
+    def test_pipeline_keeps_snapshot_in_step_with_latest_rows(self):
+        self.calculator.calculate_all_indicators('TEST', days=365)
+        snapshot = IndicatorSnapshot.objects.get(stock=self.stock)
+
+        self.assertEqual(snapshot.date, self.latest_row('RSI', 14).date)
+        self.assertEqual(snapshot.rsi_14, self.latest_row('RSI', 14).value)
+        self.assertEqual(snapshot.sma_200, self.latest_row('SMA', 200).value)
+        macd = self.latest_row('MACD', 26)
+        self.assertEqual((snapshot.macd, snapshot.macd_signal, snapshot.macd_histogram),
+                         (macd.value, macd.value2, macd.value3))
+
+        latest = snapshot.latest_indicators()
+        self.assertEqual(set(latest), {'SMA', 'EMA', 'RSI', 'MACD', 'BB', 'STOCH', 'ADX', 'ATR'})
+        self.assertEqual(latest['SMA'].period, 20)
+
+    def test_partial_types_only_update_their_columns(self):
+        self.calculator.calculate_all_indicators('TEST', days=365)
+        IndicatorSnapshot.objects.filter(stock=self.stock).update(rsi_14=None)
+
+        self.calculator.calculate_all_indicators('TEST', days=365, types=['ATR'])
+        snapshot = IndicatorSnapshot.objects.get(stock=self.stock)
+        self.assertIsNone(snapshot.rsi_14)
+        self.assertEqual(snapshot.atr_14, self.latest_row('ATR', 14).value)
+
+    def test_rsi_screen_reads_snapshot(self):
+        self.calculator.calculate_all_indicators('TEST', days=365, types=['RSI'])
+        rsi = float(IndicatorSnapshot.objects.get(stock=self.stock).rsi_14)
+
+        matching = Stock.objects.filter(indicator_snapshot__rsi_14__gte=rsi - 1, indicator_snapshot__rsi_14__lte=rsi + 1)
+        excluded = Stock.objects.filter(indicator_snapshot__rsi_14__gte=rsi + 1)
+        self.assertEqual(list(matching), [self.stock])
+        self.assertEqual(list(excluded), [])
+
+
+class ArrayQuerySetTests(TestCase):
+    """Tests for reading StockPrice/TechnicalIndicator columns as NumPy arrays"""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='TEST', company_name='Test Inc.')
+        self.hist = make_synthetic_history(years=1, end='2024-12-31')
+        StockDataFetcher().bulk_save_historical_data(self.stock, self.hist)
+
+    def test_price_columns_round_trip_as_float64(self):
+        arrays = StockPrice.objects.filter(stock=self.stock).order_by('date').to_arrays(
+            'stock_id', 'date', 'close', 'volume', 'stock__ticker'
+        )
+        self.assertEqual(arrays['close'].dtype, np.float64)
+        self.assertEqual(arrays['volume'].dtype, np.int64)
+        self.assertEqual(arrays['date'].dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(arrays['stock__ticker'].dtype, object)
+        self.assertTrue((arrays['stock_id'] == self.stock.id).all())
+
+        # Float columns store the fetched values without Decimal rounding
+        np.testing.assert_array_equal(arrays['close'], self.hist['Close'].to_numpy())
+        np.testing.assert_array_equal(arrays['date'], self.hist.index.values.astype('datetime64[D]'))
+
+    def test_nullable_values_become_nan_and_empty_querysets_are_empty(self):
+        TechnicalIndicator.objects.create(stock=self.stock, indicator_type='RSI', date='2024-12-31', value=55.5)
+        arrays = TechnicalIndicator.objects.filter(stock=self.stock).to_arrays('value', 'value2')
+        self.assertEqual(arrays['value'].tolist(), [55.5])
+        self.assertTrue(np.isnan(arrays['value2']).all())
+
+        empty = StockPrice.objects.none().to_arrays('date', 'close')
+        self.assertEqual(len(empty['close']), 0)
+        self.assertEqual(empty['close'].dtype, np.float64)
+
+
+class PriceStoreTests(TestCase):
+    """Tests for the memory-mapped columnar price store"""
+
+    def setUp(self):
+        from scripts.price_store import PriceStore
+
+        self.fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.hist = make_synthetic_history(years=2, end='2024-12-31')
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA Corp')
+        self.other = Stock.objects.create(ticker='BBB', company_name='BBB Corp')
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[:300])
+        self.fetcher.bulk_save_historical_data(self.other, make_synthetic_history(years=1, seed=1, end='2024-12-31'))
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = PriceStore(self.tmp.name)
+
+    def stored_closes(self, stock):
+        return [float(close) for close in StockPrice.objects.filter(
+            stock=stock
+        ).order_by('date').values_list('close', flat=True)]
+
+    def test_export_matches_database_without_copying(self):
+        counts = self.store.refresh()
+        self.assertEqual(counts['added'], 2)
+        self.assertEqual(self.store.tickers, ['AAA', 'BBB'])
+
+        series = self.store.get('aaa')
+        self.assertEqual(series.close.tolist(), self.stored_closes(self.stock))
+        self.assertEqual(series.dates[0], np.datetime64(self.hist.index[0].date(), 'D'))
+        self.assertTrue(np.shares_memory(series.close, self.store.column('close')))
+
+        window = self.store.get('AAA', '2024-01-01', '2024-01-31')
+        self.assertEqual(len(window), StockPrice.objects.filter(
+            stock=self.stock, date__gte='2024-01-01', date__lte='2024-01-31'
+        ).count())
+        self.assertIsNone(self.store.get('MISSING'))
+
+        dates, tickers, closes = self.store.close_panel(['AAA', 'BBB'])
+        self.assertEqual(tickers, ['AAA', 'BBB'])
+        self.assertEqual(closes.shape, (len(dates), 2))
+        self.assertEqual(int((~np.isnan(closes[:, 1])).sum()), StockPrice.objects.filter(stock=self.other).count())
+
+    def test_refresh_never_rewrites_published_bars(self):
+        from scripts.price_store import PriceStore
+
+        self.store.refresh()
+        offset = self.store.index['tickers']['AAA']['offset']
+        # Another process keeps reading the maps of the index it loaded
+        reader = PriceStore(self.tmp.name)
+        published = reader.get('AAA').close
+        expected = published.tolist()
+
+        # New bars go into the segment's spare capacity
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[300:310])
+        counts = self.store.refresh(tickers=['AAA'])
+        self.assertEqual(counts['extended'], 1)
+        self.assertEqual(self.store.index['tickers']['AAA']['offset'], offset)
+        self.assertEqual(self.store.get('AAA').close.tolist(), self.stored_closes(self.stock))
+
+        # A revised stored bar moves the segment to the end of the files instead
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[305:306].assign(Close=1.0))
+        counts = self.store.refresh(tickers=['AAA'])
+        self.assertEqual(counts['relocated'], 1)
+        self.assertGreater(self.store.index['tickers']['AAA']['offset'], offset)
+        self.assertGreater(self.store.index['wasted'], 0)
+        self.assertEqual(self.store.get('AAA').close.tolist(), self.stored_closes(self.stock))
+        self.assertEqual(published.tolist(), expected)
+
+        # So does outgrowing the capacity
+        self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[310:])
+        counts = self.store.refresh(tickers=['AAA'])
+        self.assertEqual(counts['relocated'], 1)
+        self.assertEqual(self.store.get('AAA').close.tolist(), self.stored_closes(self.stock))
+        self.assertEqual(self.store.get('BBB').close.tolist(), self.stored_closes(self.other))
+
+        # Rebuilds write a new generation and keep the previous one for open readers
+        self.store.refresh(rebuild=True)
+        self.assertEqual(self.store.index['wasted'], 0)
+        self.assertEqual(self.store.get('AAA').close.tolist(), self.stored_closes(self.stock))
+        self.assertEqual(published.tolist(), expected)
+        self.store.refresh(rebuild=True)
+        self.assertEqual(self.store.index['generation'], 2)
+        self.assertEqual(sorted(name for name in os.listdir(self.tmp.name) if name.startswith('close.')),
+                         ['close.1.bin', 'close.2.bin'])
+
+    def test_analytics_read_current_tickers_from_the_store(self):
+        from django.test import override_settings
+        from scripts.risk_engine import PriceMatrix
+
+        self.store.refresh()
+        expected = PriceMatrix.load(['AAA', 'BBB', 'MISSING'], '2024-01-01')
+        with override_settings(PRICE_STORE_DIR=self.tmp.name):
+            with self.assertNumQueries(1):
+                matrix = PriceMatrix.load(['AAA', 'BBB'], '2024-01-01')
+            np.testing.assert_array_equal(matrix.closes, expected.closes[:, :2])
+
+            # Tickers written since the last refresh are read from the database
+            self.fetcher.bulk_save_historical_data(self.stock, self.hist.iloc[300:310])
+            self.stock.save()
+            with self.assertNumQueries(2):
+                matrix = PriceMatrix.load(['AAA', 'BBB', 'MISSING'], '2024-01-01')
+        expected = PriceMatrix.load(['AAA', 'BBB', 'MISSING'], '2024-01-01')
+        np.testing.assert_array_equal(matrix.dates, expected.dates)
+        np.testing.assert_array_equal(matrix.closes, expected.closes)
+
+
+class RiskEngineTests(TestCase):
+    """Tests for the single-query vectorized risk engine"""
+
+    def setUp(self):
+        self.fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.end = pd.Timestamp('2024-12-31').date()
+        self.stocks = []
+        for seed, ticker in enumerate(['AAA', 'BBB', 'CCC']):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp')
+            hist = make_synthetic_history(years=1, seed=seed, end='2024-12-31')
+            if ticker == 'BBB':
+                hist = hist.drop(hist.index[[-3, -7, -8]])  # Gaps inside the window
+            self.fetcher.bulk_save_historical_data(stock, hist)
+            self.stocks.append(stock)
+
+    def expected(self, stock, days=30):
+        """The per-stock loop the engine replaces"""
+        closes = np.array(StockPrice.objects.filter(
+            stock=stock, date__gte=self.end - pd.Timedelta(days=days), date__lte=self.end
+        ).order_by('date').values_list('close', flat=True))
+        returns = np.diff(closes) / closes[:-1]
+        volatility = np.std(returns) * np.sqrt(252)
+        return volatility * 100, np.mean(returns) * 252 / volatility
+
+    def test_matches_per_stock_calculation_in_one_query(self):
+        from scripts.risk_engine import risk_metrics
+
+        with self.assertNumQueries(1):
+            results = risk_metrics(['aaa', 'BBB', 'CCC', 'MISSING'], days=30, end_date=self.end)
+
+        by_ticker = {result['ticker']: result for result in results}
+        for stock in self.stocks:
+            volatility, sharpe = self.expected(stock)
+            self.assertAlmostEqual(by_ticker[stock.ticker]['volatility'], volatility)
+            self.assertAlmostEqual(by_ticker[stock.ticker]['sharpe_ratio'], sharpe)
+        self.assertEqual(by_ticker['BBB']['observations'], by_ticker['AAA']['observations'] - 3)
+        self.assertEqual(by_ticker['MISSING'], {
+            'ticker': 'MISSING', 'volatility': 0.0, 'annual_return': 0.0, 'sharpe_ratio': 0.0, 'observations': 0,
+        })
+        self.assertEqual([result['volatility'] for result in results],
+                         sorted((result['volatility'] for result in results), reverse=True))
+
+    def test_api_reports_watched_stocks(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+        from watchlists.models import Watchlist, WatchlistItem
+
+        user = get_user_model().objects.create_user(username='risk', password='secret', email='risk@example.com')
+        watchlist = Watchlist.objects.create(user=user, name='Main')
+        for stock in self.stocks[:2]:
+            WatchlistItem.objects.create(watchlist=watchlist, stock=stock)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/stocks/risk-api/', {'days': 3650})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(result['ticker'] for result in response.data['results']), ['AAA', 'BBB'])
+
+        response = client.get('/api/stocks/risk-api/', {'tickers': 'ccc', 'days': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MarketBetaTests(TestCase):
+    """Tests for batch closed-form betas against the market proxy"""
+
+    def setUp(self):
+        self.fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        market = make_synthetic_history(years=2, seed=0, end='2024-12-31')
+        self.histories = {
+            'SPY': market,
+            'SAME': market,
+            'LEVER': market.assign(Close=100 * (1 + 2 * market['Close'].pct_change().fillna(0)).cumprod()),
+            'GAPPY': make_synthetic_history(years=2, seed=3, end='2024-12-31').drop(market.index[-40:-30]),
+            'SHORT': market.iloc[-10:],
+        }
+        for ticker, hist in self.histories.items():
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp')
+            self.fetcher.bulk_save_historical_data(stock, hist)
+        self.end = pd.Timestamp('2024-12-31').date()
+
+    def regression_beta(self, ticker, period_days=252):
+        """Pairwise intersect-then-diff OLS slope, as calculate_beta used to fit"""
+        start = self.end - pd.Timedelta(days=period_days)
+        frames = [
+            pd.Series(dict(StockPrice.objects.filter(
+                stock__ticker=name, date__gte=start, date__lte=self.end
+            ).values_list('date', 'close')))
+            for name in (ticker, 'SPY')
+        ]
+        joined = pd.concat(frames, axis=1, join='inner').sort_index().pct_change().dropna()
+        return np.polyfit(joined[1], joined[0], 1)[0]
+
+    def test_batch_betas_match_pairwise_regression(self):
+        from scripts.risk_engine import market_betas
+
+        with self.assertNumQueries(1):
+            result = market_betas(['same', 'LEVER', 'GAPPY', 'SHORT', 'SPY'], end_date=self.end)
+
+        self.assertEqual(list(result['betas']), ['SAME', 'LEVER', 'GAPPY', 'SHORT'])
+        self.assertAlmostEqual(result['betas']['SAME'], 1.0)
+        self.assertAlmostEqual(result['betas']['LEVER'], 2.0, places=4)
+        self.assertAlmostEqual(result['betas']['GAPPY'], self.regression_beta('GAPPY'))
+        self.assertIsNone(result['betas']['SHORT'])
+
+    def test_rolling_betas_match_windowed_betas(self):
+        from scripts.risk_engine import PriceMatrix, betas, market_returns, rolling_betas
+
+        matrix = PriceMatrix.load(['GAPPY', 'SPY'], end_date=self.end)
+        _, stock_returns, market_moves = market_returns(matrix, 'SPY')
+        rolling = rolling_betas(stock_returns, market_moves, 20)
+
+        expected, _ = betas(stock_returns[-20:], market_moves[-20:], min_observations=20)
+        self.assertAlmostEqual(rolling[-1, 0], expected[0])
+        # Windows spanning GAPPY's missing dates have no beta
+        self.assertTrue(np.isnan(rolling[-35, 0]))
+        self.assertFalse(np.isnan(rolling[-35, 1]))
+
+    def test_calculator_reuses_stored_betas_without_writing(self):
+        from scripts.advanced_analytics import AdvancedAnalyticsCalculator
+        from scripts.risk_engine import market_betas, save_betas
+        from stocks.models import StockBeta
+
+        calculator = AdvancedAnalyticsCalculator()
+        period_days = (pd.Timestamp.now().date() - self.end).days + 252
+        first = calculator.calculate_betas(['SAME', 'LEVER', 'SHORT'], period_days=period_days)
+        self.assertAlmostEqual(first['LEVER'], 2.0, places=4)
+        self.assertIsNone(first['SHORT'])
+        self.assertFalse(StockBeta.objects.exists())
+
+        # As the daily job stores them
+        save_betas(market_betas(['SAME', 'LEVER'], period_days=period_days))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(calculator.calculate_betas(['SAME', 'LEVER'], period_days=period_days), {
+                'SAME': first['SAME'], 'LEVER': first['LEVER'],
+            })
+        self.assertEqual(calculator.calculate_beta('lever', period_days=period_days), first['LEVER'])
+        self.assertEqual(calculator.calculate_beta('spy', period_days=period_days), 1.0)
+
+
+class PortfolioRiskTests(TestCase):
+    """Tests for the covariance-based portfolio risk engine"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.end = pd.Timestamp('2024-12-31').date()
+        for seed, ticker in enumerate(['AAA', 'BBB', 'CCC']):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp', current_price=100 * (seed + 1))
+            self.fetcher.bulk_save_historical_data(stock, make_synthetic_history(years=1, seed=seed, end='2024-12-31'))
+        Stock.objects.create(ticker='NOPRICES', company_name='No Prices', current_price=10)
+
+    def test_statistics_match_weighted_series(self):
+        from scripts.risk_engine import portfolio_statistics
+
+        rng = np.random.default_rng(0)
+        returns = rng.normal(0.001, 0.02, (500, 3)) @ np.array([[1, 0.5, 0], [0, 1, 0.3], [0, 0, 1]])
+        weights = np.array([0.5, 0.3, 0.2])
+        stats = portfolio_statistics(returns, weights)
+
+        series = returns @ weights
+        self.assertAlmostEqual(stats['daily_volatility'], np.std(series, ddof=1) * 100)
+        self.assertAlmostEqual(stats['var_historical'], -np.percentile(series, 5) * 100)
+        self.assertAlmostEqual(stats['cvar_historical'], -series[series <= np.percentile(series, 5)].mean() * 100)
+        self.assertAlmostEqual(stats['var_parametric'],
+                               -(series.mean() - 1.6448536269514722 * np.std(series, ddof=1)) * 100)
+        self.assertGreater(stats['cvar_parametric'], stats['var_parametric'])
+        self.assertAlmostEqual(stats['risk_contributions'].sum(), 1.0)
+
+        growth = np.cumprod(1 + series)
+        self.assertAlmostEqual(stats['max_drawdown'],
+                               min((growth / np.maximum.accumulate(np.maximum(growth, 1)) - 1).min(), 0) * 100)
+
+    def test_portfolio_weights_by_value_and_caches(self):
+        from scripts.risk_engine import portfolio_risk
+
+        holdings = {'AAA': 3, 'bbb': 1, 'CCC': 1, 'NOPRICES': 5, 'UNKNOWN': 1}
+        with self.assertNumQueries(2):
+            risk = portfolio_risk(holdings, days=90, end_date=self.end)
+
+        self.assertEqual(risk['excluded'], ['NOPRICES', 'UNKNOWN'])
+        self.assertEqual([holding['ticker'] for holding in risk['holdings']], ['AAA', 'BBB', 'CCC'])
+        self.assertEqual([round(holding['weight'], 6) for holding in risk['holdings']], [0.375, 0.25, 0.375])
+        self.assertGreater(risk['var_historical'], 0)
+        self.assertLessEqual(risk['max_drawdown'], 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(portfolio_risk(holdings, days=90, end_date=self.end), risk)
+
+        # New prices for any holding invalidate the cached result
+        Stock.objects.get(ticker='AAA').save()
+        with self.assertNumQueries(2):
+            portfolio_risk(holdings, days=90, end_date=self.end)
+
+    def test_sparse_holding_is_excluded_instead_of_shortening_the_window(self):
+        from scripts.risk_engine import portfolio_risk
+
+        listed = Stock.objects.create(ticker='NEWLIST', company_name='New Listing', current_price=20)
+        self.fetcher.bulk_save_historical_data(listed, make_synthetic_history(years=1, end='2024-12-31').iloc[-5:])
+
+        full = portfolio_risk({'AAA': 1, 'BBB': 1}, days=90, end_date=self.end)
+        risk = portfolio_risk({'AAA': 1, 'BBB': 1, 'NEWLIST': 1}, days=90, end_date=self.end)
+
+        self.assertEqual(risk['excluded'], ['NEWLIST'])
+        self.assertEqual(risk['observations'], full['observations'])
+        self.assertGreater(risk['observations'], 30)
+
+    def test_portfolio_metrics_use_engine(self):
+        from scripts.advanced_analytics import AdvancedAnalyticsCalculator
+
+        metrics = AdvancedAnalyticsCalculator().calculate_portfolio_metrics({
+            'AAA': {'quantity': 2, 'buy_price': 50},
+            'BBB': {'quantity': 1},
+        }, days=(pd.Timestamp.now().date() - self.end).days + 90)
+        self.assertEqual(metrics['total_value'], 400)
+        self.assertEqual(metrics['total_cost'], 300)
+        self.assertGreater(metrics['volatility'], 0)
+        self.assertGreaterEqual(metrics['cvar_95'], metrics['var_95'])
+
+
+class MonteCarloRiskTests(TestCase):
+    """Tests for the Monte Carlo portfolio simulator"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.end = pd.Timestamp('2024-12-31').date()
+        for seed, ticker in enumerate(['AAA', 'BBB']):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp', current_price=100 * (seed + 1))
+            fetcher.bulk_save_historical_data(stock, make_synthetic_history(years=1, seed=seed, end='2024-12-31'))
+        Stock.objects.create(ticker='NOPRICES', company_name='No Prices', current_price=10)
+
+    def test_one_day_var_matches_normal_quantile(self):
+        from scripts.risk_engine import simulate_portfolio
+
+        mean = np.array([0.001, 0.0005, 0.0])
+        covariance = np.array([[4, 1, 0], [1, 2, 0.5], [0, 0.5, 1]]) * 1e-4
+        weights = np.array([0.5, 0.3, 0.2])
+        result = simulate_portfolio(mean, covariance, weights, horizon=1, simulations=200_000, seed=0)
+
+        volatility = np.sqrt(weights @ covariance @ weights)
+        self.assertAlmostEqual(result['var'], -(weights @ mean - 1.6448536269514722 * volatility) * 100, delta=0.01)
+        self.assertAlmostEqual(result['return_volatility'], volatility * 100, delta=0.01)
+        # Antithetic pairs make the simulated mean exact for one-day returns
+        self.assertAlmostEqual(result['mean_return'], weights @ mean * 100, places=4)
+        self.assertGreater(result['cvar'], result['var'])
+        self.assertAlmostEqual(result['percentiles'][5], -result['var'])
+
+    def test_chunking_does_not_change_results(self):
+        from scripts.risk_engine import simulate_portfolio
+
+        mean = np.full(4, 0.0003)
+        # Rank-deficient covariance falls back to an eigen factor
+        covariance = np.outer([1, 1, 2, 0.5], [1, 1, 2, 0.5]) * 1e-4
+        whole = simulate_portfolio(mean, covariance, np.full(4, 0.25), simulations=5001, seed=3)
+        chunked = simulate_portfolio(mean, covariance, np.full(4, 0.25), simulations=5001, seed=3, max_bytes=4096)
+
+        self.assertEqual(whole['chunks'], 1)
+        self.assertGreater(chunked['chunks'], 1)
+        self.assertEqual(chunked['simulations'], 5001)
+        for name in ('var', 'cvar', 'mean_return', 'probability_of_loss'):
+            self.assertAlmostEqual(whole[name], chunked[name], places=4)
+        self.assertLessEqual(whole['max_drawdown']['worst_5'], whole['max_drawdown']['median'])
+        self.assertLessEqual(whole['max_drawdown']['mean'], 0)
+
+    def test_calculator_simulates_holdings(self):
+        from scripts.advanced_analytics import AdvancedAnalyticsCalculator
+
+        days = (pd.Timestamp.now().date() - self.end).days + 252
+        holdings = {'AAA': {'quantity': 3}, 'BBB': {'quantity': 1}, 'NOPRICES': {'quantity': 5}}
+        result = AdvancedAnalyticsCalculator().calculate_monte_carlo_risk(
+            holdings, days=days, simulations=20_000, seed=1
+        )
+
+        self.assertEqual(result['excluded'], ['NOPRICES'])
+        self.assertEqual([round(holding['weight'], 6) for holding in result['holdings']], [0.6, 0.4])
+        self.assertEqual(result['horizon'], 10)
+        self.assertGreater(result['var'], 0)
+        self.assertEqual(result['total_value'], 550)
+        self.assertAlmostEqual(result['var_amount'], 500 * result['var'] / 100)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                AdvancedAnalyticsCalculator().calculate_monte_carlo_risk(holdings, days=days, simulations=20_000, seed=1),
+                result
+            )
+
+    def test_analytics_page_simulates_fewer_paths(self):
+        from unittest import mock
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from watchlists.models import Watchlist, WatchlistItem
+
+        user = get_user_model().objects.create_user(username='holder', password='secret', email='h@example.com')
+        watchlist = Watchlist.objects.create(user=user, name='Core')
+        WatchlistItem.objects.create(watchlist=watchlist, stock=Stock.objects.get(ticker='AAA'), quantity=3)
+        self.client.force_login(user)
+
+        with override_settings(PORTFOLIO_VIEW_SIMULATIONS=2_000), \
+                mock.patch('scripts.risk_engine.monte_carlo_risk', return_value=None) as simulate:
+            response = self.client.get('/api/stocks/portfolio-analytics/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(simulate.call_args.kwargs['simulations'], 2_000)
+
+
+class CorrelationTests(TestCase):
+    """Tests for the single-query correlation service"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.end = pd.Timestamp('2024-12-31').date()
+        for seed, ticker in enumerate(['AAA', 'BBB', 'CCC']):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp')
+            hist = make_synthetic_history(years=1, seed=seed, end='2024-12-31')
+            if ticker == 'BBB':
+                hist = hist.drop(hist.index[-20:-10])  # Gap inside the window
+            fetcher.bulk_save_historical_data(stock, hist)
+        fetcher.bulk_save_historical_data(
+            Stock.objects.create(ticker='SHORT', company_name='Short Corp'),
+            make_synthetic_history(years=1, seed=9, end='2024-12-31').iloc[-10:]
+        )
+
+    def test_pairwise_matches_pandas(self):
+        from scripts.risk_engine import pairwise_correlation
+
+        rng = np.random.default_rng(0)
+        returns = rng.normal(size=(200, 6)) @ rng.normal(size=(6, 6))
+        returns[rng.random(returns.shape) < 0.2] = np.nan
+        returns[:180, 5] = np.nan
+        correlation, observations = pairwise_correlation(returns, min_periods=30)
+
+        expected = pd.DataFrame(returns).corr(min_periods=30).values
+        np.testing.assert_allclose(correlation, expected, atol=1e-12)
+        self.assertTrue(np.isnan(correlation[0, 5]))
+        self.assertEqual(observations[1, 2], (~np.isnan(returns[:, [1, 2]])).all(axis=1).sum())
+
+    def test_shrinkage_keeps_matrix_positive_definite(self):
+        from scripts.risk_engine import shrunk_correlation
+
+        # More tickers than dates: the sample correlation is singular
+        returns = np.random.default_rng(1).normal(size=(20, 40))
+        correlation, intensity = shrunk_correlation(returns)
+
+        self.assertTrue(0 < intensity <= 1)
+        self.assertGreater(np.linalg.eigvalsh(correlation).min(), 0)
+        np.testing.assert_allclose(np.diag(correlation), 1)
+
+    def test_shrinkage_leaves_constant_columns_unmeasured(self):
+        from scripts.risk_engine import shrunk_correlation
+
+        returns = np.random.default_rng(2).normal(size=(60, 4))
+        returns[:, 2] = 0.0
+        with np.errstate(all='raise'):
+            correlation, intensity = shrunk_correlation(returns)
+
+        self.assertTrue(np.isnan(correlation[2]).all() and np.isnan(correlation[:, 2]).all())
+        expected, expected_intensity = shrunk_correlation(returns[:, [0, 1, 3]])
+        np.testing.assert_allclose(correlation[np.ix_([0, 1, 3], [0, 1, 3])], expected)
+        self.assertEqual(intensity, expected_intensity)
+
+    def test_service_aligns_dates_and_caches(self):
+        from scripts.risk_engine import correlation_matrix
+
+        with self.assertNumQueries(2):
+            result = correlation_matrix(['ccc', 'AAA', 'BBB', 'SHORT', 'MISSING'], days=120, end_date=self.end)
+
+        self.assertEqual(result['tickers'], ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(result['excluded'], ['MISSING', 'SHORT'])
+        self.assertEqual([result['matrix'][i][i] for i in range(3)], [1.0, 1.0, 1.0])
+        self.assertEqual(result['matrix'][0][1], result['matrix'][1][0])
+        self.assertEqual(result['observations'][0][1], result['observations'][1][1])
+        self.assertLess(result['observations'][0][1], result['observations'][0][2])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(correlation_matrix(['AAA', 'BBB', 'CCC', 'SHORT', 'MISSING'], days=120,
+                                                end_date=self.end), result)
+
+        shrunk = correlation_matrix(['AAA', 'BBB', 'CCC'], days=120, end_date=self.end, method='shrinkage')
+        self.assertEqual(shrunk['observations'], result['observations'][1][1])
+        self.assertTrue(0 <= shrunk['shrinkage'] <= 1)
+        self.assertLessEqual(abs(shrunk['matrix'][0][2]), abs(result['matrix'][0][2]) + 0.05)
+
+    def test_api_validates_parameters(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            username='corr', password='secret', email='corr@example.com'
+        ))
+        response = client.get('/api/stocks/correlation-api/', {'tickers': 'aaa,bbb', 'days': 3650})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tickers'], ['AAA', 'BBB'])
+        self.assertEqual(len(response.data['matrix']), 2)
+
+        self.assertEqual(client.get('/api/stocks/correlation-api/', {'method': 'spearman'}).status_code, 400)
+        self.assertEqual(client.get('/api/stocks/correlation-api/', {'tickers': 'MISSING'}).status_code, 404)
+
+
+class SectorComparisonTests(TestCase):
+    """Tests for single-query sector performance and percentile ranks"""
+
+    def setUp(self):
+        fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.end = pd.Timestamp.now().normalize()
+        for seed, (ticker, pe, cap) in enumerate([
+            ('AAA', 10, 1000), ('BBB', 20, 3000), ('CCC', None, 2000), ('DDD', 30, 3000), ('EEE', 5, 500),
+        ]):
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp', sector='Tech',
+                                         pe_ratio=pe, market_cap=cap, is_active=ticker != 'EEE')
+            fetcher.bulk_save_historical_data(stock, make_synthetic_history(years=1, seed=seed, end=self.end))
+        Stock.objects.create(ticker='NOBARS', company_name='No Bars', sector='Tech')
+        Stock.objects.create(ticker='OTHER', company_name='Other', sector='Energy', pe_ratio=99)
+
+    def test_percentile_ranks(self):
+        from scripts.risk_engine import percentile_ranks
+
+        ranks = percentile_ranks([3.0, 1.0, np.nan, 2.0, 2.0, 5.0])
+        np.testing.assert_allclose(ranks, [75, 0, np.nan, 37.5, 37.5, 100])
+        self.assertTrue(np.isnan(percentile_ranks([1.0, np.nan])).all())
+
+    def test_matches_per_stock_performance(self):
+        from scripts.advanced_analytics import AdvancedAnalyticsCalculator
+
+        calculator = AdvancedAnalyticsCalculator()
+        start = (self.end - pd.Timedelta(days=30)).date()
+        expected = {}
+        for ticker in ['AAA', 'BBB', 'CCC', 'DDD']:
+            closes = [float(close) for close in StockPrice.objects.filter(
+                stock__ticker=ticker, date__gte=start, date__lte=self.end.date()
+            ).order_by('date').values_list('close', flat=True)]
+            expected[ticker] = (closes[-1] - closes[0]) / closes[0] * 100
+
+        with self.assertNumQueries(3):
+            comparison = calculator.get_sector_comparison('bbb')
+
+        self.assertEqual(comparison['peer_count'], 4)
+        performance = comparison['performance_comparison']
+        self.assertAlmostEqual(performance['performance'], expected['BBB'])
+        peers = [expected[ticker] for ticker in ['AAA', 'CCC', 'DDD']]
+        self.assertAlmostEqual(performance['sector_avg'], np.mean(peers))
+        self.assertAlmostEqual(performance['percentile'], sum(value < expected['BBB'] for value in peers) / 3 * 100)
+
+        # P/E among AAA, BBB, DDD; market cap ties with DDD count half
+        self.assertEqual(comparison['valuation_comparison']['pe_percentile'], 50.0)
+        self.assertEqual(comparison['valuation_comparison']['pe_vs_sector'], 0.0)
+        self.assertAlmostEqual(comparison['valuation_comparison']['size_percentile'], 2.5 / 3 * 100)
+
+        # Inactive stocks are still compared against their active peers
+        self.assertEqual(calculator.get_sector_comparison('EEE')['valuation_comparison']['size_percentile'], 0.0)
+
+
+class DailyMetricsTests(TestCase):
+    """Tests for the precomputed DailyMetrics table"""
+
+    def setUp(self):
+        fetcher = StockDataFetcher(data_source=FixtureDataSource())
+        self.end = pd.Timestamp('2024-12-31').date()
+        self.histories = {
+            'AAA': make_synthetic_history(years=2, seed=0, end='2024-12-31'),
+            'BBB': make_synthetic_history(years=2, seed=1, end='2024-12-31').drop(
+                pd.bdate_range('2024-11-01', '2024-11-15')
+            ),
+            'NEW': make_synthetic_history(years=2, seed=2, end='2024-12-31').iloc[-30:],
+        }
+        for ticker, hist in self.histories.items():
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp')
+            fetcher.bulk_save_historical_data(stock, hist)
+
+    def test_matches_per_stock_pandas(self):
+        from scripts.daily_metrics import update_daily_metrics
+        from stocks.models import DailyMetrics
+
+        self.assertEqual(update_daily_metrics(end_date=self.end), sum(map(len, self.histories.values())))
+
+        for ticker, hist in self.histories.items():
+            rows = pd.DataFrame(list(
+                DailyMetrics.objects.filter(stock__ticker=ticker).order_by('date').values()
+            )).set_index('date')
+            close = hist['Close']
+            expected = {
+                'return_1d': close.pct_change() * 100,
+                'return_5d': close.pct_change(5) * 100,
+                'return_3m': close.pct_change(63) * 100,
+                'return_1y': close.pct_change(252) * 100,
+                'volatility_30d': close.pct_change().rolling(21).std() * np.sqrt(252) * 100,
+                'avg_volume_30d': hist['Volume'].rolling(21).mean(),
+            }
+            for name, series in expected.items():
+                np.testing.assert_allclose(rows[name].astype(float).values, series.values, err_msg=f'{ticker} {name}')
+
+        aaa = self.histories['AAA']['Close']
+        year_end = aaa[aaa.index.year == 2023].iloc[-1]
+        latest = DailyMetrics.objects.get(stock__ticker='AAA', date=self.end)
+        self.assertAlmostEqual(latest.return_ytd, (aaa.iloc[-1] / year_end - 1) * 100)
+        self.assertIsNone(DailyMetrics.objects.get(stock__ticker='NEW', date=self.end).return_ytd)
+
+    def test_incremental_update_and_as_of(self):
+        from scripts.daily_metrics import update_daily_metrics
+        from stocks.models import DailyMetrics
+
+        update_daily_metrics(end_date=self.end)
+        full = {
+            (row['stock_id'], row['date']): row
+            for row in DailyMetrics.objects.values()
+        }
+        DailyMetrics.objects.filter(date__gte='2024-12-20').delete()
+
+        with self.assertNumQueries(3):
+            written = update_daily_metrics(days=10, end_date=self.end)
+        self.assertEqual(written, 3 * len(pd.bdate_range('2024-12-21', '2024-12-31')))
+        for row in DailyMetrics.objects.filter(date__gte='2024-12-20').values():
+            expected = full[(row['stock_id'], row['date'])]
+            for name in ('return_1y', 'return_ytd', 'volatility_30d', 'avg_volume_30d'):
+                if expected[name] is None:
+                    self.assertIsNone(row[name])
+                else:
+                    self.assertAlmostEqual(row[name], expected[name])
+
+        with self.assertNumQueries(1):
+            latest = list(DailyMetrics.objects.as_of().values_list('stock__ticker', 'date'))
+        self.assertEqual(sorted(latest), [('AAA', self.end), ('BBB', self.end), ('NEW', self.end)])
+        self.assertEqual({row.date for row in DailyMetrics.objects.as_of('2024-12-29')},
+                         {pd.Timestamp('2024-12-27').date()})
+
+
+class MoversTests(TestCase):
+    """Tests for precomputed market movers"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from stocks.models import DailyMetrics
+
+        cache.clear()
+        self.date = pd.Timestamp('2024-12-31').date()
+        rows = [
+            # ticker, sector, return_1d, volume, avg_volume_30d
+            ('UPBIG', 'Tech', 8.0, 1_000, 1_000),
+            ('UPSMALL', 'Tech', 1.0, 5_000, 500),
+            ('FLAT', 'Energy', 0.0, 9_000, 9_000),
+            ('DOWN', 'Energy', -3.0, 2_000, 4_000),
+            ('NEWLIST', '', None, 300, None),
+        ]
+        for ticker, sector, change, volume, average in rows:
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Inc', sector=sector)
+            for date, day_change in ((self.date - pd.Timedelta(days=1), 50.0), (self.date, change)):
+                DailyMetrics.objects.create(stock=stock, date=date, close=10.0, volume=volume,
+                                            return_1d=day_change, avg_volume_30d=average)
+        Stock.objects.create(ticker='GONE', company_name='Gone Inc', sector='Tech', is_active=False)
+
+    def test_rankings(self):
+        from scripts.movers import refresh_movers
+
+        with self.assertNumQueries(1):
+            movers = refresh_movers()
+
+        universe = movers['movers:all']
+        self.assertEqual(universe['date'], self.date)
+        self.assertEqual(universe['stock_count'], 5)
+        self.assertEqual([entry['ticker'] for entry in universe['gainers']], ['UPBIG', 'UPSMALL'])
+        self.assertEqual([entry['ticker'] for entry in universe['losers']], ['DOWN'])
+        self.assertEqual([entry['ticker'] for entry in universe['most_active']][:2], ['FLAT', 'UPSMALL'])
+        self.assertEqual([entry['ticker'] for entry in universe['unusual_volume']],
+                         ['UPSMALL', 'FLAT', 'UPBIG', 'DOWN'])
+        self.assertEqual(universe['unusual_volume'][0]['relative_volume'], 10.0)
+
+        self.assertEqual(sorted(movers), ['movers:Energy', 'movers:Tech', 'movers:all'])
+        self.assertEqual([entry['ticker'] for entry in movers['movers:Energy']['gainers']], [])
+        self.assertEqual(refresh_movers(limit=1)['movers:all']['most_active'][0]['ticker'], 'FLAT')
+
+    def test_dashboard_reads_cached_movers(self):
+        from django.contrib.auth import get_user_model
+        from scripts.movers import get_movers, refresh_movers
+
+        refresh_movers()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_movers('Tech')['gainers'][0]['ticker'], 'UPBIG')
+
+        # Unknown sectors are cached as empty rather than re-ranked per request
+        self.assertEqual(get_movers('Utilities')['gainers'], [])
+        with self.assertNumQueries(0):
+            get_movers('Utilities')
+
+        user = get_user_model().objects.create_user(username='movers', password='secret', email='m@example.com')
+        self.client.force_login(user)
+        response = self.client.get('/api/stocks/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['ticker'] for entry in response.context['top_gainers']], ['UPBIG', 'UPSMALL'])
+        self.assertEqual([entry['ticker'] for entry in response.context['top_losers']], ['DOWN'])
+
+
+class ScreenerTests(TestCase):
+    """Tests for the in-memory columnar screener"""
+
+    def setUp(self):
+        from datetime import datetime
+        from scripts.screener import get_screener
+
+        get_screener().invalidate()
+        today = datetime.now().date()
+        rows = [
+            # ticker, sector, price, market_cap, pe_ratio, volume, rsi, snapshot age
+            ('AAA', 'Technology', 150, 2_000_000_000, 25, 1_000_000, 25.0, 0),
+            ('BBB', 'technology', 40, 500_000_000, None, 3_000_000, 60.0, 0),
+            ('CCC', 'Energy', 90, 900_000_000, 12, 200_000, 28.0, 30),
+            ('DDD', 'Energy', None, None, 8, None, None, None),
+        ]
+        for ticker, sector, price, market_cap, pe_ratio, volume, rsi, age in rows:
+            stock = Stock.objects.create(ticker=ticker, company_name=f'{ticker} Corp', sector=sector,
+                                         current_price=price, previous_close=price and price / 2,
+                                         market_cap=market_cap, pe_ratio=pe_ratio, volume=volume)
+            if age is not None:
+                IndicatorSnapshot.objects.create(stock=stock, date=today - pd.Timedelta(days=age), rsi_14=rsi)
+        Stock.objects.create(ticker='GONE', company_name='Gone Corp', sector='Energy', current_price=100,
+                             is_active=False)
+
+    def screen(self, params):
+        from scripts.screener import expression_from_params, filters_from_params, get_screener, sort_from_params
+
+        universe = get_screener().get()
+        positions = universe.screen(filters_from_params(params), sort=sort_from_params(params, universe),
+                                    expression=expression_from_params(params))
+        return universe.columns['ticker'][positions].tolist()
+
+    def test_filters_and_sorting(self):
+        self.assertEqual(self.screen({}), ['AAA', 'BBB', 'CCC', 'DDD'])
+        self.assertEqual(self.screen({'min_price': '50'}), ['AAA', 'CCC'])
+        self.assertEqual(self.screen({'sector': 'TECHNOLOGY'}), ['AAA', 'BBB'])
+        self.assertEqual(self.screen({'max_pe': '20'}), ['CCC', 'DDD'])
+        # Stale snapshots never match indicator filters
+        self.assertEqual(self.screen({'rsi_max': '30'}), ['AAA'])
+        # Missing values sort last in both directions; unknown columns fall back to ticker
+        self.assertEqual(self.screen({'sort': 'pe_ratio'}), ['DDD', 'CCC', 'AAA', 'BBB'])
+        self.assertEqual(self.screen({'sort': '-volume'}), ['BBB', 'AAA', 'CCC', 'DDD'])
+        self.assertEqual(self.screen({'sort': '-change_percent', 'min_volume': '1'}), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(self.screen({'sort': 'nonsense'}), ['AAA', 'BBB', 'CCC', 'DDD'])
+        # Text sorts ignore case, and tied sectors keep ticker order in both directions
+        self.assertEqual(self.screen({'sort': 'sector'}), ['CCC', 'DDD', 'AAA', 'BBB'])
+        self.assertEqual(self.screen({'sort': '-sector'}), ['AAA', 'BBB', 'CCC', 'DDD'])
+
+        with self.assertRaises(ValueError):
+            self.screen({'min_price': 'abc'})
+
+    def test_universe_revalidates_after_writes(self):
+        from scripts.screener import get_screener
+
+        screener = get_screener()
+        universe = screener.get()
+        with self.assertNumQueries(0):
+            self.assertIs(screener.get(), universe)
+
+        Stock.objects.filter(ticker='CCC').update(is_active=False)
+        screener.revalidate_after = 0
+        try:
+            self.assertEqual(self.screen({}), ['AAA', 'BBB', 'DDD'])
+        finally:
+            screener.revalidate_after = 60
+
+    def test_views_serve_from_screener(self):
+        response = self.client.get('/api/stocks/screener-api/', {'min_price': '50', 'sort': '-price'},
+                                   HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['ticker'] for row in response.data['results']], ['AAA', 'CCC'])
+
+        response = self.client.get('/api/stocks/screener-api/', {'min_price': 'abc'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 400)
+
+        from django.contrib.auth import get_user_model
+
+        user = get_user_model().objects.create_user(username='screener', password='secret', email='s@example.com')
+        self.client.force_login(user)
+        response = self.client.get('/api/stocks/screener/', {'sector': 'energy'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([stock.ticker for stock in response.context['page_obj']], ['CCC', 'DDD'])
+        self.assertEqual(response.context['sectors'], ['Energy', 'Technology', 'technology'])
+
+    def test_expressions(self):
+        from scripts.screener import compile_expression
+
+        self.assertEqual(self.screen({'expr': 'rsi14 < 30 and price > 2 * 50'}), ['AAA'])
+        self.assertEqual(self.screen({'expr': 'sector == "ENERGY" or volume >= 3e6'}), ['BBB', 'CCC', 'DDD'])
+        self.assertEqual(self.screen({'expr': '5 < pe_ratio <= 12', 'sort': '-pe_ratio'}), ['CCC', 'DDD'])
+        self.assertEqual(self.screen({'expr': 'not (price > 100)', 'sector': 'energy'}), ['CCC'])
+        self.assertEqual(self.screen({'expr': 'market_cap / 1e6 - 100 > change_percent * 8'}), ['AAA'])
+        # Missing values never compare true and indicator columns need a fresh snapshot
+        self.assertEqual(self.screen({'expr': 'rsi14 > 0'}), ['AAA', 'BBB'])
+        self.assertEqual(self.screen({'expr': 'pe_ratio > 0 or pe_ratio <= 0'}), ['AAA', 'CCC', 'DDD'])
+        self.assertEqual(self.screen({'expr': 'pe_ratio != 20'}), ['AAA', 'CCC', 'DDD'])
+        self.assertEqual(self.screen({'expr': 'not pe_ratio > 20'}), ['CCC', 'DDD'])
+        self.assertEqual(self.screen({'expr': 'industry != "software"'}), [])
+        # Unknown or true is true, unknown and false is false
+        self.assertEqual(self.screen({'expr': 'pe_ratio > 20 or price > 20'}), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(self.screen({'expr': 'not (pe_ratio > 20 and price > 100)'}), ['BBB', 'CCC', 'DDD'])
+        # Division by zero is a missing value, not an error
+        self.assertEqual(self.screen({'expr': '1/0 < price'}), [])
+        self.assertEqual(self.screen({'expr': 'not (price / 0 > 1)'}), [])
+
+        # Compiled once per text, whitespace-insensitive
+        self.assertIs(compile_expression('rsi14 < 30'), compile_expression('rsi14 < 30'))
+        self.assertIs(compile_expression('rsi14  <\n30'), compile_expression('rsi14 < 30'))
+        self.assertIs(compile_expression('(rsi14<30)'), compile_expression('rsi14 < 30'))
+        self.assertEqual(compile_expression('rsi14<30').text, 'rsi14 < 30')
+        self.assertEqual(compile_expression('close > sma200 and volume > 2 * avg_vol_30').columns,
+                         {'close', 'sma200', 'volume', 'avg_vol_30'})
+
+        for invalid in ('', 'rsi14 <', 'rsi14 + 1', 'unknown > 1', 'sector > "a"', 'price > sector',
+                        '__import__("os")', 'price.real > 1', 'price > True', 'rsi14 in (1, 2)',
+                        'price < 1' + '0' * 400, 'price < 1e999', 'price > 2j', 'x' * 501):
+            with self.assertRaises(ValueError, msg=invalid):
+                compile_expression(invalid)
+
+    def test_expression_api(self):
+        response = self.client.get('/api/stocks/screener-api/', {'expr': 'price > 50', 'sort': '-price'},
+                                   HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['ticker'] for row in response.data['results']], ['AAA', 'CCC'])
+
+        response = self.client.get('/api/stocks/screener-api/', {'expr': 'price >'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid screen expression', response.data['error'])
+
+        for expression in ('1/0 < price', 'price < 1' + '0' * 400):
+            response = self.client.get('/api/stocks/screener-api/', {'expr': expression}, HTTP_HOST='localhost')
+            self.assertIn(response.status_code, (200, 400), msg=expression)
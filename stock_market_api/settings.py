@@ -136,6 +136,34 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Market data source
+# Point MARKET_DATA_DIR at a frozen dataset to replay it instead of calling yfinance
+MARKET_DATA_DIR = config('MARKET_DATA_DIR', default='')
+MARKET_DATA_MMAP = config('MARKET_DATA_MMAP', default=False, cast=bool)
+
+# On-disk cache of yfinance responses; opt-in, set MARKET_DATA_CACHE to a file path outside the repo to enable
+MARKET_DATA_CACHE = config('MARKET_DATA_CACHE', default='')
+MARKET_DATA_CACHE_MAX_BYTES = config('MARKET_DATA_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+
+# Seconds a portfolio risk result is cached per (holdings, window)
+PORTFOLIO_RISK_CACHE_SECONDS = config('PORTFOLIO_RISK_CACHE_SECONDS', default=300, cast=int)
+
+# Monte Carlo paths simulated when a page renders portfolio risk; the API
+# and scheduled jobs keep the full default
+PORTFOLIO_VIEW_SIMULATIONS = config('PORTFOLIO_VIEW_SIMULATIONS', default=10_000, cast=int)
+
+# Seconds a correlation matrix is cached per (tickers, window)
+CORRELATION_CACHE_SECONDS = config('CORRELATION_CACHE_SECONDS', default=300, cast=int)
+
+# Seconds precomputed market movers are kept before being re-ranked from DailyMetrics
+MOVERS_CACHE_SECONDS = config('MOVERS_CACHE_SECONDS', default=900, cast=int)
+
+# Seconds between checks that the in-memory screener universe still matches the database
+SCREENER_REVALIDATE_SECONDS = config('SCREENER_REVALIDATE_SECONDS', default=60, cast=int)
+
+# Memory-mapped columnar export of full price histories; empty disables it
+PRICE_STORE_DIR = config('PRICE_STORE_DIR', default='')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
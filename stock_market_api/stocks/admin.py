@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Stock, StockPrice, TechnicalIndicator
+from .models import Stock, StockPrice, TechnicalIndicator, IndicatorState, IndicatorSnapshot, StockBeta, DailyMetrics
 # Register your models here.
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
@@ -25,4 +25,32 @@ class TechnicalIndicatorAdmin(admin.ModelAdmin):
     list_filter = ('indicator_type', 'date', 'period')
     search_fields = ('stock__ticker',)
     date_hierarchy = 'date'
-    ordering = ('-date',)
\ No newline at end of file
+    ordering = ('-date',)
+
+
+@admin.register(IndicatorState)
+class IndicatorStateAdmin(admin.ModelAdmin):
+    list_display = ('stock', 'indicator_type', 'period', 'last_date', 'updated_at')
+    list_filter = ('indicator_type', 'period')
+    search_fields = ('stock__ticker',)
+
+
+@admin.register(IndicatorSnapshot)
+class IndicatorSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('stock', 'date', 'rsi_14', 'macd', 'sma_50', 'sma_200', 'updated_at')
+    search_fields = ('stock__ticker',)
+    ordering = ('stock__ticker',)
+
+
+@admin.register(StockBeta)
+class StockBetaAdmin(admin.ModelAdmin):
+    list_display = ('stock', 'benchmark', 'date', 'period_days', 'window', 'beta', 'observations')
+    list_filter = ('benchmark', 'window')
+    search_fields = ('stock__ticker',)
+
+
+@admin.register(DailyMetrics)
+class DailyMetricsAdmin(admin.ModelAdmin):
+    list_display = ('stock', 'date', 'close', 'return_1d', 'return_1m', 'return_ytd', 'volatility_30d')
+    list_filter = ('date',)
+    search_fields = ('stock__ticker',)
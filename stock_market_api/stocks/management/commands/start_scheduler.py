@@ -76,6 +76,8 @@ class Command(BaseCommand):
         """Execute the daily stock update"""
         from scripts.fetch_stock_data import StockDataFetcher
         from scripts.calculate_indicators import TechnicalIndicatorCalculator
+        from scripts.daily_metrics import update_daily_metrics
+        from scripts.movers import refresh_movers
         
         try:
             self.stdout.write(f'\n{"="*60}')
@@ -85,7 +87,7 @@ class Command(BaseCommand):
             # Step 1: Update stock prices
             self.stdout.write('Step 1: Updating stock prices...')
             fetcher = StockDataFetcher()
-            success, failed = fetcher.update_all_stocks(period='5d')
+            success, failed = fetcher.update_all_stocks(period='5d', batch_size=100, incremental=True)
             self.stdout.write(self.style.SUCCESS(
                 f'Price update: {success} successful, {failed} failed\n'
             ))
@@ -93,11 +95,17 @@ class Command(BaseCommand):
             # Step 2: Calculate indicators
             self.stdout.write('Step 2: Calculating technical indicators...')
             calculator = TechnicalIndicatorCalculator()
-            success, failed = calculator.calculate_for_all_stocks(days=90)
+            success, failed = calculator.calculate_for_all_stocks(days=90, incremental=True)
             self.stdout.write(self.style.SUCCESS(
                 f'Indicator calculation: {success} successful, {failed} failed\n'
             ))
             
+            # Step 3: Refresh precomputed returns
+            self.stdout.write('Step 3: Updating daily metrics...')
+            rows = update_daily_metrics(days=7)
+            refresh_movers()
+            self.stdout.write(self.style.SUCCESS(f'Daily metrics: {rows} rows updated, market movers refreshed\n'))
+            
             self.stdout.write(self.style.SUCCESS(f'{"="*60}'))
             self.stdout.write(self.style.SUCCESS(f'Daily Update Complete - {datetime.now()}'))
             self.stdout.write(self.style.SUCCESS(f'{"="*60}\n'))
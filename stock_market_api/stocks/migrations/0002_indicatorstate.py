@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicator_type', models.CharField(choices=[('SMA', 'Simple Moving Average'), ('EMA', 'Exponential Moving Average'), ('RSI', 'Relative Strength Index'), ('MACD', 'Moving Average Convergence Divergence'), ('BB', 'Bollinger Bands'), ('STOCH', 'Stochastic Oscillator'), ('ADX', 'Average Directional Index'), ('ATR', 'Average True Range')], max_length=20)),
+                ('period', models.IntegerField(default=14)),
+                ('last_date', models.DateField()),
+                ('state', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indicator_states', to='stocks.stock')),
+            ],
+            options={
+                'db_table': 'indicator_states',
+                'unique_together': {('stock', 'indicator_type', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+SNAPSHOT_COLUMNS = {
+    ('SMA', 20): ['sma_20'],
+    ('SMA', 50): ['sma_50'],
+    ('SMA', 200): ['sma_200'],
+    ('EMA', 12): ['ema_12'],
+    ('EMA', 26): ['ema_26'],
+    ('RSI', 14): ['rsi_14'],
+    ('MACD', 26): ['macd', 'macd_signal', 'macd_histogram'],
+    ('BB', 20): ['bb_upper', 'bb_middle', 'bb_lower'],
+    ('STOCH', 14): ['stoch_k', 'stoch_d'],
+    ('ADX', 14): ['adx_14'],
+    ('ATR', 14): ['atr_14'],
+}
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Seed one snapshot per stock from its latest stored indicator rows"""
+    TechnicalIndicator = apps.get_model('stocks', 'TechnicalIndicator')
+    IndicatorSnapshot = apps.get_model('stocks', 'IndicatorSnapshot')
+
+    latest_date = TechnicalIndicator.objects.filter(
+        stock=OuterRef('stock'),
+        indicator_type=OuterRef('indicator_type'),
+        period=OuterRef('period'),
+    ).order_by('-date').values('date')[:1]
+    rows = TechnicalIndicator.objects.filter(date=Subquery(latest_date)).values_list(
+        'stock_id', 'indicator_type', 'period', 'date', 'value', 'value2', 'value3'
+    )
+
+    snapshots = {}
+    for stock_id, indicator_type, period, date, *values in rows.iterator():
+        columns = SNAPSHOT_COLUMNS.get((indicator_type, period))
+        if not columns:
+            continue
+        snapshot = snapshots.setdefault(stock_id, IndicatorSnapshot(stock_id=stock_id, date=date))
+        snapshot.date = max(snapshot.date, date)
+        for column, value in zip(columns, values):
+            setattr(snapshot, column, value)
+
+    IndicatorSnapshot.objects.bulk_create(snapshots.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0002_indicatorstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('sma_20', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('sma_50', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('sma_200', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('ema_12', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('ema_26', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('rsi_14', models.DecimalField(blank=True, db_index=True, decimal_places=4, max_digits=15, null=True)),
+                ('macd', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('macd_signal', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('macd_histogram', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('bb_upper', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('bb_middle', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('bb_lower', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('stoch_k', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('stoch_d', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('adx_14', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('atr_14', models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='indicator_snapshot', to='stocks.stock')),
+            ],
+            options={
+                'db_table': 'indicator_snapshots',
+            },
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
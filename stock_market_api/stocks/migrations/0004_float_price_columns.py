@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0003_indicatorsnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='adx_14',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='atr_14',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='bb_lower',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='bb_middle',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='bb_upper',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='ema_12',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='ema_26',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='macd',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='macd_histogram',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='macd_signal',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='rsi_14',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='sma_20',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='sma_200',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='sma_50',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='stoch_d',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='indicatorsnapshot',
+            name='stoch_k',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='stockprice',
+            name='adjusted_close',
+            field=models.FloatField(),
+        ),
+        migrations.AlterField(
+            model_name='stockprice',
+            name='close',
+            field=models.FloatField(),
+        ),
+        migrations.AlterField(
+            model_name='stockprice',
+            name='high',
+            field=models.FloatField(),
+        ),
+        migrations.AlterField(
+            model_name='stockprice',
+            name='low',
+            field=models.FloatField(),
+        ),
+        migrations.AlterField(
+            model_name='stockprice',
+            name='open',
+            field=models.FloatField(),
+        ),
+        migrations.AlterField(
+            model_name='technicalindicator',
+            name='value',
+            field=models.FloatField(),
+        ),
+        migrations.AlterField(
+            model_name='technicalindicator',
+            name='value2',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='technicalindicator',
+            name='value3',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
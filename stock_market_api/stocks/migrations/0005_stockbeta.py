@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0004_float_price_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBeta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('benchmark', models.CharField(default='SPY', max_length=10)),
+                ('date', models.DateField(db_index=True)),
+                ('period_days', models.IntegerField(default=252)),
+                ('window', models.IntegerField(default=0)),
+                ('beta', models.FloatField()),
+                ('observations', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='betas', to='stocks.stock')),
+            ],
+            options={
+                'db_table': 'stock_betas',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['stock', 'benchmark', '-date'], name='stock_betas_stock_i_cafa34_idx')],
+                'unique_together': {('stock', 'benchmark', 'period_days', 'window', 'date')},
+            },
+        ),
+    ]
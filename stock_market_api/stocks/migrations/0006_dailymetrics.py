@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0005_stockbeta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('close', models.FloatField()),
+                ('volume', models.BigIntegerField()),
+                ('return_1d', models.FloatField(blank=True, null=True)),
+                ('return_5d', models.FloatField(blank=True, null=True)),
+                ('return_1m', models.FloatField(blank=True, null=True)),
+                ('return_3m', models.FloatField(blank=True, null=True)),
+                ('return_ytd', models.FloatField(blank=True, null=True)),
+                ('return_1y', models.FloatField(blank=True, null=True)),
+                ('volatility_30d', models.FloatField(blank=True, null=True)),
+                ('avg_volume_30d', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='stocks.stock')),
+            ],
+            options={
+                'verbose_name_plural': 'daily metrics',
+                'db_table': 'daily_metrics',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['stock', '-date'], name='daily_metri_stock_i_d421c3_idx'), models.Index(fields=['date', 'return_1d'], name='daily_metri_date_91dec6_idx')],
+                'unique_together': {('stock', 'date')},
+            },
+        ),
+    ]
@@ -1,6 +1,49 @@
+import numpy as np
+from datetime import date
 from django.db import models
 from django.utils import timezone
 
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class ArrayQuerySet(models.QuerySet):
+    """QuerySet that can hand back selected columns as NumPy arrays"""
+    
+    def to_arrays(self, *fields):
+        """
+        {field: ndarray} in queryset order, read with a single values_list().
+        FloatFields come back as float64 (NULL as NaN), integer and foreign
+        key columns as int64, non-null DateFields as datetime64[D] and anything else
+        (including lookups across relations) as object arrays.
+        """
+        rows = list(self.values_list(*fields))
+        columns = zip(*rows) if rows else [()] * len(fields)
+        arrays = {}
+        for field, column in zip(fields, columns):
+            dtype = self._array_dtype(field)
+            if dtype == 'datetime64[D]':
+                # Day ordinals are far cheaper to convert than date objects
+                ordinals = np.fromiter((value.toordinal() for value in column), dtype=np.int64, count=len(column))
+                arrays[field] = (ordinals - EPOCH_ORDINAL).view('datetime64[D]')
+            else:
+                arrays[field] = np.array(column, dtype=dtype)
+        return arrays
+    
+    def _array_dtype(self, name):
+        try:
+            field = self.model._meta.get_field(name)
+        except Exception:
+            return object
+        if isinstance(field, models.FloatField):
+            return np.float64
+        if isinstance(field, (models.IntegerField, models.AutoField, models.ForeignKey)):
+            return np.int64
+        if isinstance(field, models.DateField) and not isinstance(field, models.DateTimeField) and not field.null:
+            return 'datetime64[D]'
+        return object
+
+
 # Create your models here.
 class Stock(models.Model):
     ticker = models.CharField(max_length=10, unique=True, db_index=True)
@@ -55,15 +98,18 @@ class Stock(models.Model):
 class StockPrice(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='prices')
     date = models.DateField(db_index=True)
-    open = models.DecimalField(max_digits=12, decimal_places=2)
-    high = models.DecimalField(max_digits=12, decimal_places=2)
-    low = models.DecimalField(max_digits=12, decimal_places=2)
-    close = models.DecimalField(max_digits=12, decimal_places=2)
-    adjusted_close = models.DecimalField(max_digits=12, decimal_places=2)
+    # float64 so reads skip Decimal construction; see ArrayQuerySet.to_arrays
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    adjusted_close = models.FloatField()
     volume = models.BigIntegerField()
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ArrayQuerySet.as_manager()
+    
     class Meta:
         db_table = 'stock_prices'
         ordering = ['-date']
@@ -91,17 +137,19 @@ class TechnicalIndicator(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='indicators')
     indicator_type = models.CharField(max_length=20, choices=INDICATOR_TYPES)
     date = models.DateField(db_index=True)
-    value = models.DecimalField(max_digits=15, decimal_places=4)
+    value = models.FloatField()
     
     # Optional fields for multi-value indicators
-    value2 = models.DecimalField(max_digits=15, decimal_places=4, null=True, blank=True)
-    value3 = models.DecimalField(max_digits=15, decimal_places=4, null=True, blank=True)
+    value2 = models.FloatField(null=True, blank=True)
+    value3 = models.FloatField(null=True, blank=True)
     
     # Period for the indicator (e.g., 14 for 14-day RSI, 50 for 50-day SMA)
     period = models.IntegerField(default=14)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ArrayQuerySet.as_manager()
+    
     class Meta:
         db_table = 'technical_indicators'
         ordering = ['-date']
@@ -115,7 +163,177 @@ class TechnicalIndicator(models.Model):
         return f"{self.stock.ticker} - {self.get_indicator_type_display()} ({self.period}) - {self.date}"
 
 
+class IndicatorState(models.Model):
+    """
+    Carry state for incremental indicator updates. Recursive indicators keep
+    their last smoothed values in `state` (e.g. {'ema': ...}); windowed ones
+    only need `last_date` and recompute from a trailing window of prices.
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='indicator_states')
+    indicator_type = models.CharField(max_length=20, choices=TechnicalIndicator.INDICATOR_TYPES)
+    period = models.IntegerField(default=14)
+    last_date = models.DateField()
+    state = models.JSONField(default=dict, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        db_table = 'indicator_states'
+        unique_together = ['stock', 'indicator_type', 'period']
+    
+    def __str__(self):
+        return f"{self.stock.ticker} - {self.indicator_type} ({self.period}) through {self.last_date}"
 
+
+class IndicatorSnapshot(models.Model):
+    """
+    Latest value of every indicator for a stock, one row per stock, so pages
+    and screeners read a single row instead of querying TechnicalIndicator
+    per type. Written by the indicator pipeline in the same transaction as
+    the TechnicalIndicator rows.
+    """
+    # (indicator_type, period) -> columns holding value, value2, value3
+    COLUMNS = {
+        ('SMA', 20): ['sma_20'],
+        ('SMA', 50): ['sma_50'],
+        ('SMA', 200): ['sma_200'],
+        ('EMA', 12): ['ema_12'],
+        ('EMA', 26): ['ema_26'],
+        ('RSI', 14): ['rsi_14'],
+        ('MACD', 26): ['macd', 'macd_signal', 'macd_histogram'],
+        ('BB', 20): ['bb_upper', 'bb_middle', 'bb_lower'],
+        ('STOCH', 14): ['stoch_k', 'stoch_d'],
+        ('ADX', 14): ['adx_14'],
+        ('ATR', 14): ['atr_14'],
+    }
+    
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, related_name='indicator_snapshot')
+    date = models.DateField(db_index=True)
+    
+    sma_20 = models.FloatField(null=True, blank=True)
+    sma_50 = models.FloatField(null=True, blank=True)
+    sma_200 = models.FloatField(null=True, blank=True)
+    ema_12 = models.FloatField(null=True, blank=True)
+    ema_26 = models.FloatField(null=True, blank=True)
+    rsi_14 = models.FloatField(null=True, blank=True, db_index=True)
+    macd = models.FloatField(null=True, blank=True)
+    macd_signal = models.FloatField(null=True, blank=True)
+    macd_histogram = models.FloatField(null=True, blank=True)
+    bb_upper = models.FloatField(null=True, blank=True)
+    bb_middle = models.FloatField(null=True, blank=True)
+    bb_lower = models.FloatField(null=True, blank=True)
+    stoch_k = models.FloatField(null=True, blank=True)
+    stoch_d = models.FloatField(null=True, blank=True)
+    adx_14 = models.FloatField(null=True, blank=True)
+    atr_14 = models.FloatField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'indicator_snapshots'
     
-    
\ No newline at end of file
+    def __str__(self):
+        return f"{self.stock.ticker} indicators as of {self.date}"
+    
+    def latest_indicators(self):
+        """
+        {indicator_type: unsaved TechnicalIndicator} using the first period of
+        each type that has a value, for templates written against TechnicalIndicator
+        """
+        latest = {}
+        for (indicator_type, period), columns in self.COLUMNS.items():
+            values = [getattr(self, column) for column in columns]
+            if indicator_type in latest or values[0] is None:
+                continue
+            values += [None] * (3 - len(values))
+            latest[indicator_type] = TechnicalIndicator(
+                stock_id=self.stock_id,
+                indicator_type=indicator_type,
+                date=self.date,
+                period=period,
+                value=values[0],
+                value2=values[1],
+                value3=values[2],
+            )
+        return latest
+
+
+
+class StockBeta(models.Model):
+    """
+    Beta of a stock against a market proxy as of `date`. Rows with window=0
+    cover the `period_days` calendar days up to `date`; rolling rows cover
+    the last `window` daily returns ending on `date`.
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='betas')
+    benchmark = models.CharField(max_length=10, default='SPY')
+    date = models.DateField(db_index=True)
+    period_days = models.IntegerField(default=252)
+    window = models.IntegerField(default=0)
+    beta = models.FloatField()
+    observations = models.IntegerField()
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'stock_betas'
+        ordering = ['-date']
+        unique_together = ['stock', 'benchmark', 'period_days', 'window', 'date']
+        indexes = [
+            models.Index(fields=['stock', 'benchmark', '-date']),
+        ]
+    
+    def __str__(self):
+        span = f"{self.window}-day rolling" if self.window else f"{self.period_days} days"
+        return f"{self.stock.ticker} beta vs {self.benchmark} ({span}) on {self.date}"
+
+
+class DailyMetricsQuerySet(ArrayQuerySet):
+    
+    def as_of(self, date=None):
+        """Rows of the latest metrics date on or before `date` (default: the latest), in one query"""
+        dates = DailyMetrics.objects.order_by('-date')
+        if date is not None:
+            dates = dates.filter(date__lte=date)
+        return self.filter(date=models.Subquery(dates.values('date')[:1]))
+
+
+class DailyMetrics(models.Model):
+    """
+    Trailing performance of a stock as of each trading date, computed from
+    the stock's own bars by scripts.daily_metrics and maintained by the daily
+    update. Returns are percentages over 1, 5, 21 (1m), 63 (3m) and 252 (1y)
+    bars, and since the last close of the previous year (YTD). The 30-day
+    columns cover the last 21 bars: annualized realized volatility (%) of
+    daily returns and mean volume.
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='daily_metrics')
+    date = models.DateField()
+    close = models.FloatField()
+    volume = models.BigIntegerField()
+    
+    return_1d = models.FloatField(null=True, blank=True)
+    return_5d = models.FloatField(null=True, blank=True)
+    return_1m = models.FloatField(null=True, blank=True)
+    return_3m = models.FloatField(null=True, blank=True)
+    return_ytd = models.FloatField(null=True, blank=True)
+    return_1y = models.FloatField(null=True, blank=True)
+    volatility_30d = models.FloatField(null=True, blank=True)
+    avg_volume_30d = models.FloatField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = DailyMetricsQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'daily_metrics'
+        ordering = ['-date']
+        unique_together = ['stock', 'date']
+        verbose_name_plural = 'daily metrics'
+        indexes = [
+            models.Index(fields=['stock', '-date']),
+            models.Index(fields=['date', 'return_1d']),
+        ]
+    
+    def __str__(self):
+        return f"{self.stock.ticker} metrics on {self.date}"
@@ -20,6 +20,8 @@ urlpatterns = [
     path('list/', views.StockListAPIView.as_view(), name='api_stock-list'),
     path('screener-api/', views.StockScreenerAPIView.as_view(), name='api_stock_screener'),
     path('search/', views.stock_search_api, name='api_stock_search'),
+    path('risk-api/', views.risk_analysis_api, name='api_risk_analysis'),
+    path('correlation-api/', views.correlation_api, name='api_correlation'),
      
     # Generic patterns - MUST come LAST
     path('<str:ticker>/', views.stock_detail_view, name='stock_detail'),
@@ -6,7 +6,8 @@ from rest_framework.response import Response
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q, F, Avg, Count
 from datetime import datetime, timedelta
-from .models import Stock, StockPrice, TechnicalIndicator
+import numpy as np
+from .models import Stock, StockPrice, TechnicalIndicator, DailyMetrics
 from .serializers import StockSerializer, StockListSerializer, StockPriceSerializer, TechnicalIndicatorSerializer
 
 # Create your views here.
@@ -64,87 +65,27 @@ class TechnicalIndicatorListAPIView(generics.ListAPIView):
 
 class StockScreenerAPIView(generics.ListAPIView):
     """API endpoint for advanced stock screening with multiple filters"""
+    queryset = Stock.objects.filter(is_active=True)
     serializer_class = StockListSerializer
     permission_classes = [AllowAny]
     
-    def get_queryset(self):
-        stocks = Stock.objects.filter(is_active=True)
-        
-        # Price filters
-        min_price = self.request.query_params.get('min_price')
-        if min_price:
-            stocks = stocks.filter(current_price__gte=float(min_price))
-            
-        max_price = self.request.query_params.get('max_price')
-        if max_price:
-            stocks = stocks.filter(current_price__lte=float(max_price))
-        
-        # Market cap filters
-        min_market_cap = self.request.query_params.get('min_market_cap')
-        if min_market_cap:
-            stocks = stocks.filter(market_cap__gte=int(min_market_cap))
-            
-        max_market_cap = self.request.query_params.get('max_market_cap')
-        if max_market_cap:
-            stocks = stocks.filter(market_cap__lte=int(max_market_cap))
-        
-        # P/E ratio filters
-        min_pe = self.request.query_params.get('min_pe')
-        if min_pe:
-            stocks = stocks.filter(pe_ratio__gte=float(min_pe))
-            
-        max_pe = self.request.query_params.get('max_pe')
-        if max_pe:
-            stocks = stocks.filter(pe_ratio__lte=float(max_pe))
+    def list(self, request, *args, **kwargs):
+        from scripts.screener import expression_from_params, filters_from_params, get_screener, sort_from_params
         
-        # Dividend yield filter
-        min_div_yield = self.request.query_params.get('min_div_yield')
-        if min_div_yield:
-            stocks = stocks.filter(dividend_yield__gte=float(min_div_yield))
-        
-        # Sector filter
-        sector = self.request.query_params.get('sector')
-        if sector:
-            stocks = stocks.filter(sector__iexact=sector)
-        
-        # Volume filter
-        min_volume = self.request.query_params.get('min_volume')
-        if min_volume:
-            stocks = stocks.filter(volume__gte=int(min_volume))
-        
-        # Technical indicator filters (RSI)
-        rsi_min = self.request.query_params.get('rsi_min')
-        rsi_max = self.request.query_params.get('rsi_max')
-        if rsi_min or rsi_max:
-            rsi_stocks = TechnicalIndicator.objects.filter(
-                indicator_type='RSI',
-                date__gte=datetime.now().date() - timedelta(days=7)
-            ).values('stock')
-            
-            if rsi_min:
-                rsi_stocks = rsi_stocks.filter(value__gte=float(rsi_min))
-            if rsi_max:
-                rsi_stocks = rsi_stocks.filter(value__lte=float(rsi_max))
-            
-            stock_ids = [item['stock'] for item in rsi_stocks]
-            stocks = stocks.filter(id__in=stock_ids)
-        
-        # Sort options
-        sort_by = self.request.query_params.get('sort', 'ticker')
-        sort_options = {
-            'ticker': 'ticker',
-            'price': 'current_price',
-            'market_cap': 'market_cap',
-            'pe_ratio': 'pe_ratio',
-            'volume': 'volume',
-        }
-        
-        if sort_by in sort_options:
-            stocks = stocks.order_by(sort_options[sort_by])
-        else:
-            stocks = stocks.order_by('ticker')
+        # Filters and sorting run on the in-memory screener; only the page is read from the database
+        universe = get_screener().get()
+        try:
+            filters = filters_from_params(request.query_params)
+            expression = expression_from_params(request.query_params)
+            positions = universe.screen(filters, sort=sort_from_params(request.query_params, universe),
+                                        expression=expression)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return stocks
+        page = self.paginate_queryset(universe.ids[positions].tolist())
+        stocks = Stock.objects.in_bulk(page)
+        serializer = self.get_serializer([stocks[stock_id] for stock_id in page if stock_id in stocks], many=True)
+        return self.get_paginated_response(serializer.data)
     
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -192,7 +133,7 @@ def stock_list_view(request):
     return render(request, 'stocks/stock_list.html', context)
 
 def stock_detail_view(request, ticker):
-    stock = get_object_or_404(Stock, ticker=ticker, is_active=True)
+    stock = get_object_or_404(Stock.objects.select_related('indicator_snapshot'), ticker=ticker, is_active=True)
     
     # get recent price history (30 days)
     end_date = datetime.now().date()
@@ -204,14 +145,8 @@ def stock_detail_view(request, ticker):
     
     
     # Get latest indicators
-    latest_indicators = {}
-    for indicator_type, _ in TechnicalIndicator.INDICATOR_TYPES:
-        indicator = TechnicalIndicator.objects.filter(
-            stock=stock,
-            indicator_type=indicator_type
-        ).order_by('-date').first()
-        if indicator:
-            latest_indicators[indicator_type] = indicator
+    snapshot = getattr(stock, 'indicator_snapshot', None)
+    latest_indicators = snapshot.latest_indicators() if snapshot else {}
     
     # Check if stock is in any of user's watchlists
     in_watchlists = []
@@ -237,6 +172,7 @@ def stock_detail_view(request, ticker):
 def dashboard_view(request):
     # Get user's watchlist stocks
     from watchlists.models import Watchlist, WatchlistItem, PriceAlert
+    from scripts.movers import get_movers
     user_watchlists = Watchlist.objects.filter(user=request.user)
     watchlist_count = user_watchlists.count()
     
@@ -247,15 +183,17 @@ def dashboard_view(request):
     active_alerts_count = PriceAlert.objects.filter(user=request.user, status='ACTIVE').count()
     
     recent_stocks = Stock.objects.filter(is_active=True).order_by('-last_updated')[:10]
-    top_gainers = Stock.objects.filter(
-        is_active=True,
-        current_price__isnull=False,
-        previous_close__isnull=False
-    ).order_by('-current_price')[:5]
+    
+    # Ranked after each price refresh; see scripts.movers
+    movers = get_movers()
     
     context = {
         'recent_stocks': recent_stocks,
-        'top_gainers': top_gainers,
+        'top_gainers': movers['gainers'][:5],
+        'top_losers': movers['losers'][:5],
+        'most_active': movers['most_active'][:5],
+        'unusual_volume': movers['unusual_volume'][:5],
+        'movers_date': movers['date'],
         'user_watchlists': user_watchlists,
         'watchlist_count': watchlist_count,
         'total_tracked_stocks': total_tracked_stocks,
@@ -267,87 +205,30 @@ def dashboard_view(request):
 @login_required
 def stock_screener_view(request):
     """Advanced stock screener with multiple filters"""
-    stocks = Stock.objects.filter(is_active=True)
-
-    # Get filter parameters from request
-    filters = {}
-
-    # Price filters
-    if request.GET.get('min_price'):
-        filters['current_price__gte'] = float(request.GET['min_price'])
-    if request.GET.get('max_price'):
-        filters['current_price__lte'] = float(request.GET['max_price'])
-
-    # Market cap filters
-    if request.GET.get('min_market_cap'):
-        filters['market_cap__gte'] = int(request.GET['min_market_cap'])
-    if request.GET.get('max_market_cap'):
-        filters['market_cap__lte'] = int(request.GET['max_market_cap'])
-
-    # P/E ratio filters
-    if request.GET.get('min_pe'):
-        filters['pe_ratio__gte'] = float(request.GET['min_pe'])
-    if request.GET.get('max_pe'):
-        filters['pe_ratio__lte'] = float(request.GET['max_pe'])
-
-    # Dividend yield filters
-    if request.GET.get('min_div_yield'):
-        filters['dividend_yield__gte'] = float(request.GET['min_div_yield'])
-
-    # Sector filter
-    if request.GET.get('sector'):
-        filters['sector__iexact'] = request.GET['sector']
-
-    # Volume filter
-    if request.GET.get('min_volume'):
-        filters['volume__gte'] = int(request.GET['min_volume'])
-
-    # Apply filters
-    stocks = stocks.filter(**filters)
-
-    # Technical indicator filters
-    rsi_min = request.GET.get('rsi_min')
-    rsi_max = request.GET.get('rsi_max')
-    if rsi_min or rsi_max:
-        rsi_stocks = TechnicalIndicator.objects.filter(
-            indicator_type='RSI',
-            date__gte=datetime.now().date() - timedelta(days=7)
-        ).values('stock')
-
-        if rsi_min:
-            rsi_stocks = rsi_stocks.filter(value__gte=float(rsi_min))
-        if rsi_max:
-            rsi_stocks = rsi_stocks.filter(value__lte=float(rsi_max))
-
-        stock_ids = [item['stock'] for item in rsi_stocks]
-        stocks = stocks.filter(id__in=stock_ids)
-
-    # Sort options
-    sort_by = request.GET.get('sort', 'ticker')
-    sort_options = {
-        'ticker': 'ticker',
-        'price': 'current_price',
-        'market_cap': 'market_cap',
-        'pe_ratio': 'pe_ratio',
-        'volume': 'volume',
-    }
-
-    if sort_by in sort_options:
-        stocks = stocks.order_by(sort_options[sort_by])
-
-    # Pagination
     from django.core.paginator import Paginator
-    paginator = Paginator(stocks, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # Get sectors for filter dropdown
-    sectors = Stock.objects.filter(is_active=True).values_list('sector', flat=True).distinct().order_by('sector')
+    from scripts.screener import expression_from_params, filters_from_params, get_screener, sort_from_params
+
+    universe = get_screener().get()
+    error = None
+    try:
+        filters = filters_from_params(request.GET)
+        expression = expression_from_params(request.GET)
+        positions = universe.screen(filters, sort=sort_from_params(request.GET, universe), expression=expression)
+    except ValueError as e:
+        error = str(e)
+        positions = np.array([], dtype=np.int64)
+
+    # Pagination over the screened ids; only the page's stocks are loaded
+    paginator = Paginator(universe.ids[positions].tolist(), 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    stocks = Stock.objects.in_bulk(page_obj.object_list)
+    page_obj.object_list = [stocks[stock_id] for stock_id in page_obj.object_list if stock_id in stocks]
 
     context = {
         'page_obj': page_obj,
-        'sectors': sectors,
+        'sectors': universe.sectors(),
         'filters': request.GET,
+        'error': error,
     }
 
     return render(request, 'stocks/stock_screener.html', context)
@@ -356,7 +237,9 @@ def stock_screener_view(request):
 @login_required
 def portfolio_analytics_view(request):
     """Portfolio analytics and optimization suggestions"""
+    from django.conf import settings
     from watchlists.models import Watchlist, WatchlistItem
+    from scripts.risk_engine import monte_carlo_risk, portfolio_risk
 
     # Get user's portfolio (all watchlist items)
     portfolio_items = WatchlistItem.objects.filter(
@@ -367,6 +250,7 @@ def portfolio_analytics_view(request):
     portfolio_data = []
     total_value = 0
     total_cost = 0
+    quantities = {}
 
     for item in portfolio_items:
         if item.stock.current_price:
@@ -389,6 +273,7 @@ def portfolio_analytics_view(request):
 
             total_value += current_value
             total_cost += cost_basis
+            quantities[item.stock.ticker] = quantities.get(item.stock.ticker, 0) + float(item.quantity)
 
     # Calculate portfolio statistics
     total_gain_loss = total_value - total_cost
@@ -416,59 +301,96 @@ def portfolio_analytics_view(request):
         'portfolio_data': portfolio_data,
         'portfolio_stats': portfolio_stats,
         'sector_allocation': sector_allocation,
+        'portfolio_risk': portfolio_risk(quantities, days=90) if quantities else None,
+        'monte_carlo_risk': monte_carlo_risk(
+            quantities, simulations=settings.PORTFOLIO_VIEW_SIMULATIONS
+        ) if quantities else None,
     }
 
     return render(request, 'stocks/portfolio_analytics.html', context)
 
 
-@login_required
-def risk_analysis_view(request):
-    """Risk analysis and volatility metrics"""
+def _watched_stock_ids(user):
+    """Ids of the stocks on any of the user's watchlists"""
     from watchlists.models import WatchlistItem
-    import numpy as np
 
-    # Get user's stocks
-    user_stocks = WatchlistItem.objects.filter(
-        watchlist__user=request.user
-    ).values_list('stock', flat=True).distinct()
+    return WatchlistItem.objects.filter(watchlist__user=user).values_list('stock', flat=True).distinct()
 
-    stocks_data = []
-    for stock_id in user_stocks:
-        stock = Stock.objects.get(id=stock_id)
 
-        # Calculate volatility (30-day standard deviation of returns)
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=30)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def risk_analysis_api(request):
+    """
+    Volatility and Sharpe ratio for the user's watched stocks, or for
+    ?tickers=AAPL,MSFT, over the last ?days= calendar days (default 30)
+    """
+    from scripts.risk_engine import risk_metrics
+
+    try:
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 2 <= days <= 3650:
+        return Response({'error': 'days must be between 2 and 3650'}, status=status.HTTP_400_BAD_REQUEST)
+
+    tickers = request.query_params.get('tickers')
+    if tickers:
+        tickers = [ticker.strip().upper() for ticker in tickers.split(',') if ticker.strip()][:100]
+    else:
+        tickers = list(Stock.objects.filter(
+            id__in=_watched_stock_ids(request.user)
+        ).values_list('ticker', flat=True))
+
+    return Response({'days': days, 'results': risk_metrics(tickers, days=days)})
 
-        prices = StockPrice.objects.filter(
-            stock=stock,
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('date')
 
-        if len(prices) > 1:
-            price_data = [float(p.close) for p in prices]
-            returns = []
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def correlation_api(request):
+    """
+    Correlation matrix of daily returns for ?tickers=AAPL,MSFT (default: the
+    user's watched stocks) over the last ?days= calendar days (default 90).
+    ?method=pairwise (default) or shrinkage
+    """
+    from scripts.risk_engine import correlation_matrix
+
+    try:
+        days = int(request.query_params.get('days', 90))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 2 <= days <= 3650:
+        return Response({'error': 'days must be between 2 and 3650'}, status=status.HTTP_400_BAD_REQUEST)
+
+    method = request.query_params.get('method', 'pairwise')
+    if method not in ('pairwise', 'shrinkage'):
+        return Response({'error': 'method must be pairwise or shrinkage'}, status=status.HTTP_400_BAD_REQUEST)
+
+    tickers = request.query_params.get('tickers')
+    if tickers:
+        tickers = [ticker.strip().upper() for ticker in tickers.split(',') if ticker.strip()][:100]
+    else:
+        tickers = list(Stock.objects.filter(
+            id__in=_watched_stock_ids(request.user)
+        ).values_list('ticker', flat=True))
+
+    result = correlation_matrix(tickers, days=days, method=method, min_periods=min(30, days // 2))
+    if result is None:
+        return Response({'error': 'Not enough price history'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(result)
 
-            for i in range(1, len(price_data)):
-                daily_return = (price_data[i] - price_data[i-1]) / price_data[i-1]
-                returns.append(daily_return)
 
-            volatility = np.std(returns) * np.sqrt(252) if returns else 0  # Annualized volatility
-            avg_return = np.mean(returns) * 252 if returns else 0  # Annualized return
-            sharpe_ratio = avg_return / volatility if volatility > 0 else 0
-        else:
-            volatility = 0
-            sharpe_ratio = 0
+@login_required
+def risk_analysis_view(request):
+    """Risk analysis and volatility metrics"""
+    from scripts.risk_engine import risk_metrics
 
-        stocks_data.append({
-            'stock': stock,
-            'volatility': volatility * 100,  # Convert to percentage
-            'sharpe_ratio': sharpe_ratio,
-        })
+    stocks = {stock.ticker: stock for stock in Stock.objects.filter(id__in=_watched_stock_ids(request.user))}
 
-    # Sort by volatility
-    stocks_data.sort(key=lambda x: x['volatility'], reverse=True)
+    # 30-day annualized volatility and Sharpe ratio, highest volatility first
+    stocks_data = [
+        dict(metrics, stock=stocks[metrics['ticker']])
+        for metrics in risk_metrics(list(stocks), days=30)
+    ]
 
     context = {
         'stocks_data': stocks_data,
@@ -490,28 +412,34 @@ def comparative_analysis_view(request):
         ).values_list('stock__ticker', flat=True).distinct()[:4]
         tickers = list(user_stocks) if user_stocks else ['AAPL', 'GOOGL', 'MSFT', 'AMZN']
 
+    selected = [ticker.upper() for ticker in tickers[:6]]  # Limit to 6 stocks for comparison
+    stocks_by_ticker = {
+        stock.ticker: stock
+        for stock in Stock.objects.filter(
+            ticker__in=selected, is_active=True
+        ).select_related('indicator_snapshot')
+    }
+
     stocks_data = []
-    for ticker in tickers[:6]:  # Limit to 6 stocks for comparison
-        try:
-            stock = Stock.objects.get(ticker=ticker.upper(), is_active=True)
-
-            # Get recent indicators
-            indicators = {}
-            for indicator_type in ['RSI', 'MACD', 'BB']:
-                indicator = TechnicalIndicator.objects.filter(
-                    stock=stock,
-                    indicator_type=indicator_type
-                ).order_by('-date').first()
-                if indicator:
-                    indicators[indicator_type] = indicator.value
-
-            stocks_data.append({
-                'stock': stock,
-                'indicators': indicators,
-            })
-        except Stock.DoesNotExist:
+    for ticker in selected:
+        stock = stocks_by_ticker.get(ticker)
+        if stock is None:
             continue
 
+        # Get recent indicators
+        snapshot = getattr(stock, 'indicator_snapshot', None)
+        latest = snapshot.latest_indicators() if snapshot else {}
+        indicators = {
+            indicator_type: latest[indicator_type].value
+            for indicator_type in ['RSI', 'MACD', 'BB']
+            if indicator_type in latest
+        }
+
+        stocks_data.append({
+            'stock': stock,
+            'indicators': indicators,
+        })
+
     context = {
         'stocks_data': stocks_data,
         'selected_tickers': tickers,
@@ -537,6 +465,22 @@ def sector_analysis_view(request):
         )
     ).order_by('-avg_price_change')
 
+    # Trailing returns from the latest precomputed DailyMetrics date
+    sector_returns = {
+        row['stock__sector']: row
+        for row in DailyMetrics.objects.as_of().filter(stock__is_active=True).values('stock__sector').annotate(
+            avg_return_1m=Avg('return_1m'),
+            avg_return_ytd=Avg('return_ytd'),
+        )
+    }
+    sectors_data = [
+        dict(sector_data, **{
+            name: sector_returns.get(sector_data['sector'], {}).get(name)
+            for name in ('avg_return_1m', 'avg_return_ytd')
+        })
+        for sector_data in sectors_data
+    ]
+
     # Get top performers by sector
     top_performers = {}
     for sector_data in sectors_data: